@@ -0,0 +1,314 @@
+"""
+Borrowing state machine.
+
+Every status change of a BookBorrowing goes through `apply_transition`, which checks
+the transition table, applies the side effects (stock, dates, copies, messages,
+notifications) for a whole batch of borrowings in one transaction and appends one
+BorrowingTransition row per change, keeping the dashboard counters in step. Single-item views, bulk endpoints and background
+jobs all share this code path.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.http import Http404
+from django.utils import timezone
+
+from . import counters, response_cache
+from .models import Book, BookBorrowing, BookCopy, BookHold, BorrowingTransition, Message, Notification
+from .notifications import create_user_notification
+
+# action: (allowed source statuses, target status)
+TRANSITIONS = {
+    'approve': (('IN_ASTEPTARE',), 'APROBAT'),
+    'reject': (('IN_ASTEPTARE',), 'RESPINS'),
+    'cancel': (('IN_ASTEPTARE', 'APROBAT', 'GATA_RIDICARE'), 'ANULATA'),
+    'pickup': (('APROBAT', 'GATA_RIDICARE'), 'IMPRUMUTAT'),
+    'return': (('IMPRUMUTAT', 'INTARZIAT'), 'RETURNAT'),
+    # Return declared by the student; stock is only adjusted by a librarian return
+    'student_return': (('IMPRUMUTAT',), 'RETURNAT'),
+}
+
+# Wording of the error returned when an action is not allowed from the current status
+ACTION_LABELS = {
+    'approve': 'approve request',
+    'reject': 'reject request',
+    'cancel': 'cancel request',
+    'pickup': 'mark pickup for request',
+    'return': 'return book',
+    'student_return': 'return book',
+}
+
+# Borrowing fields written by each action, for bulk_update
+UPDATE_FIELDS = {
+    'approve': ['status', 'approved_date'],
+    'reject': ['status', 'approved_date'],
+    'cancel': ['status'],
+    'pickup': ['status', 'pickup_date', 'borrow_date', 'due_date', 'copy'],
+    'return': ['status', 'return_date', 'fine_amount'],
+    'student_return': ['status', 'return_date', 'fine_amount'],
+}
+
+# Student notifications sent for an action: (notification type, message template)
+NOTIFICATIONS = {
+    'approve': ('request_approved', "Cererea ta pentru '{book}' a fost aprobată"),
+    'reject': ('request_rejected', "Cererea ta pentru '{book}' a fost respinsă"),
+    'cancel': ('request_cancelled', 'Cererea ta pentru "{book}" a fost anulată.'),
+}
+
+
+class TransitionError(Exception):
+    """A single transition was refused; the message is returned to the client"""
+
+
+def can_transition(borrowing, action):
+    return borrowing.status in TRANSITIONS[action][0]
+
+
+def _entered_at(borrowings):
+    """When each borrowing entered its current status: its last logged transition, else its request date"""
+    last = dict(
+        BorrowingTransition.objects.filter(borrowing_id__in=[b.id for b in borrowings])
+        .values('borrowing_id').annotate(at=models.Max('timestamp')).values_list('borrowing_id', 'at')
+    )
+    return {b.id: last.get(b.id) or b.request_date for b in borrowings}
+
+
+def log_created(borrowings, actor=None, action='request'):
+    """Record the initial status of newly created borrowings"""
+    now = timezone.now()
+    BorrowingTransition.objects.bulk_create([
+        BorrowingTransition(borrowing=b, action=action, from_status='', to_status=b.status, actor=actor, timestamp=now)
+        for b in borrowings
+    ], batch_size=500)
+    counters.record_transitions(('', b.status) for b in borrowings)
+
+
+def apply_transition(action, borrowing_ids, actor=None, librarian_message=None, copies=None):
+    """
+    Apply `action` to the given borrowings in a single transaction.
+    `copies` optionally maps borrowing id -> scanned BookCopy id for pickups.
+    Borrowings that cannot change state are reported and left untouched.
+    Returns (results, borrowings): per-item results in input order, and the
+    updated BookBorrowing instances by id.
+    """
+    allowed, target = TRANSITIONS[action]
+    copies = copies or {}
+    now = timezone.now()
+    results = []
+    changed = []
+    messages = []
+    notifications = []
+    returned_copy_ids = []
+    released_book_ids = set()  # Books with a cancelled hold reservation
+
+    with transaction.atomic():
+        # `hold` is a nullable join, so only the borrowing rows are locked
+        borrowings = (
+            BookBorrowing.objects.select_for_update(of=('self',)).select_related('student__user', 'hold')
+            .in_bulk(borrowing_ids)
+        )
+        books = Book.objects.select_for_update().in_bulk({b.book_id for b in borrowings.values()})
+        stock_before = {book.id: book.stock for book in books.values()}
+        reserved = reserved_counts(books) if action in ('approve', 'pickup') else {}
+
+        for borrowing_id in borrowing_ids:
+            borrowing = borrowings.get(borrowing_id)
+            if borrowing is None:
+                results.append({'id': borrowing_id, 'success': False, 'error': 'Borrowing not found'})
+                continue
+            if borrowing.status not in allowed:
+                results.append({'id': borrowing_id, 'success': False,
+                                'error': f'Cannot {ACTION_LABELS[action]} with status: {borrowing.status}'})
+                continue
+
+            book = books[borrowing.book_id]
+            borrowing.book = book
+            # Copies promised to waitlisted students are off limits, except to the hold that owns one
+            # (legacy READY_FOR_PICKUP rows are GATA_RIDICARE too, without a hold)
+            owns_hold = borrowing.status == 'GATA_RIDICARE' and hasattr(borrowing, 'hold')
+            if action in ('approve', 'pickup'):
+                free = book.stock if owns_hold else book.stock - reserved.get(book.id, 0)
+                if free <= 0:
+                    results.append({'id': borrowing_id, 'success': False, 'error': 'No copies available'})
+                    continue
+
+            if action in ('approve', 'reject'):
+                borrowing.approved_date = now
+            elif action == 'pickup':
+                copy_id = copies.get(borrowing_id)
+                if copy_id is not None:
+                    # Conditional update, so two desks cannot hand out the same copy
+                    if not BookCopy.objects.filter(pk=copy_id, status='DISPONIBIL').update(status='IMPRUMUTAT'):
+                        results.append({'id': borrowing_id, 'success': False, 'error': 'Copy is not available'})
+                        continue
+                    borrowing.copy_id = copy_id
+                book.stock -= 1
+                if owns_hold:
+                    reserved[book.id] = reserved.get(book.id, 0) - 1
+                borrowing.pickup_date = now
+                borrowing.borrow_date = now
+                borrowing.due_date = now + timedelta(days=borrowing.loan_duration_days)
+            elif action in ('return', 'student_return'):
+                if action == 'return':
+                    book.stock += 1
+                    if borrowing.copy_id:
+                        returned_copy_ids.append(borrowing.copy_id)
+                borrowing.return_date = now
+                borrowing.fine_amount = borrowing.calculate_fine()
+            elif action == 'cancel' and owns_hold:
+                released_book_ids.add(book.id)
+
+            borrowing.previous_status = borrowing.status
+            borrowing.status = target
+            borrowing.updated_at = now  # bulk_update does not apply auto_now
+            changed.append(borrowing)
+            results.append({'id': borrowing_id, 'success': True, 'status': target})
+
+            student_user = borrowing.student.user
+            if librarian_message and actor is not None and action in ('approve', 'reject'):
+                user_ids = sorted([actor.id, student_user.id])
+                messages.append(Message(
+                    sender=actor,
+                    recipient=student_user,
+                    borrowing=borrowing,
+                    content=librarian_message,
+                    conversation_id=f"conv_{user_ids[0]}_{user_ids[1]}",  # bulk_create skips Message.save()
+                ))
+            if action in NOTIFICATIONS:
+                notification_type, template = NOTIFICATIONS[action]
+                notifications.append(Notification(
+                    user=student_user, notification_type=notification_type, book=book, borrowing=borrowing,
+                    message=template.format(book=book.name),
+                ))
+
+        if changed:
+            entered_at = _entered_at(changed)
+            BookBorrowing.objects.bulk_update(changed, UPDATE_FIELDS[action] + ['updated_at'], batch_size=500)
+            BorrowingTransition.objects.bulk_create([
+                BorrowingTransition(
+                    borrowing=b, action=action, from_status=b.previous_status, to_status=b.status, actor=actor,
+                    timestamp=now, seconds_in_previous_status=max(0, int((now - entered_at[b.id]).total_seconds())),
+                )
+                for b in changed
+            ], batch_size=500)
+            counters.record_transitions((b.previous_status, b.status) for b in changed)
+        restocked = [book for book in books.values() if book.stock != stock_before[book.id]]
+        for book in restocked:
+            book.updated_at = now
+        Book.objects.bulk_update(restocked, ['stock', 'updated_at'], batch_size=500)
+        if restocked:
+            response_cache.invalidate('books')
+        if returned_copy_ids:
+            BookCopy.objects.filter(pk__in=returned_copy_ids).update(status='DISPONIBIL')
+        Message.objects.bulk_create(messages, batch_size=500)
+        # Unread badges of the recipients
+        unread = {}
+        for message in messages:
+            key = counters.unread_messages_key(message.recipient_id)
+            unread[key] = unread.get(key, 0) + 1
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        for notification in notifications:
+            key = counters.unread_notifications_key(notification.user_id)
+            unread[key] = unread.get(key, 0) + 1
+        counters.add(unread)
+
+        # Freed copies go to the head of the waitlist, if anyone is waiting
+        for book in books.values():
+            if book.stock > stock_before[book.id] or book.id in released_book_ids:
+                promote_holds(book.id)
+
+    return results, borrowings
+
+
+def transition(borrowing_id, action, actor=None, librarian_message=None, copy_id=None):
+    """Apply `action` to one borrowing and return it, or raise TransitionError (Http404 if it does not exist)"""
+    copies = {borrowing_id: copy_id} if copy_id is not None else None
+    results, borrowings = apply_transition(action, [borrowing_id], actor, librarian_message, copies)
+    if borrowing_id not in borrowings:
+        raise Http404('Borrowing not found')
+    if not results[0]['success']:
+        raise TransitionError(results[0]['error'])
+    return borrowings[borrowing_id]
+
+
+def reserved_for_holds(book):
+    """Number of in-stock copies already assigned to waitlisted students"""
+    return BookBorrowing.objects.filter(book=book, status='GATA_RIDICARE', hold__isnull=False).count()
+
+
+def reserved_counts(book_ids):
+    """reserved_for_holds of many books in one query: book id -> copies"""
+    return dict(
+        BookBorrowing.objects.filter(book_id__in=list(book_ids), status='GATA_RIDICARE', hold__isnull=False)
+        .values('book_id').annotate(copies=models.Count('id')).values_list('book_id', 'copies')
+    )
+
+
+def promote_holds(book_id):
+    """
+    Assign free copies of a book to the waitlist in FIFO order.
+    Each promoted hold becomes a GATA_RIDICARE request and the student is notified.
+    Must run inside a transaction; returns the number of promoted holds.
+    """
+    book = Book.objects.select_for_update().get(pk=book_id)
+    free = book.stock - reserved_for_holds(book)
+    if free <= 0:
+        return 0
+
+    holds = list(
+        BookHold.objects.select_for_update()
+        .filter(book=book, status='IN_ASTEPTARE')
+        .select_related('student__user')
+        .order_by('created_at', 'id')[:free]
+    )
+    now = timezone.now()
+    for hold in holds:
+        borrowing = BookBorrowing.objects.create(
+            book=book,
+            student=hold.student,
+            status='GATA_RIDICARE',
+            approved_date=now,
+            loan_duration_days=hold.loan_duration_days,
+            due_date=now + timedelta(days=hold.loan_duration_days),
+        )
+        log_created([borrowing], action='hold_promoted')
+        hold.status = 'ALOCAT'
+        hold.borrowing = borrowing
+        hold.save(update_fields=['status', 'borrowing'])
+
+        create_user_notification(
+            user=hold.student.user,
+            notification_type='hold_ready',
+            message=f"Un exemplar din '{book.name}' te așteaptă la bibliotecă",
+            book=book,
+            borrowing=borrowing
+        )
+    return len(holds)
+
+
+def hold_pickup_window():
+    return timedelta(days=getattr(settings, 'HOLD_PICKUP_DAYS', 3))
+
+
+def expired_ready_holds():
+    """Copies assigned to waitlisted students that were not collected within HOLD_PICKUP_DAYS"""
+    return BookBorrowing.objects.filter(
+        status='GATA_RIDICARE', hold__isnull=False, approved_date__lt=timezone.now() - hold_pickup_window()
+    )
+
+
+def status_durations(since=None):
+    """Average and maximum time spent in each status, computed from the transition log only"""
+    transitions = BorrowingTransition.objects.exclude(from_status='')
+    if since is not None:
+        transitions = transitions.filter(timestamp__gte=since)
+    return list(
+        transitions.values('from_status')
+        .annotate(
+            transitions=models.Count('id'),
+            avg_seconds=models.Avg('seconds_in_previous_status'),
+            max_seconds=models.Max('seconds_in_previous_status'),
+        )
+        .order_by('from_status')
+    )
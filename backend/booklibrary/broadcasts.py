@@ -0,0 +1,126 @@
+"""
+Broadcast messages from a librarian to a class or role.
+
+The request only stores one Broadcast row and returns; delivery (one Message per
+recipient, so broadcasts show up in the usual 1:1 conversations and unread
+counters) is done by a background thread started after commit, in batches of
+`bulk_create`. Progress is committed per batch, so the `deliver_broadcasts`
+command (run from cron) can resume a broadcast whose worker died.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from . import counters
+from .manual_distribution import class_grade, students_in_class
+from .models import Book, Broadcast, Message
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+STALE_AFTER = timedelta(minutes=5)  # A worker silent for this long is considered dead
+
+
+class BroadcastError(Exception):
+    """Invalid audience"""
+
+
+def recipients(broadcast):
+    """Users a broadcast is delivered to, ordered by id"""
+    if broadcast.audience == 'class':
+        users = User.objects.filter(student__in=students_in_class(broadcast.student_class))
+    elif broadcast.audience == 'students':
+        users = User.objects.filter(student__isnull=False).exclude(groups__name='Teachers')
+    elif broadcast.audience == 'teachers':
+        users = User.objects.filter(groups__name='Teachers')
+    else:
+        raise BroadcastError(f'Unknown audience: {broadcast.audience}')
+    return users.exclude(pk=broadcast.sender_id).filter(is_active=True).distinct().order_by('id')
+
+
+def create_broadcast(sender, audience, content, student_class=''):
+    """Store a broadcast and schedule its delivery once the transaction commits"""
+    if audience not in dict(Broadcast.AUDIENCE_CHOICES):
+        raise BroadcastError(f'Unknown audience: {audience}')
+    if audience == 'class' and class_grade(student_class or '') not in dict(Book.CLASS_CHOICES):
+        raise BroadcastError(f'Unknown class: {student_class}')
+
+    broadcast = Broadcast(
+        sender=sender, audience=audience, content=content, student_class=student_class if audience == 'class' else ''
+    )
+    broadcast.recipient_count = recipients(broadcast).count()
+    broadcast.save()
+    if getattr(settings, 'BROADCAST_DELIVERY_THREAD', True):
+        transaction.on_commit(lambda: start_delivery(broadcast.id))
+    return broadcast
+
+
+def start_delivery(broadcast_id):
+    threading.Thread(target=_deliver_in_thread, args=(broadcast_id,), daemon=True).start()
+
+
+def _deliver_in_thread(broadcast_id):
+    try:
+        deliver(broadcast_id)
+    except Exception:
+        logger.exception('Delivery of broadcast %s failed; deliver_broadcasts will retry it', broadcast_id)
+    finally:
+        connection.close()
+
+
+def claim(broadcast_id):
+    """Take a broadcast for delivery, unless another live worker already has it"""
+    now = timezone.now()
+    return Broadcast.objects.filter(pk=broadcast_id).filter(
+        models.Q(status='IN_ASTEPTARE') | models.Q(status='IN_CURS', claimed_at__lt=now - STALE_AFTER)
+    ).update(status='IN_CURS', claimed_at=now)
+
+
+def deliver(broadcast_id, batch_size=BATCH_SIZE):
+    """Deliver a claimed broadcast in batches; returns the number of messages created"""
+    if not claim(broadcast_id):
+        return 0
+    broadcast = Broadcast.objects.get(pk=broadcast_id)
+    created = 0
+    while True:
+        batch = list(
+            recipients(broadcast).filter(id__gt=broadcast.last_recipient_id).values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            Message.objects.bulk_create([
+                Message(
+                    sender_id=broadcast.sender_id,
+                    recipient_id=user_id,
+                    content=broadcast.content,
+                    broadcast=broadcast,
+                    # bulk_create skips Message.save()
+                    conversation_id=f"conv_{min(user_id, broadcast.sender_id)}_{max(user_id, broadcast.sender_id)}",
+                )
+                for user_id in batch
+            ], batch_size=batch_size)
+            counters.increment_each(counters.unread_messages_key(user_id) for user_id in batch)
+            broadcast.last_recipient_id = batch[-1]
+            broadcast.delivered_count += len(batch)
+            Broadcast.objects.filter(pk=broadcast.pk).update(
+                last_recipient_id=broadcast.last_recipient_id,
+                delivered_count=broadcast.delivered_count,
+                claimed_at=timezone.now(),
+            )
+        created += len(batch)
+
+    Broadcast.objects.filter(pk=broadcast.pk).update(status='TRIMIS', completed_at=timezone.now())
+    return created
+
+
+def pending_broadcasts():
+    """Broadcasts waiting for delivery or abandoned by their worker"""
+    return Broadcast.objects.filter(
+        models.Q(status='IN_ASTEPTARE') | models.Q(status='IN_CURS', claimed_at__lt=timezone.now() - STALE_AFTER)
+    ).order_by('created_at')
@@ -0,0 +1,183 @@
+"""
+Bulk catalog import from CSV or XLSX files.
+
+Rows are streamed from the file, validated with the same rules as the `book`
+endpoint (BookSerializer) and upserted in batches with bulk_create/bulk_update,
+so memory usage does not grow with the size of the file. Books are matched on
+(name, author); matching books are updated, the others are created.
+"""
+import csv
+import io
+import os
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import borrowing_states, response_cache
+from .models import Book
+from .serializers import BookSerializer
+
+IMPORT_FIELDS = [
+    'name', 'author', 'inventory', 'stock', 'description', 'category',
+    'type', 'publication_year', 'book_class', 'thumbnail_url',
+]
+SUPPORTED_EXTENSIONS = ['.csv', '.xlsx']
+MAX_REPORTED_ERRORS = 100  # Errors past this are only counted, not returned
+
+
+class CatalogImportError(Exception):
+    """The file itself cannot be imported (wrong format, missing columns...)"""
+
+
+def _clean_header(header):
+    return str(header or '').strip().lower()
+
+
+def iter_csv_rows(file):
+    """Yield (row number, dict) from a binary CSV file, detecting ',' / ';' / tab delimiters"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    try:
+        headers = [_clean_header(h) for h in next(reader)]
+    except StopIteration:
+        return
+    # Numbered before blank rows are skipped, so errors point at the row shown by a spreadsheet
+    for row_number, values in enumerate(reader, start=2):
+        if not any(value.strip() for value in values):
+            continue
+        yield row_number, dict(zip(headers, values))
+
+
+def iter_xlsx_rows(file):
+    """Yield (row number, dict) from the first sheet of an XLSX file, reading it in streaming mode"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CatalogImportError('XLSX import requires openpyxl (pip install openpyxl)')
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        try:
+            headers = [_clean_header(h) for h in next(rows)]
+        except StopIteration:
+            return
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None or str(value).strip() == '' for value in values):
+                continue
+            yield row_number, {header: ('' if value is None else value) for header, value in zip(headers, values)}
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename):
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == '.csv':
+        return iter_csv_rows(file)
+    if extension == '.xlsx':
+        return iter_xlsx_rows(file)
+    raise CatalogImportError(f'Unsupported file type. Allowed types: {", ".join(SUPPORTED_EXTENSIONS)}')
+
+
+class CatalogImporter:
+    def __init__(self, batch_size=500, dry_run=False, progress=None):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.summary = {
+            'rows': 0,
+            'created': 0,
+            'updated': 0,
+            'failed': 0,
+            'errors': [],
+        }
+
+    def run(self, rows):
+        """Import (row number, dict) pairs as yielded by iter_rows; row 1 is the header"""
+        batch = []
+        columns = None
+        for row_number, row in rows:
+            if columns is None:
+                columns = [field for field in IMPORT_FIELDS if field in row]
+                missing = {'name', 'author'} - set(columns)
+                if missing:
+                    raise CatalogImportError(f'Missing required columns: {", ".join(sorted(missing))}')
+            self.summary['rows'] += 1
+            data = {field: row.get(field) for field in columns if row.get(field) not in ('', None)}
+            batch.append((row_number, data))
+            if len(batch) >= self.batch_size:
+                self._flush(batch, columns)
+                batch = []
+        if batch:
+            self._flush(batch, columns)
+        return self.summary
+
+    def _record_error(self, row_number, errors):
+        self.summary['failed'] += 1
+        if len(self.summary['errors']) < MAX_REPORTED_ERRORS:
+            self.summary['errors'].append({'row': row_number, 'errors': errors})
+
+    def _flush(self, batch, columns):
+        names = {str(data.get('name', '')).strip() for _, data in batch}
+        existing = {
+            (book.name, book.author): book
+            for book in Book.objects.filter(name__in=names)
+        }
+
+        to_create = {}
+        to_update = {}
+        stock_before = {}
+        for row_number, data in batch:
+            key = (str(data.get('name', '')).strip(), str(data.get('author', '')).strip())
+            book = existing.get(key)
+            if book is not None:
+                # Updating: only the columns present in the file are validated and changed
+                serializer = BookSerializer(book, data=data, partial=True)
+            else:
+                serializer = BookSerializer(data=data)
+            if not serializer.is_valid():
+                self._record_error(row_number, serializer.errors)
+                continue
+            values = serializer.validated_data
+            if book is not None:
+                stock_before.setdefault(key, book.stock)
+                for field, value in values.items():
+                    setattr(book, field, value)
+                to_update[key] = book
+            elif key in to_create:
+                # Same book twice in one batch: the last row wins
+                for field, value in values.items():
+                    setattr(to_create[key], field, value)
+            else:
+                to_create[key] = Book(**values)
+
+        if not self.dry_run:
+            update_fields = [field for field in columns if field not in ('name', 'author')] + ['updated_at']
+            now = timezone.now()
+            for book in to_update.values():
+                book.updated_at = now  # bulk_update does not apply auto_now
+            with transaction.atomic():
+                Book.objects.bulk_create(to_create.values(), batch_size=self.batch_size)
+                if to_update:
+                    Book.objects.bulk_update(to_update.values(), update_fields, batch_size=self.batch_size)
+                response_cache.invalidate('books')
+                # Restocked books serve their waitlist first, as with a manual stock update
+                for key, book in to_update.items():
+                    if book.stock > stock_before[key]:
+                        borrowing_states.promote_holds(book.id)
+
+        self.summary['created'] += len(to_create)
+        self.summary['updated'] += len(to_update)
+        if self.progress:
+            self.progress(self.summary)
+
+
+def import_catalog(file, filename, batch_size=500, dry_run=False, progress=None):
+    """Import a CSV/XLSX catalog file and return a summary of what happened"""
+    importer = CatalogImporter(batch_size=batch_size, dry_run=dry_run, progress=progress)
+    return importer.run(iter_rows(file, filename))
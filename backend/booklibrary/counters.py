@@ -0,0 +1,203 @@
+"""
+Incrementally maintained counters for the librarian dashboard and unread badges.
+
+Counters live in a small key/value table and are adjusted in the same transaction
+as the change they describe (borrowing transitions, new and read notifications,
+new and read messages), so the dashboard reads a handful of rows instead of
+counting borrowings. Values read through `cached_values` are also kept in the
+Django cache until the counter changes. The `reconcile_dashboard_counters`
+command recomputes them from scratch to fix drift.
+"""
+import functools
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .models import BookBorrowing, DashboardCounter, Message, Notification
+
+UNREAD_LIBRARIAN_NOTIFICATIONS = 'unread:librarian_notifications'
+DAILY_COUNTER_DAYS = 7  # Daily pickup/return counters older than this are pruned on reconciliation
+CACHE_TIMEOUT = 5 * 60
+
+
+def unread_messages_key(user_id):
+    return f'unread:messages:{user_id}'
+
+
+def unread_notifications_key(user_id):
+    """Unread personal (non-librarian) notifications of a user"""
+    return f'unread:notifications:{user_id}'
+
+
+def _cache_key(key):
+    return f'counter:{key}'
+
+
+def invalidate(keys):
+    """Drop cached values of changed counters, now and again once the change is committed"""
+    cache_keys = [_cache_key(key) for key in keys]
+    if cache_keys:
+        cache.delete_many(cache_keys)
+        transaction.on_commit(functools.partial(cache.delete_many, cache_keys))
+
+
+def status_key(status):
+    return f'status:{status}'
+
+
+def daily_key(event, day=None):
+    """Key of a per-day counter, e.g. 'pickups:2026-09-01'"""
+    return f'{event}:{(day or timezone.localdate()).isoformat()}'
+
+
+def add(changes):
+    """Apply {key: delta} to the counters, creating missing ones"""
+    invalidate([key for key, delta in changes.items() if delta])
+    for key, delta in changes.items():
+        if not delta:
+            continue
+        if DashboardCounter.objects.filter(key=key).update(value=models.F('value') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(key=key, value=delta)
+        except IntegrityError:
+            # Created concurrently in the meantime
+            DashboardCounter.objects.filter(key=key).update(value=models.F('value') + delta)
+
+
+def increment_each(keys, delta=1):
+    """
+    Apply the same delta to many counters with a constant number of queries.
+    Counters created concurrently in the meantime may miss this delta; the
+    reconciliation command fixes such drift.
+    """
+    keys = set(keys)
+    invalidate(keys)
+    existing = set(DashboardCounter.objects.filter(key__in=keys).values_list('key', flat=True))
+    DashboardCounter.objects.filter(key__in=existing).update(value=models.F('value') + delta)
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(key=key, value=delta) for key in keys - existing], batch_size=500, ignore_conflicts=True
+    )
+
+
+def record_transitions(transitions):
+    """Update the counters for (from_status, to_status) pairs; from_status is empty for new borrowings"""
+    changes = {}
+    for from_status, to_status in transitions:
+        if from_status:
+            changes[status_key(from_status)] = changes.get(status_key(from_status), 0) - 1
+        changes[status_key(to_status)] = changes.get(status_key(to_status), 0) + 1
+        if to_status == 'IMPRUMUTAT':
+            changes[daily_key('pickups')] = changes.get(daily_key('pickups'), 0) + 1
+        elif to_status == 'RETURNAT':
+            changes[daily_key('returns')] = changes.get(daily_key('returns'), 0) + 1
+    add(changes)
+
+
+def remove_borrowings(borrowings):
+    """
+    Take borrowings about to be deleted out of the counters, with the unread
+    notifications and messages that cascade with them. Call in the same transaction.
+    """
+    changes = {}
+
+    def subtract(key, n):
+        changes[key] = changes.get(key, 0) - n
+
+    for status, n in borrowings.values_list('status').annotate(n=models.Count('id')).order_by():
+        subtract(status_key(status), n)
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    end = start + timedelta(days=1)
+    subtract(daily_key('pickups', today), borrowings.filter(pickup_date__gte=start, pickup_date__lt=end).count())
+    subtract(daily_key('returns', today), borrowings.filter(return_date__gte=start, return_date__lt=end).count())
+
+    notifications = Notification.objects.filter(borrowing__in=borrowings, is_read=False)
+    subtract(UNREAD_LIBRARIAN_NOTIFICATIONS, notifications.filter(for_librarians=True).count())
+    personal = notifications.filter(for_librarians=False, user__isnull=False)
+    for user_id, n in personal.values_list('user_id').annotate(n=models.Count('id')).order_by():
+        subtract(unread_notifications_key(user_id), n)
+    messages = Message.objects.filter(borrowing__in=borrowings, is_read=False)
+    for user_id, n in messages.values_list('recipient_id').annotate(n=models.Count('id')).order_by():
+        subtract(unread_messages_key(user_id), n)
+    add(changes)
+
+
+def get_values(keys):
+    values = dict(DashboardCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    return {key: values.get(key, 0) for key in keys}
+
+
+def cached_values(keys):
+    """Like get_values, served from the cache when possible (no query at all on a full hit)"""
+    cached = cache.get_many([_cache_key(key) for key in keys])
+    values = {key: cached[_cache_key(key)] for key in keys if _cache_key(key) in cached}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        fetched = get_values(missing)
+        cache.set_many({_cache_key(key): value for key, value in fetched.items()}, CACHE_TIMEOUT)
+        values.update(fetched)
+    return values
+
+
+def dashboard():
+    """Dashboard payload, read from the counters table in one query"""
+    statuses = [status for status, _ in BookBorrowing.STATUS_CHOICES]
+    pickups, returns = daily_key('pickups'), daily_key('returns')
+    values = get_values([status_key(s) for s in statuses] + [pickups, returns, UNREAD_LIBRARIAN_NOTIFICATIONS])
+    by_status = {status: values[status_key(status)] for status in statuses}
+    return {
+        'by_status': by_status,
+        'pending_requests': by_status['IN_ASTEPTARE'],
+        'ready_for_pickup': by_status['APROBAT'] + by_status['GATA_RIDICARE'],
+        'active_loans': by_status['IMPRUMUTAT'] + by_status['INTARZIAT'],
+        'overdue_loans': by_status['INTARZIAT'],
+        'today': {'pickups': values[pickups], 'returns': values[returns]},
+        'unread_notifications': values[UNREAD_LIBRARIAN_NOTIFICATIONS],
+    }
+
+
+def compute_all():
+    """Recompute every dashboard counter from the source tables"""
+    expected = {status_key(status): 0 for status, _ in BookBorrowing.STATUS_CHOICES}
+    for status, count in BookBorrowing.objects.values_list('status').annotate(count=models.Count('id')).order_by():
+        expected[status_key(status)] = count
+
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    end = start + timedelta(days=1)
+    expected[daily_key('pickups', today)] = BookBorrowing.objects.filter(
+        pickup_date__gte=start, pickup_date__lt=end
+    ).count()
+    expected[daily_key('returns', today)] = BookBorrowing.objects.filter(
+        return_date__gte=start, return_date__lt=end
+    ).count()
+    expected[UNREAD_LIBRARIAN_NOTIFICATIONS] = Notification.objects.filter(for_librarians=True, is_read=False).count()
+
+    # Per-user unread counters; existing counters of users with nothing unread must drop to 0
+    per_user = [
+        (unread_messages_key, Message.objects.filter(is_read=False).values_list('recipient_id')),
+        (unread_notifications_key,
+         Notification.objects.filter(for_librarians=False, is_read=False, user__isnull=False).values_list('user_id')),
+    ]
+    for make_key, unread in per_user:
+        for key in DashboardCounter.objects.filter(key__startswith=make_key('')).values_list('key', flat=True):
+            expected[key] = 0
+        for user_id, count in unread.annotate(count=models.Count('id')).order_by():
+            expected[make_key(user_id)] = count
+    return expected
+
+
+def stale_daily_keys():
+    """Daily counters older than DAILY_COUNTER_DAYS"""
+    cutoff = (timezone.localdate() - timedelta(days=DAILY_COUNTER_DAYS)).isoformat()
+    stale = []
+    for key in DashboardCounter.objects.filter(
+        models.Q(key__startswith='pickups:') | models.Q(key__startswith='returns:')
+    ).values_list('key', flat=True):
+        if key.split(':', 1)[1] < cutoff:
+            stale.append(key)
+    return stale
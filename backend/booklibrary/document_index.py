@@ -0,0 +1,285 @@
+"""
+Text extraction and page-level search index for manual and exam model PDFs.
+
+Extraction is incremental: a document is only (re)indexed when its file name,
+size or modification time differs from what was recorded the last time.
+PDF parsing is CPU bound, so pending files are processed in a process pool and
+only the parent process writes to the database.
+
+A document uploaded through the API is indexed right away by a background
+thread started after commit (`schedule_indexing`); the `index_documents` cron
+command catches up on anything that thread missed, e.g. after a restart.
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+
+from . import fulltext
+from .models import Book, ExamModel, IndexedDocument, DocumentPage
+
+logger = logging.getLogger(__name__)
+
+PAGE_TABLE = DocumentPage._meta.db_table
+
+
+def pdf_support_available():
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _file_signature(file_name):
+    """Return (size, modified_time) of a stored file, or None if it is missing"""
+    try:
+        if not default_storage.exists(file_name):
+            return None
+        size = default_storage.size(file_name)
+        try:
+            modified = default_storage.get_modified_time(file_name)
+        except NotImplementedError:
+            modified = None
+        return size, modified
+    except Exception as e:
+        logger.warning(f"Could not stat {file_name}: {e}")
+        return None
+
+
+def iter_indexable_documents():
+    """Yield (document_type, object_id, file_name) for every PDF referenced in the DB"""
+    books = Book.objects.exclude(pdf_file='').exclude(pdf_file__isnull=True)
+    for object_id, file_name in books.values_list('id', 'pdf_file').iterator():
+        yield 'book', object_id, file_name
+    for object_id, file_name in ExamModel.objects.exclude(pdf_file='').values_list('id', 'pdf_file').iterator():
+        yield 'exam_model', object_id, file_name
+
+
+def _unchanged(existing, file_name, size, modified):
+    return (
+        existing is not None
+        and existing.file_name == file_name
+        and existing.file_size == size
+        and existing.file_modified == modified
+    )
+
+
+def collect_pending(full=False):
+    """
+    Compare stored files with the index.
+    Returns (pending, stale_ids) where pending is a list of
+    (document_type, object_id, file_name, size, modified) tuples to extract and
+    stale_ids are IndexedDocument ids whose source row or file is gone.
+    """
+    indexed = {
+        (doc.document_type, doc.object_id): doc
+        for doc in IndexedDocument.objects.only(
+            'id', 'document_type', 'object_id', 'file_name', 'file_size', 'file_modified'
+        )
+    }
+    pending = []
+    seen = set()
+    for document_type, object_id, file_name in iter_indexable_documents():
+        signature = _file_signature(file_name)
+        if signature is None:
+            continue
+        key = (document_type, object_id)
+        seen.add(key)
+        size, modified = signature
+        if full or not _unchanged(indexed.get(key), file_name, size, modified):
+            pending.append((document_type, object_id, file_name, size, modified))
+    stale_ids = [doc.id for key, doc in indexed.items() if key not in seen]
+    return pending, stale_ids
+
+
+def extract_pdf_pages(file_name):
+    """
+    Extract the text of every page of a stored PDF.
+    Runs inside worker processes, so it only touches storage, never the DB.
+    """
+    from pypdf import PdfReader
+
+    with default_storage.open(file_name, 'rb') as handle:
+        reader = PdfReader(handle)
+        pages = []
+        for page in reader.pages:
+            try:
+                text = page.extract_text() or ''
+            except Exception as e:  # A single broken page should not drop the whole document
+                logger.warning(f"Could not extract a page of {file_name}: {e}")
+                text = ''
+            pages.append(' '.join(text.split()))
+    return pages
+
+
+def _init_worker():
+    """Make sure Django is configured in spawned worker processes"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _extract_job(job):
+    document_type, object_id, file_name, size, modified = job
+    try:
+        return job, extract_pdf_pages(file_name), ''
+    except Exception as e:
+        return job, [], str(e) or e.__class__.__name__
+
+
+@transaction.atomic
+def save_document(job, pages, error=''):
+    """Replace the stored pages of a document with freshly extracted ones"""
+    document_type, object_id, file_name, size, modified = job
+    document, _ = IndexedDocument.objects.update_or_create(
+        document_type=document_type,
+        object_id=object_id,
+        defaults={
+            'file_name': file_name,
+            'file_size': size,
+            'file_modified': modified,
+            'page_count': len(pages),
+            'error': error,
+        },
+    )
+    document.pages.all().delete()
+    DocumentPage.objects.bulk_create(
+        [
+            DocumentPage(document=document, page_number=number, text=text)
+            for number, text in enumerate(pages, start=1)
+            if text
+        ],
+        batch_size=500,
+    )
+    return document
+
+
+def index_documents(workers=None, full=False, progress=None):
+    """
+    Extract and index every new or changed PDF.
+    Returns a dict with the number of indexed, failed and removed documents.
+    """
+    pending, stale_ids = collect_pending(full=full)
+    if stale_ids:
+        IndexedDocument.objects.filter(id__in=stale_ids).delete()
+
+    stats = {'indexed': 0, 'failed': 0, 'removed': len(stale_ids), 'pending': len(pending)}
+
+    def handle(result):
+        job, pages, error = result
+        save_document(job, pages, error)
+        if error:
+            stats['failed'] += 1
+        else:
+            stats['indexed'] += 1
+        if progress:
+            progress(job, len(pages), error)
+
+    if workers == 1 or len(pending) <= 1:
+        for job in pending:
+            handle(_extract_job(job))
+        return stats
+
+    # Do not let forked workers inherit open database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_extract_job, job) for job in pending]
+        for future in as_completed(futures):
+            handle(future.result())
+    return stats
+
+
+def index_document(document_type, object_id):
+    """Extract and index one document if its file is new or changed; returns True if it was (re)indexed"""
+    model = Book if document_type == 'book' else ExamModel
+    file_name = model.objects.filter(pk=object_id).values_list('pdf_file', flat=True).first()
+    signature = _file_signature(file_name) if file_name else None
+    if signature is None:
+        return False
+    size, modified = signature
+    existing = IndexedDocument.objects.filter(document_type=document_type, object_id=object_id).first()
+    if _unchanged(existing, file_name, size, modified):
+        return False
+    job = (document_type, object_id, file_name, size, modified)
+    _, pages, error = _extract_job(job)
+    save_document(job, pages, error)
+    return True
+
+
+def schedule_indexing(document_type, object_id):
+    """Index a just-uploaded document in a background thread once the transaction commits"""
+    if not getattr(settings, 'DOCUMENT_INDEX_THREAD', True) or not pdf_support_available():
+        return
+    transaction.on_commit(lambda: threading.Thread(
+        target=_index_in_thread, args=(document_type, object_id), daemon=True
+    ).start())
+
+
+def _index_in_thread(document_type, object_id):
+    try:
+        index_document(document_type, object_id)
+    except Exception:
+        logger.exception('Indexing %s #%s failed; index_documents will retry it', document_type, object_id)
+    finally:
+        connection.close()
+
+
+def search_documents(query, document_type=None, limit=20, pages_per_document=5):
+    """
+    Search indexed pages.
+    Returns documents ordered by their best matching page, each with
+    up to `pages_per_document` (page, snippet) matches.
+    """
+    where = ''
+    params = []
+    if document_type:
+        where = f"c.document_id IN (SELECT id FROM {IndexedDocument._meta.db_table} WHERE document_type = %s)"
+        params = [document_type]
+    # Fetch more page hits than documents requested, several pages usually match per document
+    page_limit = limit * pages_per_document
+
+    if fulltext.fts_enabled():
+        rows = fulltext.search(PAGE_TABLE, 'text', query, page_limit, where=where, params=params)
+        page_ids = [row[0] for row in rows]
+        snippets = {row[0]: row[1] for row in rows}
+        pages = DocumentPage.objects.only('id', 'document_id', 'page_number').in_bulk(page_ids)
+        hits = [(pages[page_id], snippets[page_id]) for page_id in page_ids if page_id in pages]
+    else:
+        queryset = DocumentPage.objects.filter(text__icontains=query)
+        if document_type:
+            queryset = queryset.filter(document__document_type=document_type)
+        hits = [(page, fulltext.make_snippet(page.text, query)) for page in queryset[:page_limit]]
+
+    grouped = {}
+    for page, snippet in hits:
+        matches = grouped.setdefault(page.document_id, [])
+        if len(matches) < pages_per_document:
+            matches.append({'page': page.page_number, 'snippet': snippet})
+
+    document_ids = list(grouped)[:limit]
+    documents = IndexedDocument.objects.in_bulk(document_ids)
+    book_ids = [d.object_id for d in documents.values() if d.document_type == 'book']
+    exam_ids = [d.object_id for d in documents.values() if d.document_type == 'exam_model']
+    books = Book.objects.in_bulk(book_ids)
+    exam_models = ExamModel.objects.in_bulk(exam_ids)
+
+    results = []
+    for document_id in document_ids:
+        document = documents[document_id]
+        source = (books if document.document_type == 'book' else exam_models).get(document.object_id)
+        if source is None:
+            continue
+        results.append({
+            'document_type': document.document_type,
+            'id': source.id,
+            'name': source.name,
+            'pdf_file': source.pdf_file.url if source.pdf_file else None,
+            'page_count': document.page_count,
+            'matches': grouped[document_id],
+        })
+    return results
@@ -0,0 +1,65 @@
+"""
+ETag / conditional GET support for read-mostly endpoints.
+
+Version tags are computed from cheap aggregates (row count and newest `updated_at`
+of the filtered queryset) or from a small payload, so a client that sends back the
+ETag it already has in `If-None-Match` gets `304 Not Modified` without the rows
+being loaded or serialized.
+"""
+import functools
+import hashlib
+import json
+
+from django.db import models
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def make_etag(*parts):
+    """Quoted ETag from arbitrary parts"""
+    return quote_etag(hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest())
+
+
+def queryset_etag(queryset, *parts):
+    """ETag that changes whenever a row of the queryset is added, updated or deleted"""
+    state = queryset.order_by().aggregate(count=models.Count('pk'), last=models.Max('updated_at'))
+    last = state['last'].isoformat() if state['last'] else ''
+    return make_etag(queryset.model._meta.label, state['count'], last, *parts)
+
+
+def payload_etag(data):
+    return make_etag(json.dumps(data, sort_keys=True, default=str))
+
+
+def not_modified(request, etag):
+    """HttpResponseNotModified if the client's If-None-Match matches `etag`, else None"""
+    return get_conditional_response(request, etag=etag)
+
+
+def with_etag(response, etag):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        # Clients keep the body but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(etag_func):
+    """
+    Decorator for GET function views: `etag_func(request, *args, **kwargs)` returns
+    the current ETag (or None to skip). Other methods are passed through untouched.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            etag = etag_func(request, *args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+            return with_etag(view(request, *args, **kwargs), etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,134 @@
+"""
+Full-text search helpers.
+
+On SQLite the searchable text lives in FTS5 virtual tables that mirror a regular
+table (external content) and are kept in sync by triggers, so rows inserted with
+bulk_create or deleted in batches are indexed without any extra Python work.
+Other database backends fall back to a plain ``icontains`` scan.
+
+Snippets are HTML: the indexed text is escaped and only the <mark> highlight
+tags are added, so clients can render them as-is.
+"""
+import html
+import re
+
+from django.db import connection
+
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+SNIPPET_ELLIPSIS = '…'
+# Private-use characters FTS5 puts around matches, turned into the <mark> tags after escaping
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled(conn=None):
+    """Return True if the database backend supports our FTS5 tables"""
+    return (conn or connection).vendor == 'sqlite'
+
+
+def fts_table_name(content_table):
+    return f"{content_table}_fts"
+
+
+def create_fts_table(schema_editor, content_table, column):
+    """Create an FTS5 index over `content_table.column` plus the sync triggers"""
+    if not fts_enabled(schema_editor.connection):
+        return
+    fts_table = fts_table_name(content_table)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+        f"{column}, content='{content_table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        # Index rows that already exist in the content table
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_fts_table(schema_editor, content_table):
+    """Reverse of create_fts_table"""
+    if not fts_enabled(schema_editor.connection):
+        return
+    fts_table = fts_table_name(content_table)
+    with schema_editor.connection.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+def build_match_query(text):
+    """
+    Turn free user input into a safe FTS5 MATCH expression.
+    Every word must match; the last one is treated as a prefix so results
+    show up while the user is still typing.
+    """
+    tokens = TOKEN_PATTERN.findall(text or '')
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(content_table, column, text, limit, where='', params=None, snippet_tokens=16, offset=0):
+    """
+    Search an FTS5 index and return (rowid, snippet) tuples ordered by relevance,
+    skipping the first `offset` matches.
+
+    `where` is an optional extra SQL condition on the content table (aliased as c),
+    e.g. to scope results to rows the current user may see.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    fts_table = fts_table_name(content_table)
+    sql = (
+        f"SELECT {fts_table}.rowid, "
+        f"snippet({fts_table}, 0, %s, %s, %s, %s) "
+        f"FROM {fts_table} JOIN {content_table} c ON c.id = {fts_table}.rowid "
+        f"WHERE {fts_table} MATCH %s {'AND ' + where if where else ''} "
+        f"ORDER BY {fts_table}.rank LIMIT %s OFFSET %s"
+    )
+    query_params = [MATCH_START, MATCH_END, SNIPPET_ELLIPSIS, snippet_tokens, match]
+    query_params += list(params or [])
+    query_params += [limit, offset]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, query_params)
+        return [(rowid, highlight(snippet)) for rowid, snippet in cursor.fetchall()]
+
+
+def highlight(snippet):
+    """Escape a snippet with MATCH_START/MATCH_END markers and turn the markers into <mark> tags"""
+    return html.escape(snippet).replace(MATCH_START, SNIPPET_START).replace(MATCH_END, SNIPPET_END)
+
+
+def make_snippet(text, query, radius=80):
+    """Build a highlighted snippet in Python (used when FTS5 is not available)"""
+    text = text or ''
+    lowered = text.lower()
+    position = lowered.find((query or '').lower())
+    if position == -1:
+        return html.escape(text[:radius * 2])
+    start = max(0, position - radius)
+    end = min(len(text), position + len(query) + radius)
+    snippet = (
+        html.escape(text[start:position]) + SNIPPET_START + html.escape(text[position:position + len(query)])
+        + SNIPPET_END + html.escape(text[position + len(query):end])
+    )
+    if start > 0:
+        snippet = SNIPPET_ELLIPSIS + snippet
+    if end < len(text):
+        snippet += SNIPPET_ELLIPSIS
+    return snippet
@@ -0,0 +1,37 @@
+"""
+Password hashers whose cost comes from settings.
+
+PASSWORD_HASHER picks the hasher for new passwords ('pbkdf2' or 'argon2'), and
+PBKDF2_ITERATIONS / ARGON2_* set its cost. The other hashers stay listed in
+PASSWORD_HASHERS, so existing hashes keep verifying. On a successful login,
+User.check_password re-hashes the password with the preferred hasher and cost
+whenever the stored hash uses another algorithm or other parameters, so changing
+the policy upgrades hashes as users log in. Measure the cost per login with
+`manage.py benchmark_password_hashing` before changing it.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with PBKDF2_ITERATIONS iterations; same algorithm name, so Django's hashes verify as-is"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and ARGON2_PARALLELISM; needs argon2-cffi"""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
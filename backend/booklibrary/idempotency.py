@@ -0,0 +1,86 @@
+"""
+Idempotency-Key support for mutating endpoints.
+
+A client that may retry a request (e.g. on flaky Wi-Fi) sends the same
+`Idempotency-Key` header with every attempt. The first attempt runs the view and
+stores its response in the same transaction; retries get the stored response back
+without touching the data again. Keys are scoped per user and expire after
+IDEMPOTENCY_KEY_TTL seconds (see cleanup_idempotency_keys).
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def request_fingerprint(request):
+    """Hash of what makes two requests "the same": method, path and body"""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def replay(record):
+    response = Response(json.loads(record.response_body), status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Decorator for function views: honour the Idempotency-Key header if present"""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        IdempotencyKey.objects.filter(
+            user=request.user, key=key, created_at__lt=timezone.now() - key_ttl()
+        ).delete()
+
+        with transaction.atomic():
+            try:
+                # The key row is inserted first: a concurrent retry waits on the unique
+                # index and then finds the committed response instead of running the view
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(user=request.user, key=key, request_hash=fingerprint)
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+                if record is None or record.status_code is None:
+                    return Response({'error': f'A request with this {HEADER} is already in progress'},
+                                    status=status.HTTP_409_CONFLICT)
+                if record.request_hash != fingerprint:
+                    return Response({'error': f'{HEADER} was already used for a different request'},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return replay(record)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code >= 500:
+                # Nothing is remembered, so the client can retry with the same key
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.response_body = json.dumps(response.data, cls=DjangoJSONEncoder, separators=(',', ':'))
+            record.save(update_fields=['status_code', 'response_body'])
+            return response
+
+    return wrapper
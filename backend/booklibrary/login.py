@@ -0,0 +1,92 @@
+"""
+Login lookup and throttling for the email/username token endpoint.
+
+Users log in with their school email, the part before @nlenau.ro, or their
+username, in any letter case. All candidates are resolved in one query against
+LOWER(email) / LOWER(username), which are indexed (migration 0039), instead of one
+case-insensitive scan of auth_user per candidate.
+
+Attempts are rate limited with token buckets kept in the Django cache: one per
+client IP and one per account. Each bucket holds up to BURST attempts and refills
+at PER_MINUTE attempts a minute, so a class logging in together from the school
+network goes through while password guessing is slowed down. With the default
+LocMemCache the buckets are per process; point CACHE_BACKEND at a shared cache
+to enforce the limits across workers.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import models
+from django.db.models.functions import Lower
+from rest_framework.throttling import BaseThrottle
+
+SCHOOL_DOMAIN = 'nlenau.ro'
+PREFIX = 'login_throttle'
+
+
+def find_user(identifier):
+    """
+    The user an email or username (any case) refers to, or None. Tried in order:
+    the email (a bare username gets @nlenau.ro appended), the part before
+    @nlenau.ro as username, then the input itself as username.
+    """
+    identifier = identifier.lower()
+    if '@' in identifier:
+        email = identifier
+        usernames = [identifier]
+        if identifier.endswith(f'@{SCHOOL_DOMAIN}'):
+            usernames.insert(0, identifier.split('@')[0])
+    else:
+        email = f'{identifier}@{SCHOOL_DOMAIN}'
+        usernames = [identifier]
+
+    candidates = list(
+        User.objects.select_related('email_verification').alias(
+            email_lower=Lower('email'), username_lower=Lower('username')
+        ).filter(models.Q(email_lower=email) | models.Q(username_lower__in=usernames)).order_by('id')
+    )
+    for user in candidates:
+        if user.email.lower() == email:
+            return user
+    for username in usernames:
+        for user in candidates:
+            if user.username.lower() == username:
+                return user
+    return None
+
+
+def take_token(key, burst, per_minute):
+    """
+    Take one attempt from the token bucket `key`. Returns 0 when allowed, otherwise
+    the number of seconds until the next attempt is. A zero limit disables the bucket.
+    """
+    if not burst or not per_minute:
+        return 0
+    rate = per_minute / 60
+    now = time.time()
+    # Not atomic: concurrent attempts may share a token, which only makes the limit slightly lenient
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # Kept until the bucket would be full again, after which a missing key means the same
+    cache.set(key, (tokens, now), timeout=math.ceil((burst - tokens) / rate) + 1)
+    return 0 if allowed else math.ceil((1 - tokens) / rate)
+
+
+def throttle_ip(request):
+    """Seconds to wait before this client may try again (0 = go ahead)"""
+    # Honours X-Forwarded-For according to REST_FRAMEWORK['NUM_PROXIES'], like DRF's throttles
+    ident = BaseThrottle().get_ident(request)
+    return take_token(f'{PREFIX}:ip:{ident}', getattr(settings, 'LOGIN_THROTTLE_IP_BURST', 300),
+                      getattr(settings, 'LOGIN_THROTTLE_IP_PER_MINUTE', 120))
+
+
+def throttle_account(user):
+    """Seconds to wait before this account may be tried again (0 = go ahead)"""
+    return take_token(f'{PREFIX}:account:{user.id}', getattr(settings, 'LOGIN_THROTTLE_ACCOUNT_BURST', 10),
+                      getattr(settings, 'LOGIN_THROTTLE_ACCOUNT_PER_MINUTE', 5))
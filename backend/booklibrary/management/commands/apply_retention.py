@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from booklibrary import retention
+
+
+class Command(BaseCommand):
+    help = 'Move read messages and notifications older than their retention period into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many rows each policy would archive without changing anything',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Delete expired rows instead of archiving them',
+        )
+        parser.add_argument(
+            '--only',
+            choices=sorted(retention.POLICIES),
+            help='Apply a single policy',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=retention.DEFAULT_BATCH_SIZE,
+            help=f'Rows moved per transaction (default: {retention.DEFAULT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        names = [options['only']] if options['only'] else sorted(retention.POLICIES)
+        action = 'delete' if options['delete'] else 'archive'
+
+        for name in names:
+            days = retention.retention_days(name)
+            if options['dry_run']:
+                count = retention.expired(name).count()
+                self.stdout.write(self.style.WARNING(
+                    f'[DRY RUN] Would {action} {count} read {name} older than {days} days'
+                ))
+                continue
+            removed = retention.apply_policy(name, archive=not options['delete'],
+                                             batch_size=max(1, options['batch_size']))
+            self.stdout.write(self.style.SUCCESS(f'✓ {name}: {removed} rows older than {days} days {action}d'))
@@ -0,0 +1,74 @@
+import math
+import os
+import time
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Measure password hashes per second per core with the configured hasher, to size workers for login peaks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=3,
+            help='How long to keep hashing (default: 3)',
+        )
+        parser.add_argument(
+            '--peak',
+            type=int,
+            default=0,
+            help='Logins expected in the peak, e.g. every student at the first bell',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=60,
+            help='Seconds the peak is spread over (default: 60)',
+        )
+
+    def handle(self, *args, **options):
+        hasher = get_hasher('default')
+        password = 'benchmark-password'
+        try:
+            encoded = hasher.encode(password, hasher.salt())
+        except ValueError as e:
+            # Missing optional library, e.g. argon2-cffi
+            raise CommandError(f'Cannot use the {hasher.algorithm} hasher: {e}')
+        parameters = ', '.join(
+            f'{key}: {value}' for key, value in hasher.safe_summary(encoded).items()
+            if key not in ('algorithm', 'salt', 'hash')
+        )
+        self.stdout.write(f'Hasher: {hasher.algorithm} ({parameters})')
+
+        # A login verifies one hash; verifying costs the same as hashing
+        hashes = 0
+        started = time.perf_counter()
+        while True:
+            hasher.verify(password, encoded)
+            hashes += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= options['seconds']:
+                break
+
+        per_core = hashes / elapsed
+        cores = os.cpu_count() or 1
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {per_core:.1f} hashes/sec per core ({1000 / per_core:.0f} ms of CPU per login)'
+        ))
+        self.stdout.write(f'  ~{per_core * cores:.0f} logins/sec with all {cores} cores busy hashing')
+
+        if options['peak']:
+            needed = options['peak'] / max(1, options['window'])
+            # A sync worker is busy for the whole hash, so each one adds about one core's worth
+            workers = math.ceil(needed / per_core)
+            message = (f'  Peak of {options["peak"]} logins in {options["window"]}s = {needed:.1f} logins/sec: '
+                       f'at least {workers} worker processes just for hashing')
+            if workers > cores:
+                self.stdout.write(self.style.WARNING(
+                    f'{message.strip()}, more than the {cores} cores here; lower the hashing cost or add servers'
+                ))
+            else:
+                self.stdout.write(message)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from booklibrary.idempotency import key_ttl
+from booklibrary.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many keys would be deleted without deleting them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of keys deleted per statement (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        expired = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - key_ttl())
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'[DRY RUN] Would delete {expired.count()} expired idempotency keys'))
+            return
+
+        # Bounded batches keep each delete (and its lock) short
+        batch_size = max(1, options['batch_size'])
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} expired idempotency keys.'))
@@ -0,0 +1,138 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from booklibrary.models import Book, ExamModel
+from booklibrary.utils import media_path_from_url
+
+QUARANTINE_DIR = 'quarantine'
+
+
+class Command(BaseCommand):
+    help = 'Delete or quarantine media files that are not referenced by any Book or ExamModel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be removed without actually removing anything',
+        )
+        parser.add_argument(
+            '--quarantine',
+            action='store_true',
+            help=f'Move orphaned files under {QUARANTINE_DIR}/ instead of deleting them',
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=int,
+            default=24,
+            help='Only consider files older than this, so fresh uploads can still be attached (default: 24)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of files removed per batch (default: 200)',
+        )
+
+    def referenced_paths(self):
+        """Collect every media path referenced from the database in a single pass per table"""
+        referenced = set()
+        for pdf_file, thumbnail_url in Book.objects.values_list('pdf_file', 'thumbnail_url').iterator():
+            for value in (pdf_file, thumbnail_url):
+                path = media_path_from_url(value)
+                if path:
+                    referenced.add(path)
+        for pdf_file in ExamModel.objects.values_list('pdf_file', flat=True).iterator():
+            path = media_path_from_url(pdf_file)
+            if path:
+                referenced.add(path)
+        return referenced
+
+    def walk(self, directory=''):
+        """Yield every file name in storage, recursively"""
+        try:
+            directories, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield posixpath.join(directory, name) if directory else name
+        for name in directories:
+            if not directory and name == QUARANTINE_DIR:
+                continue
+            yield from self.walk(posixpath.join(directory, name) if directory else name)
+
+    def is_old_enough(self, path, cutoff):
+        try:
+            return default_storage.get_modified_time(path) < cutoff
+        except (NotImplementedError, OSError):
+            return True
+
+    def quarantine(self, path, stamp):
+        target = posixpath.join(QUARANTINE_DIR, stamp, path)
+        with default_storage.open(path, 'rb') as source:
+            default_storage.save(target, source)
+        default_storage.delete(path)
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        quarantine = options['quarantine']
+        batch_size = max(1, options['batch_size'])
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+        stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+
+        referenced = self.referenced_paths()
+        self.stdout.write(f'Found {len(referenced)} media files referenced from the database.')
+
+        orphaned = []
+        total_size = 0
+        scanned = 0
+        for path in self.walk():
+            scanned += 1
+            if path in referenced or not self.is_old_enough(path, cutoff):
+                continue
+            try:
+                size = default_storage.size(path)
+            except OSError:
+                size = 0
+            orphaned.append(path)
+            total_size += size
+            self.stdout.write(f'  - {path} ({size / 1024:.1f} KB)')
+
+        self.stdout.write(
+            f'\nScanned {scanned} files, {len(orphaned)} orphaned ({total_size / (1024 * 1024):.2f} MB).'
+        )
+
+        if not orphaned:
+            self.stdout.write(self.style.SUCCESS('No orphaned media files found.'))
+            return
+
+        action = 'quarantine' if quarantine else 'delete'
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'[DRY RUN] Would {action} {len(orphaned)} files')
+            )
+            return
+
+        processed = 0
+        errors = 0
+        for start in range(0, len(orphaned), batch_size):
+            batch = orphaned[start:start + batch_size]
+            for path in batch:
+                try:
+                    if quarantine:
+                        self.quarantine(path, stamp)
+                    else:
+                        default_storage.delete(path)
+                    processed += 1
+                except Exception as e:
+                    errors += 1
+                    self.stdout.write(self.style.ERROR(f'    ✗ Error processing {path}: {e}'))
+            self.stdout.write(f'  Batch done: {processed}/{len(orphaned)}')
+
+        past = 'Quarantined' if quarantine else 'Deleted'
+        self.stdout.write(
+            self.style.SUCCESS(f'\n{past} {processed} orphaned files ({errors} errors).')
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from booklibrary.models import SyncTombstone
+from booklibrary.sync import expired_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete delta-sync tombstones older than SYNC_TOMBSTONE_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many tombstones would be deleted without deleting them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of tombstones deleted per statement (default: 5000)',
+        )
+
+    def handle(self, *args, **options):
+        expired = expired_tombstones()
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'[DRY RUN] Would delete {expired.count()} expired sync tombstones'))
+            return
+
+        batch_size = max(1, options['batch_size'])
+        deleted = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += SyncTombstone.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {deleted} expired sync tombstones.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from booklibrary.broadcasts import deliver, pending_broadcasts
+
+
+class Command(BaseCommand):
+    help = 'Deliver broadcast messages that are pending or whose background worker stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the broadcasts that would be delivered',
+        )
+
+    def handle(self, *args, **options):
+        pending = list(pending_broadcasts())
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('No broadcasts waiting for delivery.'))
+            return
+
+        for broadcast in pending:
+            remaining = broadcast.recipient_count - broadcast.delivered_count
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(
+                    f'[DRY RUN] Would deliver broadcast #{broadcast.id} (~{remaining} recipients left)'
+                ))
+                continue
+            created = deliver(broadcast.id)
+            self.stdout.write(f'  ✓ Broadcast #{broadcast.id}: {created} messages delivered')
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'✓ Processed {len(pending)} broadcasts.'))
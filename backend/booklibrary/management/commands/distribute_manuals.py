@@ -0,0 +1,72 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from booklibrary.manual_distribution import DistributionError, distribute_manuals
+from booklibrary.notifications import create_librarian_notification
+
+
+class Command(BaseCommand):
+    help = 'Lend all manuals of a class grade to every student of the class for a school year'
+
+    def add_arguments(self, parser):
+        parser.add_argument('student_class', help="Class, e.g. 'V-A', or 'V' for every V-x class")
+        parser.add_argument('school_year', help="School year, e.g. '2026-2027' (manuals are due at its end)")
+        parser.add_argument(
+            '--waitlist',
+            action='store_true',
+            help='Put students who cannot get a manual on its waitlist',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as the librarian who distributed the manuals',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be lent and the shortages without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        actor = None
+        if options['user']:
+            try:
+                actor = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found")
+
+        try:
+            summary = distribute_manuals(
+                options['student_class'], options['school_year'],
+                actor=actor, dry_run=dry_run, waitlist=options['waitlist'],
+            )
+        except DistributionError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Class {summary['student_class']}: {summary['students']} students, {summary['manuals']} manuals, "
+            f"{summary['already_assigned']} already assigned."
+        )
+        for shortage in summary['shortages']:
+            self.stdout.write(self.style.ERROR(
+                f"  ✗ {shortage['name']}: {shortage['missing']} missing "
+                f"({shortage['available']}/{shortage['needed']} available)"
+            ))
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"\n[DRY RUN] Would create {summary['created']} loans and waitlist {summary['waitlisted']} students"
+            ))
+            return
+
+        if summary['created']:
+            create_librarian_notification(
+                notification_type='manuals_assigned',
+                message=f"Manuale distribuite clasei {summary['student_class']}: {summary['created']} împrumuturi, "
+                        f"{len(summary['shortages'])} manuale cu stoc insuficient",
+                created_by=actor
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✓ Created {summary['created']} loans, waitlisted {summary['waitlisted']} students."
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from booklibrary.borrowing_states import apply_transition, expired_ready_holds, hold_pickup_window
+
+
+class Command(BaseCommand):
+    help = 'Cancel waitlist copies not collected within HOLD_PICKUP_DAYS and pass them to the next in line'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many holds would expire without changing anything',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of holds cancelled per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        ids = list(expired_ready_holds().order_by('id').values_list('id', flat=True))
+
+        if not ids:
+            self.stdout.write(self.style.SUCCESS('No uncollected holds found.'))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'[DRY RUN] Would cancel {len(ids)} holds not collected within {hold_pickup_window().days} days'
+            ))
+            return
+
+        cancelled = 0
+        for start in range(0, len(ids), batch_size):
+            # Cancelling releases the reserved copy, which is promoted to the next hold in the same transaction
+            results, _ = apply_transition('cancel', ids[start:start + batch_size])
+            cancelled += sum(1 for result in results if result['success'])
+            self.stdout.write(f'  Batch done: {cancelled}/{len(ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Cancelled {cancelled} uncollected holds.'))
@@ -0,0 +1,82 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from booklibrary.catalog_import import CatalogImportError, import_catalog
+from booklibrary.notifications import create_librarian_notification
+
+
+class Command(BaseCommand):
+    help = 'Bulk import books from a CSV or XLSX file (books are matched on name + author)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the .csv or .xlsx file')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows written per batch (default: 500)',
+        )
+        parser.add_argument(
+            '--user',
+            help='Username recorded as the author of the import notification',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        dry_run = options['dry_run']
+
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        created_by = None
+        if options['user']:
+            try:
+                created_by = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found")
+
+        def progress(summary):
+            self.stdout.write(
+                f"  {summary['rows']} rows processed "
+                f"({summary['created']} created, {summary['updated']} updated, {summary['failed']} failed)"
+            )
+
+        try:
+            with open(path, 'rb') as file:
+                summary = import_catalog(
+                    file, path, batch_size=max(1, options['batch_size']), dry_run=dry_run, progress=progress
+                )
+        except CatalogImportError as e:
+            raise CommandError(str(e))
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.ERROR(f"  ✗ Row {error['row']}: {error['errors']}"))
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"\n[DRY RUN] Would create {summary['created']} and update {summary['updated']} books "
+                    f"({summary['failed']} invalid rows)"
+                )
+            )
+            return
+
+        if summary['created'] or summary['updated']:
+            create_librarian_notification(
+                notification_type='books_imported',
+                message=f"Import catalog: {summary['created']} cărți adăugate, {summary['updated']} actualizate",
+                created_by=created_by
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nImported {summary['rows']} rows: {summary['created']} created, "
+                f"{summary['updated']} updated, {summary['failed']} failed."
+            )
+        )
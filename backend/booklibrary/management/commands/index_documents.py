@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from booklibrary.document_index import index_documents, pdf_support_available
+
+
+class Command(BaseCommand):
+    help = 'Extract text from new or changed manual/exam model PDFs into the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes used for PDF extraction (default: CPU count)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-extract every document, even if its file did not change',
+        )
+
+    def handle(self, *args, **options):
+        if not pdf_support_available():
+            raise CommandError('pypdf is required for text extraction. Install it with: pip install pypdf')
+
+        workers = max(1, options['workers'])
+
+        def progress(job, page_count, error):
+            document_type, object_id, file_name = job[:3]
+            if error:
+                self.stdout.write(self.style.ERROR(f'  ✗ {document_type} #{object_id} ({file_name}): {error}'))
+            else:
+                self.stdout.write(f'  ✓ {document_type} #{object_id} ({file_name}): {page_count} pages')
+
+        self.stdout.write(f'Indexing documents with {workers} worker(s)...')
+        stats = index_documents(workers=workers, full=options['full'], progress=progress)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\nIndexed {stats['indexed']} documents, {stats['failed']} failed, "
+                f"{stats['removed']} removed from the index."
+            )
+        )
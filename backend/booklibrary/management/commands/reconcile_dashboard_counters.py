@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from booklibrary import counters
+from booklibrary.models import DashboardCounter
+
+
+class Command(BaseCommand):
+    help = 'Recompute the librarian dashboard counters from scratch and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report counters that drifted, without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        with transaction.atomic():
+            expected = counters.compute_all()
+            stored = counters.get_values(list(expected))
+            drifted = {key: value for key, value in expected.items() if stored[key] != value}
+            stale = counters.stale_daily_keys()
+
+            for key, value in sorted(drifted.items()):
+                self.stdout.write(self.style.ERROR(f'  ✗ {key}: stored {stored[key]}, actual {value}'))
+
+            if not drifted and not stale:
+                self.stdout.write(self.style.SUCCESS('All dashboard counters are up to date.'))
+                return
+
+            if dry_run:
+                self.stdout.write(self.style.WARNING(
+                    f'[DRY RUN] Would fix {len(drifted)} counters and remove {len(stale)} old daily counters'
+                ))
+                return
+
+            for key, value in drifted.items():
+                DashboardCounter.objects.update_or_create(key=key, defaults={'value': value})
+            DashboardCounter.objects.filter(key__in=stale).delete()
+            counters.invalidate(list(drifted) + stale)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Fixed {len(drifted)} counters, removed {len(stale)} old daily counters.'
+        ))
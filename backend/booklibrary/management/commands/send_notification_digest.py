@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from booklibrary import counters
+from booklibrary.notifications import digest_period, librarian_digest
+
+
+class Command(BaseCommand):
+    help = 'Email librarians a summary of the notifications of the last day'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Period covered by the digest, in hours (default: 24)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the digest instead of sending it',
+        )
+
+    def handle(self, *args, **options):
+        hours = max(1, options['hours'])
+        # Ends NOTIFICATION_COALESCE_SECONDS ago, so notifications still gathering events wait for the next run
+        lines = librarian_digest(*digest_period(hours))
+        if not lines:
+            self.stdout.write(self.style.SUCCESS('No librarian notifications in this period, nothing to send.'))
+            return
+
+        unread = counters.get_values([counters.UNREAD_LIBRARIAN_NOTIFICATIONS])[counters.UNREAD_LIBRARIAN_NOTIFICATIONS]
+        body = '\n'.join(
+            [f'Activitatea bibliotecii în ultimele {hours} ore:', '']
+            + [f'- {label}: {events}' for label, events in lines]
+            + ['', f'Notificări necitite: {unread}']
+        )
+        recipients = list(
+            User.objects.filter(groups__name='Librarians', is_active=True).exclude(email='')
+            .values_list('email', flat=True).distinct()
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'[DRY RUN] Would send to {len(recipients)} librarians:'))
+            self.stdout.write(body)
+            return
+        if not recipients:
+            self.stdout.write(self.style.WARNING('No librarian has an email address, nothing sent.'))
+            return
+
+        send_mail('Rezumat zilnic Lenbrary', body, settings.DEFAULT_FROM_EMAIL, recipients)
+        self.stdout.write(self.style.SUCCESS(f'✓ Digest sent to {len(recipients)} librarians.'))
@@ -0,0 +1,151 @@
+"""
+Class-wide distribution of manuals at the start of the school year.
+
+For a class (e.g. 'V-A', or 'V' for every V-x class) every student gets a loan for
+each manual whose `Book.book_class` matches the class grade, until the end of the
+school year. Stock is checked and decremented under a row lock in the same
+transaction as the bulk insert; students who cannot be served are reported as
+shortages and can optionally be put on the book's waitlist.
+"""
+import re
+from datetime import datetime
+
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import counters, response_cache
+from .borrowing_states import log_created, reserved_counts
+from .models import Book, BookBorrowing, BookHold, Notification, Student
+
+SCHOOL_YEAR_PATTERN = re.compile(r'^(\d{4})-(\d{4})$')
+SCHOOL_YEAR_END = (6, 30)  # Manuals are due back at the end of June
+ACTIVE_STATUSES = ['IN_ASTEPTARE', 'APROBAT', 'GATA_RIDICARE', 'IMPRUMUTAT', 'INTARZIAT']
+
+
+class DistributionError(Exception):
+    """Invalid class or school year"""
+
+
+def class_grade(student_class):
+    """Grade of a student class, matching Book.book_class: 'V-A' -> 'V', 'IX' -> 'IX'"""
+    return student_class.split('-')[0]
+
+
+def students_in_class(student_class):
+    """Students of a class ('V-A'), or of every class of a grade ('V')"""
+    if '-' in student_class:
+        return Student.objects.filter(student_class=student_class)
+    grade = class_grade(student_class)
+    return Student.objects.filter(models.Q(student_class=student_class) | models.Q(student_class__startswith=f'{grade}-'))
+
+
+def school_year_end(school_year):
+    """Due date for a school year given as '2026-2027'"""
+    match = SCHOOL_YEAR_PATTERN.match(school_year or '')
+    if not match or int(match.group(2)) != int(match.group(1)) + 1:
+        raise DistributionError('school_year must look like 2026-2027')
+    month, day = SCHOOL_YEAR_END
+    return timezone.make_aware(datetime(int(match.group(2)), month, day, 23, 59))
+
+
+def distribute_manuals(student_class, school_year, actor=None, dry_run=False, waitlist=False):
+    """
+    Lend every manual of the class grade to every student of the class.
+    Students who already have an active loan or request for a manual are skipped,
+    so running the job twice does not create duplicates. Returns a summary.
+    """
+    due_date = school_year_end(school_year)
+    grade = class_grade(student_class or '')
+    if grade not in dict(Book.CLASS_CHOICES):
+        raise DistributionError(f'Unknown class: {student_class}')
+
+    students = list(
+        students_in_class(student_class).select_related('user').order_by('user__last_name', 'user__first_name', 'id')
+    )
+
+    summary = {
+        'student_class': student_class,
+        'school_year': school_year,
+        'students': len(students),
+        'manuals': 0,
+        'created': 0,
+        'already_assigned': 0,
+        'waitlisted': 0,
+        'shortages': [],
+    }
+    if not students:
+        return summary
+
+    with transaction.atomic():
+        books = list(
+            Book.objects.select_for_update().filter(type='manual', book_class=grade).order_by('name')
+        )
+        summary['manuals'] = len(books)
+        reserved = reserved_counts(book.id for book in books)
+        existing = set(
+            BookBorrowing.objects.filter(
+                student__in=students, book__in=books, status__in=ACTIVE_STATUSES
+            ).values_list('student_id', 'book_id')
+        )
+
+        now = timezone.now()
+        borrowings = []
+        holds = []
+        for book in books:
+            needed = [student for student in students if (student.id, book.id) not in existing]
+            summary['already_assigned'] += len(students) - len(needed)
+            # Copies already assigned to waitlisted students are not handed out again
+            served = needed[:max(0, book.stock - reserved.get(book.id, 0))]
+            missing = needed[len(served):]
+            book.stock -= len(served)
+            book.updated_at = now  # bulk_update does not apply auto_now
+            borrowings.extend(
+                BookBorrowing(
+                    book=book,
+                    student=student,
+                    status='IMPRUMUTAT',
+                    approved_date=now,
+                    pickup_date=now,
+                    borrow_date=now,
+                    due_date=due_date,
+                )
+                for student in served
+            )
+            if missing:
+                summary['shortages'].append({
+                    'book_id': book.id,
+                    'name': book.name,
+                    'needed': len(needed),
+                    'available': len(served),
+                    'missing': len(missing),
+                })
+                if waitlist:
+                    holds.extend(BookHold(book=book, student=student) for student in missing)
+        summary['created'] = len(borrowings)
+        summary['waitlisted'] = len(holds)
+
+        if dry_run:
+            return summary
+
+        BookBorrowing.objects.bulk_create(borrowings, batch_size=500)
+        log_created(borrowings, actor=actor, action='class_distribution')
+        Book.objects.bulk_update(books, ['stock', 'updated_at'], batch_size=500)
+        response_cache.invalidate('books')
+        # Students already waiting for a manual keep their place in line
+        BookHold.objects.bulk_create(holds, batch_size=500, ignore_conflicts=True)
+
+        # One notification per student instead of one per manual
+        received = {}
+        for borrowing in borrowings:
+            received[borrowing.student.user_id] = received.get(borrowing.student.user_id, 0) + 1
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                notification_type='manuals_assigned',
+                message=f"Ai primit {count} manuale pentru anul școlar {school_year}",
+            )
+            for user_id, count in received.items()
+        ], batch_size=500)
+        counters.increment_each(counters.unread_notifications_key(user_id) for user_id in received)
+
+    return summary
@@ -0,0 +1,57 @@
+"""
+Full-text search over message contents.
+
+Messages are indexed in an FTS5 table kept in sync by triggers (see fulltext.py
+and migration 0035), so new, edited and bulk-created messages are searchable as
+soon as they are committed. Results are limited to conversations the user takes
+part in.
+"""
+from django.db import models
+
+from . import fulltext
+from .models import Message
+from .utils import get_display_name
+
+MESSAGE_TABLE = Message._meta.db_table
+
+
+def search_messages(user, query, conversation_id=None, limit=20, offset=0):
+    """
+    Messages sent or received by `user` matching `query`, best matches first.
+    Returns (results, has_more); each result carries a highlighted snippet.
+    """
+    if fulltext.fts_enabled():
+        where = '(c.sender_id = %s OR c.recipient_id = %s)'
+        params = [user.id, user.id]
+        if conversation_id:
+            where += ' AND c.conversation_id = %s'
+            params.append(conversation_id)
+        # One extra row tells whether there is another page
+        rows = fulltext.search(MESSAGE_TABLE, 'content', query, limit + 1, where=where, params=params, offset=offset)
+        message_ids = [row[0] for row in rows[:limit]]
+        snippets = {row[0]: row[1] for row in rows}
+        messages = Message.objects.select_related('sender', 'recipient').in_bulk(message_ids)
+        hits = [(messages[message_id], snippets[message_id]) for message_id in message_ids if message_id in messages]
+        has_more = len(rows) > limit
+    else:
+        queryset = Message.objects.filter(
+            models.Q(sender=user) | models.Q(recipient=user), content__icontains=query
+        ).select_related('sender', 'recipient').order_by('-timestamp', '-id')
+        if conversation_id:
+            queryset = queryset.filter(conversation_id=conversation_id)
+        page = list(queryset[offset:offset + limit + 1])
+        hits = [(message, fulltext.make_snippet(message.content, query)) for message in page[:limit]]
+        has_more = len(page) > limit
+
+    results = []
+    for message, snippet in hits:
+        other_user = message.recipient if message.sender_id == user.id else message.sender
+        results.append({
+            'id': message.id,
+            'conversation_id': message.conversation_id,
+            'other_user': {'id': other_user.id, 'name': get_display_name(other_user)},
+            'is_sent_by_me': message.sender_id == user.id,
+            'timestamp': message.timestamp.isoformat(),
+            'snippet': snippet,
+        })
+    return results, has_more
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from booklibrary.fulltext import create_fts_table, drop_fts_table
+
+
+def create_page_index(apps, schema_editor):
+    create_fts_table(schema_editor, 'booklibrary_documentpage', 'text')
+
+
+def drop_page_index(apps, schema_editor):
+    drop_fts_table(schema_editor, 'booklibrary_documentpage')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0021_alter_bookborrowing_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('book', 'Carte'), ('exam_model', 'Model de examen')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('file_name', models.CharField(max_length=500)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('file_modified', models.DateTimeField(blank=True, null=True)),
+                ('page_count', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('document_type', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='booklibrary.indexeddocument')),
+            ],
+            options={
+                'ordering': ['document', 'page_number'],
+                'unique_together': {('document', 'page_number')},
+            },
+        ),
+        migrations.RunPython(create_page_index, drop_page_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0022_document_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('book_added', 'Carte adăugată'), ('stock_updated', 'Stoc actualizat'), ('book_deleted', 'Carte ștearsă'), ('book_requested', 'Carte solicitată'), ('request_approved', 'Cerere aprobată'), ('request_rejected', 'Cerere respinsă'), ('book_returned', 'Carte returnată'), ('extension_requested', 'Extindere solicitată'), ('books_imported', 'Cărți importate')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0023_notification_books_imported'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCopy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('DISPONIBIL', 'Disponibil'), ('IMPRUMUTAT', 'Împrumutat'), ('PIERDUT', 'Pierdut'), ('RETRAS', 'Retras')], default='DISPONIBIL', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copies', to='booklibrary.book')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookborrowing',
+            name='copy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='borrowings', to='booklibrary.bookcopy'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0024_book_copies'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('book_added', 'Carte adăugată'), ('stock_updated', 'Stoc actualizat'), ('book_deleted', 'Carte ștearsă'), ('book_requested', 'Carte solicitată'), ('request_approved', 'Cerere aprobată'), ('request_rejected', 'Cerere respinsă'), ('book_returned', 'Carte returnată'), ('extension_requested', 'Extindere solicitată'), ('books_imported', 'Cărți importate'), ('hold_ready', 'Rezervare disponibilă')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BookHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_duration_days', models.IntegerField(choices=[(7, '1 Săptămână'), (14, '2 Săptămâni'), (30, '1 Lună'), (60, '2 Luni')], default=14)),
+                ('status', models.CharField(choices=[('IN_ASTEPTARE', 'În așteptare'), ('ALOCAT', 'Alocat'), ('ANULAT', 'Anulat')], default='IN_ASTEPTARE', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='booklibrary.book')),
+                ('borrowing', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='hold', to='booklibrary.bookborrowing')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='booklibrary.student')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['book', 'status', 'created_at'], name='bookhold_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookhold',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'IN_ASTEPTARE')), fields=('book', 'student'), name='unique_waiting_hold'),
+        ),
+    ]
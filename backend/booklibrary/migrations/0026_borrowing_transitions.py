@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0025_book_holds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorrowingTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=20)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(max_length=20)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('seconds_in_previous_status', models.PositiveIntegerField(blank=True, null=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('borrowing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='booklibrary.bookborrowing')),
+            ],
+            options={
+                'ordering': ['timestamp', 'id'],
+                'indexes': [models.Index(fields=['borrowing', 'timestamp'], name='transition_borrowing_idx'), models.Index(fields=['from_status', 'timestamp'], name='transition_status_idx')],
+            },
+        ),
+    ]
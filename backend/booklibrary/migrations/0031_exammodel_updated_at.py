@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0030_sync_updated_at_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exammodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
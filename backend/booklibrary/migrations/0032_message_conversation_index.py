@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0031_exammodel_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation_id', 'timestamp', 'id'], name='message_conversation_idx'),
+        ),
+    ]
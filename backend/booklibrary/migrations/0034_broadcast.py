@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-19 14:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0033_conversation_read_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('class', 'Clasă'), ('students', 'Toți elevii'), ('teachers', 'Toți profesorii')], max_length=20)),
+                ('student_class', models.CharField(blank=True, max_length=10)),
+                ('content', models.TextField()),
+                ('status', models.CharField(choices=[('IN_ASTEPTARE', 'În așteptare'), ('IN_CURS', 'În curs'), ('TRIMIS', 'Trimis')], default='IN_ASTEPTARE', max_length=20)),
+                ('recipient_count', models.IntegerField(default=0)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('last_recipient_id', models.BigIntegerField(default=0)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='broadcast',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='booklibrary.broadcast'),
+        ),
+    ]
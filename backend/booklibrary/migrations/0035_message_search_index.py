@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from booklibrary.fulltext import create_fts_table, drop_fts_table
+
+
+def create_message_index(apps, schema_editor):
+    create_fts_table(schema_editor, 'booklibrary_message', 'content')
+
+
+def drop_message_index(apps, schema_editor):
+    drop_fts_table(schema_editor, 'booklibrary_message')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booklibrary', '0034_broadcast'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_message_index, drop_message_index),
+    ]
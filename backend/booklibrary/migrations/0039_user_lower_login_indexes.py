@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Expression indexes on auth_user for the case-insensitive login lookup (see login.find_user)"""
+
+    dependencies = [
+        ('booklibrary', '0038_notification_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS booklibrary_user_email_lower_idx ON auth_user (LOWER(email))',
+            'DROP INDEX IF EXISTS booklibrary_user_email_lower_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS booklibrary_user_username_lower_idx ON auth_user (LOWER(username))',
+            'DROP INDEX IF EXISTS booklibrary_user_username_lower_idx',
+        ),
+    ]
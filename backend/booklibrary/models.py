@@ -36,6 +36,7 @@ class Book(models.Model):
     publication_year = models.IntegerField(blank=True, null=True)
     book_class = models.CharField(max_length=10, choices=CLASS_CHOICES, blank=True, null=True, verbose_name='Clasă')
     pdf_file = models.FileField(upload_to='books/', blank=True, null=True)  # PDF file for manuals
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Used by the delta-sync endpoint
 
     def __str__(self):
         return self.name
@@ -81,6 +82,23 @@ class Student(models.Model):
     def __str__(self):
         return f"{get_display_name(self.user)} ({self.student_id})"
 
+class BookCopy(models.Model):
+    """A physical copy of a book, identified by the barcode scanned at the desk"""
+    STATUS_CHOICES = [
+        ('DISPONIBIL', 'Disponibil'),
+        ('IMPRUMUTAT', 'Împrumutat'),
+        ('PIERDUT', 'Pierdut'),
+        ('RETRAS', 'Retras'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='copies')
+    barcode = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DISPONIBIL')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.barcode} - {self.book}"
+
 class BookBorrowing(models.Model):
     STATUS_CHOICES = [
         ('IN_ASTEPTARE', 'În așteptare'),
@@ -124,6 +142,9 @@ class BookBorrowing(models.Model):
     loan_duration_days = models.IntegerField(choices=LOAN_DURATION_CHOICES, default=14)  # Default 2 weeks
     student_message = models.TextField(blank=True, null=True)  # Message from student about extension request or other
     has_been_extended = models.BooleanField(default=False)  # Track if this loan has been extended before
+    copy = models.ForeignKey(BookCopy, null=True, blank=True, on_delete=models.SET_NULL,
+                             related_name='borrowings')  # Physical copy handed out, if scanned
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Used by the delta-sync endpoint
 
     def __str__(self):
         return f"{self.student} - {self.book} ({self.status})"
@@ -134,6 +155,131 @@ class BookBorrowing(models.Model):
             return max(0, days_overdue * 1.00)  # $1 per day
         return 0.00
 
+class BorrowingTransition(models.Model):
+    """Append-only log of BookBorrowing status changes, written by booklibrary.borrowing_states"""
+    borrowing = models.ForeignKey(BookBorrowing, on_delete=models.CASCADE, related_name='transitions')
+    action = models.CharField(max_length=20)
+    from_status = models.CharField(max_length=20, blank=True)  # Empty when the borrowing was created
+    to_status = models.CharField(max_length=20)
+    actor = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    timestamp = models.DateTimeField(default=timezone.now)
+    # Time the borrowing spent in from_status, stored so timing analytics never scan borrowings
+    seconds_in_previous_status = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['borrowing', 'timestamp'], name='transition_borrowing_idx'),
+            models.Index(fields=['from_status', 'timestamp'], name='transition_status_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('Borrowing transitions are append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.borrowing_id}: {self.from_status or '-'} → {self.to_status} ({self.action})"
+
+class DashboardCounter(models.Model):
+    """Named counter for the librarian dashboard, maintained by booklibrary.counters"""
+    key = models.CharField(max_length=100, unique=True)
+    value = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+class IdempotencyKey(models.Model):
+    """Response stored for an Idempotency-Key header, replayed on retries (see booklibrary.idempotency)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # Null while the request is running
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status_code})"
+
+class SyncTombstone(models.Model):
+    """Deleted row, reported by the delta-sync endpoint so clients can drop it from their cache"""
+    resource = models.CharField(max_length=20)  # 'books', 'my_books' or 'notifications'
+    object_id = models.BigIntegerField()
+    # Whose cache holds the row: the student for borrowings, the user for notifications, null for everyone
+    owner_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resource', 'deleted_at'], name='tombstone_resource_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource}:{self.object_id} deleted at {self.deleted_at}"
+
+class BookHold(models.Model):
+    """A place in the FIFO waitlist of a book that has no copies left"""
+    STATUS_CHOICES = [
+        ('IN_ASTEPTARE', 'În așteptare'),
+        ('ALOCAT', 'Alocat'),  # A returned copy was assigned, see `borrowing`
+        ('ANULAT', 'Anulat'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='holds')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='holds')
+    loan_duration_days = models.IntegerField(choices=BookBorrowing.LOAN_DURATION_CHOICES, default=14)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_ASTEPTARE')
+    created_at = models.DateTimeField(auto_now_add=True)
+    borrowing = models.OneToOneField(BookBorrowing, null=True, blank=True, on_delete=models.SET_NULL,
+                                     related_name='hold')
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['book', 'status', 'created_at'], name='bookhold_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'student'], condition=models.Q(status='IN_ASTEPTARE'),
+                                    name='unique_waiting_hold'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.book} ({self.status})"
+
+class Broadcast(models.Model):
+    """One message sent by a librarian to a whole class or role, delivered as one Message per recipient"""
+    AUDIENCE_CHOICES = [
+        ('class', 'Clasă'),
+        ('students', 'Toți elevii'),
+        ('teachers', 'Toți profesorii'),
+    ]
+    STATUS_CHOICES = [
+        ('IN_ASTEPTARE', 'În așteptare'),
+        ('IN_CURS', 'În curs'),
+        ('TRIMIS', 'Trimis'),
+    ]
+
+    sender = models.ForeignKey(User, related_name='broadcasts', on_delete=models.CASCADE)
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    student_class = models.CharField(max_length=10, blank=True)  # For audience 'class': 'V-A', or 'V' for the whole grade
+    content = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_ASTEPTARE')
+    recipient_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    # Delivery goes through recipients by user id; a restarted worker resumes after this id
+    last_recipient_id = models.BigIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Last sign of life of the delivering worker
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.audience} {self.student_class} ({self.status}, {self.delivered_count}/{self.recipient_count})"
+
 class Message(models.Model):
     sender = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     recipient = models.ForeignKey(User, related_name='received_messages', on_delete=models.CASCADE)
@@ -142,9 +288,14 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
     conversation_id = models.CharField(max_length=100, null=True, blank=True)  # To group messages in conversations
+    broadcast = models.ForeignKey(Broadcast, null=True, blank=True, on_delete=models.SET_NULL, related_name='messages')
 
     class Meta:
         ordering = ['timestamp']  # Changed to ascending order for chat-like display
+        indexes = [
+            # Keyset pagination of a conversation by (timestamp, id)
+            models.Index(fields=['conversation_id', 'timestamp', 'id'], name='message_conversation_idx'),
+        ]
 
     def __str__(self):
         return f"From {self.sender.username} to {self.recipient.username} at {self.timestamp}"
@@ -157,6 +308,21 @@ class Message(models.Model):
             self.conversation_id = f"conv_{user_ids[0]}_{user_ids[1]}"
         super().save(*args, **kwargs)
 
+class ConversationReadState(models.Model):
+    """Read watermark of one participant: every message up to last_read_message_id has been read"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_reads')
+    conversation_id = models.CharField(max_length=100)
+    last_read_message_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'conversation_id'], name='unique_conversation_read_state'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.conversation_id} up to {self.last_read_message_id}"
+
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('book_added', 'Carte adăugată'),
@@ -167,6 +333,9 @@ class Notification(models.Model):
         ('request_rejected', 'Cerere respinsă'),
         ('book_returned', 'Carte returnată'),
         ('extension_requested', 'Extindere solicitată'),
+        ('books_imported', 'Cărți importate'),
+        ('hold_ready', 'Rezervare disponibilă'),
+        ('manuals_assigned', 'Manuale distribuite'),
     ]
     
     # For librarians, user is null (system notification for all librarians)
@@ -188,14 +357,48 @@ class Notification(models.Model):
     
     # If True, shown to librarians, if False shown to students/teachers
     for_librarians = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Used by the delta-sync endpoint
+    count = models.PositiveIntegerField(default=1)  # Number of similar events merged into this row
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Keyset pagination of a user's / the librarians' notifications by (timestamp, id)
+            models.Index(fields=['user', 'for_librarians', 'timestamp', 'id'], name='notification_user_idx'),
+            models.Index(fields=['for_librarians', 'timestamp', 'id'], name='notification_librarian_idx'),
+        ]
     
     def __str__(self):
         target = self.user.username if self.user else "Librarians"
         return f"{self.notification_type} for {target} at {self.timestamp}"
 
+class ArchivedMessage(models.Model):
+    """Message moved out of the hot table by the retention job; plain ids, so nothing cascades into the archive"""
+    original_id = models.BigIntegerField(unique=True)
+    sender_id = models.BigIntegerField(db_index=True)
+    recipient_id = models.BigIntegerField(db_index=True)
+    conversation_id = models.CharField(max_length=100, null=True, blank=True)
+    content = models.TextField()
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived message #{self.original_id} ({self.conversation_id})"
+
+class ArchivedNotification(models.Model):
+    """Read notification moved out of the hot table by the retention job"""
+    original_id = models.BigIntegerField(unique=True)
+    user_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    notification_type = models.CharField(max_length=20)
+    message = models.TextField()
+    for_librarians = models.BooleanField(default=False)
+    count = models.PositiveIntegerField(default=1)
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notification #{self.original_id} ({self.notification_type})"
+
 class ExamModel(models.Model):
     EXAM_TYPE_CHOICES = [
         ('EN', 'Evaluare Națională'),
@@ -210,6 +413,7 @@ class ExamModel(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     pdf_file = models.FileField(upload_to='exam_models/')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Version tag of the exam model list
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()}) - {self.get_category_display()}"
@@ -286,3 +490,39 @@ class EmailVerification(models.Model):
 
     def __str__(self):
         return f"{self.user.email} - {'Verified' if self.is_verified else 'Unverified'}"
+
+class IndexedDocument(models.Model):
+    """A PDF (manual or exam model) whose text has been extracted for searching"""
+    DOCUMENT_TYPES = [
+        ('book', 'Carte'),
+        ('exam_model', 'Model de examen'),
+    ]
+
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES)
+    object_id = models.PositiveIntegerField()
+    # Signature of the indexed file, used to only re-extract new/changed files
+    file_name = models.CharField(max_length=500)
+    file_size = models.BigIntegerField(default=0)
+    file_modified = models.DateTimeField(null=True, blank=True)
+    page_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')  # Extraction error, if any
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('document_type', 'object_id')
+
+    def __str__(self):
+        return f"{self.document_type} #{self.object_id} ({self.page_count} pagini)"
+
+class DocumentPage(models.Model):
+    """Text of a single PDF page; mirrored into an FTS5 index on SQLite"""
+    document = models.ForeignKey(IndexedDocument, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['document', 'page_number']
+        unique_together = ('document', 'page_number')
+
+    def __str__(self):
+        return f"{self.document} - pagina {self.page_number}"
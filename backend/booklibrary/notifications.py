@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import counters
+from .models import Notification
+from .utils import get_display_name
+
+# Librarian notification types merged within NOTIFICATION_COALESCE_SECONDS, with the aggregate message
+COALESCED_TYPES = {
+    'book_added': '{count} cărți noi au fost adăugate',
+    'stock_updated': '{count} actualizări de stoc',
+    'book_requested': '{count} cereri noi de împrumut',
+}
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 600))
+
+def coalesce_librarian_notification(notification_type, book=None, borrowing=None, created_by=None):
+    """
+    Merge an event into the unread librarian notification of the same type started
+    within the coalescing window, if there is one. Returns it, or None.
+    """
+    window = coalesce_window()
+    if notification_type not in COALESCED_TYPES or not window:
+        return None
+    aggregate = Notification.objects.select_for_update().filter(
+        for_librarians=True, notification_type=notification_type, is_read=False,
+        timestamp__gte=timezone.now() - window
+    ).order_by('-timestamp').first()
+    if aggregate is None:
+        return None
+
+    aggregate.count += 1
+    aggregate.message = COALESCED_TYPES[notification_type].format(count=aggregate.count)
+    # Links are only kept while every merged event points to the same object
+    for field, value in (('book', book), ('borrowing', borrowing), ('created_by', created_by)):
+        if getattr(aggregate, f'{field}_id') != (value.id if value else None):
+            setattr(aggregate, field, None)
+    aggregate.save(update_fields=['count', 'message', 'book', 'borrowing', 'created_by', 'updated_at'])
+    return aggregate
+
+def create_librarian_notification(notification_type, message, book=None, borrowing=None, created_by=None):
+    """Create notification for librarians, or merge it into a recent similar one"""
+    with transaction.atomic():
+        aggregate = coalesce_librarian_notification(notification_type, book, borrowing, created_by)
+        if aggregate is not None:
+            # Still a single unread row, so the unread counter does not change
+            return aggregate
+        notification = Notification.objects.create(
+            notification_type=notification_type,
+            message=message,
+            book=book,
+            borrowing=borrowing,
+            created_by=created_by,
+            for_librarians=True
+        )
+        counters.add({counters.UNREAD_LIBRARIAN_NOTIFICATIONS: 1})
+    return notification
+
+def create_user_notification(user, notification_type, message, book=None, borrowing=None):
+    """Create notification for a specific user"""
+    notification = Notification.objects.create(
+        user=user,
+        notification_type=notification_type,
+        message=message,
+        book=book,
+        borrowing=borrowing,
+        for_librarians=False
+    )
+    counters.add({counters.unread_notifications_key(user.id): 1})
+    return notification
+
+def digest_period(hours):
+    """
+    (since, until) of a digest covering `hours`. It ends one coalescing window ago:
+    a merged notification only gathers events within that window of its first one,
+    so every row started before `until` is complete and its count lies in the period.
+    """
+    until = timezone.now() - coalesce_window()
+    return until - timedelta(hours=hours), until
+
+def librarian_digest(since, until):
+    """
+    Librarian events in [since, until) as [(type label, number of events)], most frequent first.
+    Merged notifications are counted whole in the period of their first event, so
+    consecutive periods count every event exactly once; use digest_period for `until`.
+    """
+    labels = dict(Notification.NOTIFICATION_TYPES)
+    totals = (
+        Notification.objects.filter(for_librarians=True, timestamp__gte=since, timestamp__lt=until)
+        .values_list('notification_type').annotate(events=models.Sum('count')).order_by('-events', 'notification_type')
+    )
+    return [(labels.get(notification_type, notification_type), events) for notification_type, events in totals]
+
+def serialize_notification(notification):
+    """Basic serialization shared by get_notifications and the sync endpoint"""
+    notification_data = {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'message': notification.message,
+        'timestamp': notification.timestamp.isoformat(),
+        'is_read': notification.is_read,
+        'count': notification.count,
+    }
+
+    # Add book info if available
+    if notification.book:
+        notification_data['book'] = {
+            'id': notification.book.id,
+            'name': notification.book.name,
+        }
+
+    # Add borrowing info if available
+    if notification.borrowing:
+        notification_data['borrowing'] = {
+            'id': notification.borrowing.id,
+        }
+
+    # Add creator info if available (for librarian notifications)
+    if notification.created_by:
+        notification_data['created_by'] = {
+            'id': notification.created_by.id,
+            'name': get_display_name(notification.created_by),
+        }
+
+    return notification_data
+
+# Columns read by serialize_notification_rows; the nullable relations become LEFT JOINs of the same query
+NOTIFICATION_FIELDS = (
+    'id', 'notification_type', 'message', 'timestamp', 'is_read', 'count',
+    'book_id', 'book__name', 'borrowing_id',
+    'created_by_id', 'created_by__username', 'created_by__first_name', 'created_by__last_name',
+)
+
+def serialize_notification_rows(rows):
+    """serialize_notification for `.values(*NOTIFICATION_FIELDS)` rows, without loading model instances"""
+    names = {}
+    data = []
+    for row in rows:
+        notification_data = {
+            'id': row['id'],
+            'type': row['notification_type'],
+            'message': row['message'],
+            'timestamp': row['timestamp'].isoformat(),
+            'is_read': row['is_read'],
+            'count': row['count'],
+        }
+        if row['book_id']:
+            notification_data['book'] = {'id': row['book_id'], 'name': row['book__name']}
+        if row['borrowing_id']:
+            notification_data['borrowing'] = {'id': row['borrowing_id']}
+        creator_id = row['created_by_id']
+        if creator_id:
+            # A handful of librarians create most notifications, so names are built once per page
+            if creator_id not in names:
+                names[creator_id] = get_display_name(User(
+                    username=row['created_by__username'],
+                    first_name=row['created_by__first_name'],
+                    last_name=row['created_by__last_name'],
+                ))
+            notification_data['created_by'] = {'id': creator_id, 'name': names[creator_id]}
+        data.append(notification_data)
+    return data
@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination over a (timestamp, id) ordering.
+
+Pages are selected with `WHERE (timestamp, id) < cursor ORDER BY timestamp DESC, id DESC
+LIMIT n` (or the mirror image for newer rows), so any page costs the same as the
+first one, unlike OFFSET which scans every skipped row. Cursors are opaque strings
+'<microseconds>_<id>' handed back to the client.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import models
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(moment, pk):
+    return f'{int(moment.timestamp() * 1_000_000)}_{pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, pk = cursor.split('_')
+        return datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc), int(pk)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """?limit= clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_page(queryset, field='timestamp', before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of `queryset` in ascending (field, id) order.
+    With `before` the page ends just before that cursor (older rows), with `after`
+    it starts just after it (newer rows); without either it is the newest page.
+    Returns (rows, has_older, has_newer).
+    """
+    if before:
+        moment, pk = decode_cursor(before)
+        queryset = queryset.filter(models.Q(**{f'{field}__lt': moment}) | models.Q(**{field: moment, 'id__lt': pk}))
+    elif after:
+        moment, pk = decode_cursor(after)
+        queryset = queryset.filter(models.Q(**{f'{field}__gt': moment}) | models.Q(**{field: moment, 'id__gt': pk}))
+
+    if after:
+        rows = list(queryset.order_by(field, 'id')[:limit + 1])
+        has_newer = len(rows) > limit
+        return rows[:limit], True, has_newer
+
+    rows = list(queryset.order_by(f'-{field}', '-id')[:limit + 1])
+    has_older = len(rows) > limit
+    return rows[:limit][::-1], has_older, bool(before)
@@ -0,0 +1,104 @@
+"""
+Response cache for read-mostly endpoints (book catalog, exam models).
+
+Serialized responses are stored in the Django cache (LocMemCache by default, or
+the shared backend configured with CACHE_BACKEND/CACHE_LOCATION), keyed by the
+query parameters and a per-resource generation number. Saving or deleting a
+Book / ExamModel bumps the generation (see signals.py), which makes every cached
+response of that resource unreachable at once. Code paths that bypass model
+signals (bulk_create/bulk_update) call `invalidate` themselves.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import etags
+
+PREFIX = 'response_cache'
+RESOURCES = ['books', 'exam_models']
+
+
+def _increment(key):
+    """Increment a counter that never expires, creating it if missing"""
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted in the meantime
+            cache.set(key, 1, timeout=None)
+
+
+def _generation(resource):
+    return cache.get(f'{PREFIX}:generation:{resource}', 0)
+
+
+def _bump(resource):
+    _increment(f'{PREFIX}:generation:{resource}')
+
+
+def invalidate(*resources):
+    """
+    Drop every cached response of the given resources. The generation is bumped
+    again after commit, so a response cached from pre-commit data by a concurrent
+    request in the meantime is not served either.
+    """
+    for resource in resources:
+        _bump(resource)
+        transaction.on_commit(functools.partial(_bump, resource))
+
+
+def cache_key(resource, request):
+    params = '&'.join(f'{key}={value}' for key, value in sorted(request.GET.items()))
+    digest = hashlib.md5(f'{request.get_host()}?{params}'.encode('utf-8')).hexdigest()
+    return f'{PREFIX}:{resource}:{_generation(resource)}:{digest}'
+
+
+def stats():
+    """Hit/miss counters per resource since the cache was last cleared"""
+    keys = [f'{PREFIX}:{event}:{resource}' for resource in RESOURCES for event in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    result = {}
+    for resource in RESOURCES:
+        hits = values.get(f'{PREFIX}:hits:{resource}', 0)
+        misses = values.get(f'{PREFIX}:misses:{resource}', 0)
+        result[resource] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return result
+
+
+def cached(resource):
+    """
+    Decorator for GET function views (placed under @permission_classes, above
+    @etags.conditional): successful responses are cached together with their ETag,
+    so a hit answers both plain and conditional requests without the database.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            key = cache_key(resource, request)
+            entry = cache.get(key)
+            if entry is not None:
+                _increment(f'{PREFIX}:hits:{resource}')
+                if entry['etag']:
+                    return (etags.not_modified(request, entry['etag'])
+                            or etags.with_etag(Response(entry['data']), entry['etag']))
+                return Response(entry['data'])
+
+            _increment(f'{PREFIX}:misses:{resource}')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, {'etag': response.get('ETag'), 'data': response.data},
+                          timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,76 @@
+"""
+Retention policies for the messages and notifications tables.
+
+Read messages and read notifications older than their retention period are moved
+into compact archive tables (or deleted outright), in bounded batches so that no
+single transaction holds locks for long. Unread rows are never touched, so unread
+counters stay correct. Run through the `apply_retention` command.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedMessage, ArchivedNotification, Message, Notification
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _archive_messages(ids):
+    ArchivedMessage.objects.bulk_create([
+        ArchivedMessage(original_id=row['id'], sender_id=row['sender_id'], recipient_id=row['recipient_id'],
+                        conversation_id=row['conversation_id'], content=row['content'], timestamp=row['timestamp'])
+        for row in Message.objects.filter(id__in=ids).values(
+            'id', 'sender_id', 'recipient_id', 'conversation_id', 'content', 'timestamp'
+        )
+    ], ignore_conflicts=True)
+
+
+def _archive_notifications(ids):
+    ArchivedNotification.objects.bulk_create([
+        ArchivedNotification(original_id=row['id'], user_id=row['user_id'], notification_type=row['notification_type'],
+                             message=row['message'], for_librarians=row['for_librarians'], count=row['count'],
+                             timestamp=row['timestamp'])
+        for row in Notification.objects.filter(id__in=ids).values(
+            'id', 'user_id', 'notification_type', 'message', 'for_librarians', 'count', 'timestamp'
+        )
+    ], ignore_conflicts=True)
+
+
+# name: (model, retention setting, default days, archive function)
+POLICIES = {
+    'messages': (Message, 'MESSAGE_RETENTION_DAYS', 730, _archive_messages),
+    'notifications': (Notification, 'NOTIFICATION_RETENTION_DAYS', 90, _archive_notifications),
+}
+
+
+def retention_days(name):
+    _, setting, default, _ = POLICIES[name]
+    return getattr(settings, setting, default)
+
+
+def expired(name):
+    """Rows of a policy that are past retention"""
+    model = POLICIES[name][0]
+    return model.objects.filter(is_read=True, timestamp__lt=timezone.now() - timedelta(days=retention_days(name)))
+
+
+def apply_policy(name, archive=True, batch_size=DEFAULT_BATCH_SIZE):
+    """Archive (or delete) expired rows batch by batch; returns the number of rows removed from the hot table"""
+    model, _, _, archive_rows = POLICIES[name]
+    queryset = expired(name)
+    removed = 0
+    last_id = 0
+    while True:
+        # Walking the primary key keeps every batch query cheap, however large the table
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            if archive:
+                archive_rows(ids)
+            model.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+        last_id = ids[-1]
+    return removed
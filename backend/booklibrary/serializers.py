@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group
-from .models import Book, Student, BookBorrowing, Message, ExamModel, EmailVerification, InvitationCode, Notification
+from .models import Book, BookCopy, Student, BookBorrowing, BookHold, BorrowingTransition, Broadcast, Message, ExamModel, EmailVerification, InvitationCode
+from .notifications import create_librarian_notification
 from .utils import get_display_name
 import re
 import logging
@@ -41,6 +42,12 @@ class BookSerializer(serializers.ModelSerializer):
             return obj.pdf_file.url
         return None
 
+class BookCopySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookCopy
+        fields = ['id', 'book', 'barcode', 'status', 'created_at']
+        read_only_fields = ['book', 'created_at']
+
 class StudentSerializer(serializers.ModelSerializer):
     user = UserSerializer()
     
@@ -57,8 +64,33 @@ class BookBorrowingSerializer(serializers.ModelSerializer):
         model = BookBorrowing
         fields = ['id', 'book', 'student', 'book_id', 'request_date', 'approved_date',
                  'pickup_date', 'borrow_date', 'due_date', 'return_date', 'status', 
-                 'fine_amount', 'loan_duration_days', 'student_message', 'has_been_extended']
-        read_only_fields = ['request_date', 'approved_date', 'pickup_date', 'fine_amount']
+                 'fine_amount', 'loan_duration_days', 'student_message', 'has_been_extended', 'copy']
+        read_only_fields = ['request_date', 'approved_date', 'pickup_date', 'fine_amount', 'copy']
+
+class BorrowingTransitionSerializer(serializers.ModelSerializer):
+    actor = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = BorrowingTransition
+        fields = ['id', 'action', 'from_status', 'to_status', 'actor', 'timestamp', 'seconds_in_previous_status']
+    
+    def get_actor(self, obj):
+        return get_display_name(obj.actor) if obj.actor else None
+
+class BookHoldSerializer(serializers.ModelSerializer):
+    book = BookSerializer(read_only=True)
+    position = serializers.IntegerField(read_only=True, default=None)  # Annotated by the views
+    
+    class Meta:
+        model = BookHold
+        fields = ['id', 'book', 'student', 'loan_duration_days', 'status', 'created_at', 'borrowing', 'position']
+        read_only_fields = ['student', 'status', 'created_at', 'borrowing']
+
+class BroadcastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Broadcast
+        fields = ['id', 'audience', 'student_class', 'content', 'status', 'recipient_count', 'delivered_count',
+                  'created_at', 'completed_at']
 
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
@@ -140,11 +172,10 @@ class RegistrationSerializer(serializers.Serializer):
                 usage_info = invitation.use_code(user)
                 
                 # Create notification for librarians about teacher registration
-                Notification.objects.create(
+                create_librarian_notification(
                     notification_type='teacher_registered',
                     message=f'Un nou profesor s-a înregistrat: {user.first_name} {user.last_name} ({user.email}) folosind codul {invitation_code.upper()}.',
-                    created_by=user,
-                    for_librarians=True
+                    created_by=user
                 )
                 
                 # Log the invitation code usage
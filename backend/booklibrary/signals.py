@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, response_cache
+from .models import Book, BookBorrowing, ExamModel, Message, Notification, SyncTombstone
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    SyncTombstone.objects.create(resource='books', object_id=instance.pk)
+
+
+@receiver(post_delete, sender=BookBorrowing)
+def borrowing_deleted(sender, instance, **kwargs):
+    SyncTombstone.objects.create(resource='my_books', object_id=instance.pk, owner_id=instance.student_id)
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    # Librarian notifications (no user) are shared by every librarian
+    SyncTombstone.objects.create(resource='notifications', object_id=instance.pk, owner_id=instance.user_id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, instance, **kwargs):
+    response_cache.invalidate('books')
+
+
+@receiver(post_save, sender=ExamModel)
+@receiver(post_delete, sender=ExamModel)
+def exam_model_changed(sender, instance, **kwargs):
+    response_cache.invalidate('exam_models')
+
+
+@receiver(post_save, sender=Message)
+def message_sent(sender, instance, created, **kwargs):
+    # bulk_create skips this signal; callers update the counter themselves
+    if created and not instance.is_read:
+        counters.add({counters.unread_messages_key(instance.recipient_id): 1})
@@ -0,0 +1,45 @@
+"""
+Helpers for the configured media storage.
+
+All file access goes through Django's default_storage, which is either the local
+filesystem or S3-compatible object storage (see STORAGE_BACKEND in settings).
+With object storage, clients upload and download file bytes directly from the
+bucket using presigned URLs, so they never pass through the Django workers.
+"""
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+UPLOAD_URL_EXPIRES = 15 * 60  # Seconds a presigned upload stays valid
+
+
+def uses_object_storage():
+    """True when media is stored in an S3-compatible bucket"""
+    return settings.STORAGE_BACKEND == 's3'
+
+
+def presigned_upload(name, max_size, content_type=None, expires=UPLOAD_URL_EXPIRES):
+    """
+    Create a presigned POST allowing a client to upload `name` straight to the bucket.
+    The size limit is enforced by the object storage itself.
+    Returns a dict with the `url` and form `fields` to send along with the file.
+    """
+    # Object key as S3Storage stores it: the name under the storage's optional `location` prefix
+    key = '/'.join(part.strip('/') for part in (default_storage.location, name) if part)
+    fields = {}
+    conditions = [['content-length-range', 1, max_size]]
+    if content_type:
+        fields['Content-Type'] = content_type
+        conditions.append({'Content-Type': content_type})
+    client = default_storage.connection.meta.client
+    return client.generate_presigned_post(
+        Bucket=default_storage.bucket_name,
+        Key=key,
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires,
+    )
+
+
+def presigned_download_url(name):
+    """Short-lived URL to download a stored file directly from the bucket"""
+    return default_storage.url(name)
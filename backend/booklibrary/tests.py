@@ -1,10 +1,25 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
+import importlib.util
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from django.test import TestCase, override_settings
+from datetime import timedelta
+from django.utils import timezone
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
-from .models import Book, Student, BookBorrowing
+from .models import ArchivedMessage, ArchivedNotification, Book, BookCopy, Student, BookBorrowing, BookHold, BorrowingTransition, Broadcast, EmailVerification, Message, Notification, IndexedDocument, ExamModel, InvitationCode
+from .serializers import RegistrationSerializer
+from . import borrowing_states, broadcasts, counters, document_index, fulltext, sync
+from .notifications import create_librarian_notification, digest_period, librarian_digest, serialize_notification
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
 from rest_framework_simplejwt.tokens import RefreshToken
 import json
 
@@ -266,3 +281,1367 @@ class RegistrationTestCase(APITestCase):
         response = self.client.post(self.register_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue('teacher_code' in response.data or 'non_field_errors' in response.data)
+
+def make_pdf(pages):
+    """Build a minimal PDF with one line of text per page"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>']
+    kids = ' '.join(f'{4 + i * 2} 0 R' for i in range(len(pages)))
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>')
+    objects.append('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    for i, text in enumerate(pages):
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + i * 2} 0 R >>'
+        )
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+    output = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref_offset = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    for offset in offsets:
+        output += f'{offset:010d} 00000 n \n'.encode('latin-1')
+    output += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF'.encode('latin-1')
+    return output
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentSearchTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.manual = Book.objects.create(
+            name='Manual Biologie',
+            inventory=10,
+            author='Autor',
+            stock=10,
+            type='manual',
+            pdf_file=SimpleUploadedFile(
+                'biologie.pdf', make_pdf(['Introducere', 'Fotosinteza la plante', 'Celula vegetala'])
+            ),
+        )
+
+    def test_index_and_search_pages(self):
+        stats = document_index.index_documents(workers=1)
+        self.assertEqual(stats['indexed'], 1)
+
+        results = document_index.search_documents('fotosinteza')
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['id'], self.manual.id)
+        self.assertEqual(results[0]['matches'][0]['page'], 2)
+        self.assertIn('<mark>', results[0]['matches'][0]['snippet'])
+
+    def test_indexing_is_incremental(self):
+        document_index.index_documents(workers=1)
+        stats = document_index.index_documents(workers=1)
+        self.assertEqual(stats['pending'], 0)
+
+        self.manual.delete()
+        stats = document_index.index_documents(workers=1)
+        self.assertEqual(stats['removed'], 1)
+        self.assertFalse(IndexedDocument.objects.exists())
+
+    def test_uploaded_pdf_is_indexed_after_commit(self):
+        librarian = User.objects.create_user(username='librarian', password='testpass123')
+        librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(librarian)
+
+        class InlineThread:
+            def __init__(self, target, args=(), daemon=None):
+                self.target, self.args = target, args
+
+            def start(self):
+                self.target(*self.args)
+
+        # Run the indexing thread inline, without closing the test's database connection
+        with mock.patch.object(document_index.threading, 'Thread', InlineThread), \
+                mock.patch.object(document_index, '_index_in_thread', document_index.index_document), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('update_book_details', args=[self.manual.id]), {
+                'pdf_file': SimpleUploadedFile('biologie2.pdf', make_pdf(['Mitocondria'])),
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(document_index.search_documents('mitocondria')[0]['id'], self.manual.id)
+        # Unchanged files are not extracted twice
+        self.assertFalse(document_index.index_document('book', self.manual.id))
+
+    def test_search_endpoint(self):
+        document_index.index_documents(workers=1)
+        response = self.client.get(reverse('search_documents'), {'q': 'celula'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['matches'][0]['page'], 3)
+
+        response = self.client.get(reverse('search_documents'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class OrphanedMediaTestCase(TestCase):
+    def setUp(self):
+        self.kept_pdf = default_storage.save('books/kept.pdf', ContentFile(b'pdf'))
+        self.kept_thumbnail = default_storage.save('thumbnails/kept.jpg', ContentFile(b'img'))
+        self.orphan = default_storage.save('thumbnails/orphan.jpg', ContentFile(b'img'))
+        Book.objects.create(
+            name='Carte', inventory=1, author='Autor', stock=1,
+            pdf_file=self.kept_pdf,
+            thumbnail_url=f'http://testserver/media/{self.kept_thumbnail}',
+        )
+
+    def test_dry_run_keeps_files(self):
+        out = StringIO()
+        call_command('cleanup_orphaned_media', '--dry-run', '--min-age-hours=0', stdout=out)
+        self.assertIn(self.orphan, out.getvalue())
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_deletes_only_unreferenced_files(self):
+        call_command('cleanup_orphaned_media', '--min-age-hours=0', stdout=StringIO())
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertTrue(default_storage.exists(self.kept_pdf))
+        self.assertTrue(default_storage.exists(self.kept_thumbnail))
+
+    def test_fresh_uploads_are_kept(self):
+        call_command('cleanup_orphaned_media', stdout=StringIO())
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_quarantine_moves_file(self):
+        call_command('cleanup_orphaned_media', '--quarantine', '--min-age-hours=0', stdout=StringIO())
+        self.assertFalse(default_storage.exists(self.orphan))
+        stamps, _ = default_storage.listdir('quarantine')
+        self.assertEqual(len(stamps), 1)
+        self.assertTrue(default_storage.exists(f'quarantine/{stamps[0]}/{self.orphan}'))
+
+class DirectUploadTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='uploader', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def test_local_storage_falls_back_to_multipart_upload(self):
+        response = self.client.post(
+            reverse('request_upload_url'), {'kind': 'pdf', 'filename': 'manual.pdf'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()['direct_upload'])
+        self.assertTrue(response.json()['upload_endpoint'].endswith(reverse('upload_pdf')))
+
+    def test_rejects_invalid_file_types(self):
+        response = self.client.post(
+            reverse('request_upload_url'), {'kind': 'thumbnail', 'filename': 'script.exe'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('request_upload_url'), {'kind': 'video'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+S3_SETTINGS = {
+    'STORAGE_BACKEND': 's3',
+    'STORAGES': {
+        'default': {'BACKEND': 'storages.backends.s3.S3Storage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    'AWS_STORAGE_BUCKET_NAME': 'lenbrary-test',
+    'AWS_S3_REGION_NAME': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_S3_ADDRESSING_STYLE': 'path',
+    'AWS_S3_SIGNATURE_VERSION': 's3v4',
+    'AWS_DEFAULT_ACL': None,
+    'AWS_S3_FILE_OVERWRITE': False,
+    'AWS_QUERYSTRING_AUTH': True,
+}
+
+
+@skipUnless(importlib.util.find_spec('moto') and importlib.util.find_spec('storages'),
+             'moto and django-storages are not installed')
+@override_settings(**S3_SETTINGS)
+class ObjectStorageTestCase(APITestCase):
+    """Direct uploads, redirects and deletion against an S3 stand-in (moto)"""
+
+    def setUp(self):
+        import boto3
+        from moto import mock_aws
+        mock = mock_aws()
+        mock.start()
+        self.addCleanup(mock.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='lenbrary-test')
+        self.user = User.objects.create_user(username='uploader', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def test_presigned_upload_redirect_and_delete(self):
+        import requests
+        from rest_framework.test import APIRequestFactory
+        from .views import delete_file_from_storage, media_redirect
+
+        response = self.client.post(
+            reverse('request_upload_url'),
+            {'kind': 'pdf', 'filename': 'manual.pdf', 'content_type': 'application/pdf'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.json()
+        self.assertTrue(data['direct_upload'])
+        self.assertEqual(data['fields']['key'], data['key'])
+        self.assertIn('policy', {field.lower() for field in data['fields']})
+
+        # The client posts the file straight to the bucket
+        upload = requests.post(data['upload_url'], data=data['fields'],
+                               files={'file': ('manual.pdf', b'%PDF-1.4 test', 'application/pdf')})
+        self.assertIn(upload.status_code, (200, 204))
+        self.assertTrue(default_storage.exists(data['key']))
+
+        redirect = media_redirect(APIRequestFactory().get(f"/media/{data['key']}"), path=data['key'])
+        self.assertEqual(redirect.status_code, 302)
+        self.assertIn(data['key'], redirect['Location'])
+        self.assertIn('X-Amz-Signature=', redirect['Location'])
+        self.assertEqual(requests.get(redirect['Location']).content, b'%PDF-1.4 test')
+
+        self.assertTrue(delete_file_from_storage(data['file_url']))
+        self.assertFalse(default_storage.exists(data['key']))
+
+class CatalogImportTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(self.librarian)
+        self.existing = Book.objects.create(name='Ion', author='Liviu Rebreanu', inventory=2, stock=2)
+
+    def upload(self, content, name='catalog.csv'):
+        return self.client.post(
+            reverse('import_catalog'),
+            {'file': SimpleUploadedFile(name, content)},
+            format='multipart'
+        )
+
+    def test_csv_import_creates_and_updates_books(self):
+        content = (
+            'name;author;inventory;stock;type\n'
+            'Ion;Liviu Rebreanu;10;8;carte\n'
+            'Matematica V;Editura X;30;30;manual\n'
+            'Fara stoc;Autor;;;carte\n'
+        ).encode('utf-8')
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data['created'], data['updated'], data['failed']), (1, 1, 1))
+        self.assertEqual(data['errors'][0]['row'], 4)
+
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.inventory, self.existing.stock), (10, 8))
+        self.assertTrue(Book.objects.filter(name='Matematica V', type='manual').exists())
+        self.assertEqual(Notification.objects.filter(notification_type='books_imported').count(), 1)
+
+    def test_error_rows_count_blank_lines(self):
+        content = 'name;author;inventory;stock\nIon;Liviu Rebreanu;10;8\n\nFara stoc;Autor;;\n'.encode('utf-8')
+        self.assertEqual(self.upload(content).json()['errors'][0]['row'], 4)
+
+    def test_dry_run_writes_nothing(self):
+        content = b'name,author,inventory,stock\nNoua,Autor,1,1\n'
+        response = self.client.post(
+            reverse('import_catalog'),
+            {'file': SimpleUploadedFile('catalog.csv', content), 'dry_run': 'true'},
+            format='multipart'
+        )
+        self.assertEqual(response.json()['created'], 1)
+        self.assertFalse(Book.objects.filter(name='Noua').exists())
+        self.assertFalse(Notification.objects.exists())
+
+    @skipUnless(importlib.util.find_spec('openpyxl'), 'openpyxl is not installed')
+    def test_xlsx_import(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        workbook.active.append(['Name', 'Author', 'Inventory', 'Stock'])
+        workbook.active.append(['Baltagul', 'Mihail Sadoveanu', 5, 5])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        response = self.upload(buffer.getvalue(), name='catalog.xlsx')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertTrue(Book.objects.filter(name='Baltagul', stock=5).exists())
+
+    def test_missing_columns_and_permissions(self):
+        response = self.upload(b'title,stock\nX,1\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(User.objects.create_user(username='student2', password='x'))
+        response = self.upload(b'name,author\nX,Y\n')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class BatchStockUpdateTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(self.librarian)
+        self.books = [
+            Book.objects.create(name=f'Carte {i}', author='Autor', inventory=5, stock=5)
+            for i in range(3)
+        ]
+
+    def test_applies_all_updates_with_one_notification(self):
+        response = self.client.post(reverse('batch_update_book_stock'), {'updates': [
+            {'book_id': self.books[0].id, 'stock': 2},
+            {'book_id': self.books[1].id, 'stock': 4, 'inventory': 9},
+            {'book_id': self.books[2].id, 'stock': 5},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(response.json()['unchanged'], 1)
+        self.books[1].refresh_from_db()
+        self.assertEqual((self.books[1].stock, self.books[1].inventory), (4, 9))
+        self.assertEqual(Notification.objects.filter(notification_type='stock_updated').count(), 1)
+
+    def test_invalid_entry_rejects_whole_batch(self):
+        response = self.client.post(reverse('batch_update_book_stock'), {'updates': [
+            {'book_id': self.books[0].id, 'stock': 1},
+            {'book_id': self.books[1].id, 'stock': -1},
+            {'book_id': 999999, 'stock': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.json()['errors']), 2)
+        self.books[0].refresh_from_db()
+        self.assertEqual(self.books[0].stock, 5)
+        self.assertFalse(Notification.objects.exists())
+
+class BarcodeDeskTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(self.librarian)
+        student_user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=student_user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2)
+        self.borrowing = BookBorrowing.objects.create(book=self.book, student=self.student, status='APROBAT')
+
+    def test_register_copies_and_lookup(self):
+        response = self.client.post(reverse('book_copies', args=[self.book.id]), {'count': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        barcode = response.json()[0]['barcode']
+
+        response = self.client.post(reverse('book_copies', args=[self.book.id]), {'barcodes': [barcode]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('lookup_copy', args=[barcode]))
+        self.assertEqual(response.json()['book']['id'], self.book.id)
+        self.assertIsNone(response.json()['borrowing'])
+
+    def test_scan_checkout_and_return(self):
+        copy = BookCopy.objects.create(book=self.book, barcode='COPY-1')
+        response = self.client.post(
+            reverse('scan_checkout'), {'barcode': 'COPY-1', 'student_id': 'ST000001'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'], 'IMPRUMUTAT')
+        copy.refresh_from_db()
+        self.assertEqual(copy.status, 'IMPRUMUTAT')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 1)
+
+        response = self.client.get(reverse('lookup_copy', args=['COPY-1']))
+        self.assertEqual(response.json()['borrowing']['id'], self.borrowing.id)
+
+        response = self.client.post(reverse('scan_return'), {'barcode': 'COPY-1'}, format='json')
+        self.assertEqual(response.json()['status'], 'RETURNAT')
+        copy.refresh_from_db()
+        self.assertEqual(copy.status, 'DISPONIBIL')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 2)
+
+    def test_scan_checkout_requires_available_copy(self):
+        BookCopy.objects.create(book=self.book, barcode='COPY-2', status='PIERDUT')
+        response = self.client.post(
+            reverse('scan_checkout'), {'barcode': 'COPY-2', 'student_id': 'ST000001'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('scan_checkout'), {'barcode': 'UNKNOWN', 'student_id': 'ST000001'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class WaitlistTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=1, stock=0)
+        self.students = []
+        for number in range(3):
+            user = User.objects.create_user(username=f'elev{number}', password='testpass123')
+            self.students.append(Student.objects.create(user=user, student_id=f'ST00000{number}'))
+        self.loan = BookBorrowing.objects.create(book=self.book, student=self.students[0], status='IMPRUMUTAT')
+
+    def join(self, student):
+        self.client.force_authenticate(student.user)
+        return self.client.post(reverse('book_hold', args=[self.book.id]), {'loan_duration_days': 7}, format='json')
+
+    def test_request_without_copies_suggests_waitlist(self):
+        self.client.force_authenticate(self.students[1].user)
+        response = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.json()['can_join_waitlist'])
+
+    def test_queue_positions_and_duplicates(self):
+        self.assertEqual(self.join(self.students[1]).json()['position'], 1)
+        self.assertEqual(self.join(self.students[2]).json()['position'], 2)
+        self.assertEqual(self.join(self.students[2]).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.students[1].user)
+        self.client.delete(reverse('book_hold', args=[self.book.id]))
+        self.client.force_authenticate(self.students[2].user)
+        self.assertEqual(self.client.get(reverse('my_holds')).json()[0]['position'], 1)
+
+    def test_return_promotes_first_in_line(self):
+        self.join(self.students[1])
+        self.join(self.students[2])
+
+        self.client.force_authenticate(self.librarian)
+        response = self.client.post(reverse('librarian_return_book', args=[self.loan.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        promoted = BookBorrowing.objects.get(student=self.students[1], book=self.book)
+        self.assertEqual(promoted.status, 'GATA_RIDICARE')
+        self.assertEqual(promoted.loan_duration_days, 7)
+        self.assertEqual(promoted.hold.status, 'ALOCAT')
+        self.assertTrue(Notification.objects.filter(
+            user=self.students[1].user, notification_type='hold_ready', borrowing=promoted
+        ).exists())
+        self.assertFalse(BookBorrowing.objects.filter(student=self.students[2], book=self.book).exists())
+
+        # The returned copy is kept for the promoted student
+        self.client.force_authenticate(self.students[2].user)
+        response = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def promote_first(self):
+        self.join(self.students[1])
+        self.join(self.students[2])
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('librarian_return_book', args=[self.loan.id]))
+        return BookBorrowing.objects.get(student=self.students[1], book=self.book)
+
+    def test_cancelled_hold_passes_copy_on(self):
+        promoted = self.promote_first()
+        self.client.force_authenticate(self.students[1].user)
+        response = self.client.post(reverse('cancel_request', args=[promoted.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            BookBorrowing.objects.get(student=self.students[2], book=self.book).status, 'GATA_RIDICARE'
+        )
+
+    def test_uncollected_hold_expires(self):
+        promoted = self.promote_first()
+        call_command('expire_holds', stdout=StringIO())
+        promoted.refresh_from_db()
+        self.assertEqual(promoted.status, 'GATA_RIDICARE')
+
+        BookBorrowing.objects.filter(pk=promoted.pk).update(approved_date=timezone.now() - timedelta(days=4))
+        call_command('expire_holds', stdout=StringIO())
+        promoted.refresh_from_db()
+        self.assertEqual(promoted.status, 'ANULATA')
+        self.assertEqual(
+            BookBorrowing.objects.get(student=self.students[2], book=self.book).status, 'GATA_RIDICARE'
+        )
+
+    def test_reserved_copy_not_handed_to_others(self):
+        waiting = BookBorrowing.objects.create(book=self.book, student=self.students[0], status='IN_ASTEPTARE')
+        approved = BookBorrowing.objects.create(book=self.book, student=self.students[2], status='APROBAT')
+        promoted = self.promote_first()
+
+        for name, borrowing in (('approve_request', waiting), ('mark_pickup', approved)):
+            response = self.client.post(reverse(name, args=[borrowing.id]))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()['error'], 'No copies available')
+        response = self.client.post(reverse('mark_pickup', args=[promoted.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_legacy_ready_borrowing_without_hold(self):
+        # Former READY_FOR_PICKUP rows became GATA_RIDICARE without a hold
+        legacy = BookBorrowing.objects.create(book=self.book, student=self.students[2], status='GATA_RIDICARE')
+        promoted = self.promote_first()
+
+        # The only copy is reserved for the waitlisted student
+        response = self.client.post(reverse('mark_pickup', args=[legacy.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['error'], 'No copies available')
+
+        Book.objects.filter(id=self.book.id).update(stock=2)
+        results, _ = borrowing_states.apply_transition('pickup', [legacy.id, promoted.id])
+        self.assertEqual([r['success'] for r in results], [True, True])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 0)
+
+        # No hold reserves a copy of this book at all
+        other = Book.objects.create(name='Atlas', author='Autor', inventory=1, stock=1)
+        legacy = BookBorrowing.objects.create(book=other, student=self.students[2], status='GATA_RIDICARE')
+        response = self.client.post(reverse('mark_pickup', args=[legacy.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_batch_stock_update_promotes_waitlist(self):
+        self.join(self.students[1])
+        self.join(self.students[2])
+
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('batch_update_book_stock'), {'updates': [{'book_id': self.book.id, 'stock': 1}]},
+                         format='json')
+        promoted = BookBorrowing.objects.filter(book=self.book, status='GATA_RIDICARE')
+        self.assertEqual([b.student for b in promoted], [self.students[1]])
+
+    def test_catalog_import_promotes_waitlist(self):
+        self.join(self.students[1])
+        self.join(self.students[2])
+
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('import_catalog'), {
+            'file': SimpleUploadedFile('catalog.csv', b'name,author,stock\nManual,Autor,2\n')
+        }, format='multipart')
+        promoted = BookBorrowing.objects.filter(book=self.book, status='GATA_RIDICARE').order_by('id')
+        self.assertEqual([b.student for b in promoted], self.students[1:])
+
+class BulkQueueActionsTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(self.librarian)
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2)
+        self.borrowings = []
+        for number in range(3):
+            user = User.objects.create_user(username=f'elev{number}', password='testpass123')
+            student = Student.objects.create(user=user, student_id=f'ST00000{number}')
+            self.borrowings.append(BookBorrowing.objects.create(book=self.book, student=student))
+
+    def ids(self):
+        return [borrowing.id for borrowing in self.borrowings]
+
+    def test_bulk_approve_creates_messages_and_notifications(self):
+        response = self.client.post(
+            reverse('bulk_approve_requests'),
+            {'borrowing_ids': self.ids() + [999999], 'librarian_message': 'Ridicați de la bibliotecă'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['processed'], 3)
+        self.assertEqual(response.json()['results'][-1], {'id': 999999, 'success': False, 'error': 'Borrowing not found'})
+        self.assertEqual(BookBorrowing.objects.filter(status='APROBAT').count(), 3)
+        self.assertEqual(Notification.objects.filter(notification_type='request_approved').count(), 3)
+        message = Message.objects.get(recipient=self.borrowings[0].student.user)
+        self.assertEqual(message.conversation_id, f'conv_{self.librarian.id}_{message.recipient_id}')
+
+    def test_bulk_pickup_stops_when_stock_runs_out_and_return_restores_it(self):
+        BookBorrowing.objects.update(status='APROBAT')
+        # Independent of the number of borrowings: one statement per table (plus the copies reserved for
+        # holds) and the dashboard counter upserts
+        with self.assertNumQueries(22):
+            response = self.client.post(reverse('bulk_mark_pickup'), {'borrowing_ids': self.ids()}, format='json')
+        results = response.json()['results']
+        self.assertEqual([result['success'] for result in results], [True, True, False])
+        self.assertEqual(results[2]['error'], 'No copies available')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 0)
+
+        response = self.client.post(reverse('bulk_librarian_return'), {'borrowing_ids': self.ids()}, format='json')
+        self.assertEqual(response.json()['processed'], 2)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock, 2)
+        self.assertEqual(BookBorrowing.objects.filter(status='RETURNAT').count(), 2)
+
+class BorrowingStateMachineTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=1, stock=1)
+
+    def test_transitions_are_logged(self):
+        self.client.force_authenticate(self.student.user)
+        borrowing_id = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json').json()['id']
+
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('approve_request', args=[borrowing_id]))
+        self.client.post(reverse('mark_pickup', args=[borrowing_id]))
+        response = self.client.post(reverse('approve_request', args=[borrowing_id]))
+        self.assertEqual(response.json()['error'], 'Cannot approve request with status: IMPRUMUTAT')
+
+        history = self.client.get(reverse('borrowing_history', args=[borrowing_id])).json()
+        self.assertEqual(
+            [(entry['from_status'], entry['to_status']) for entry in history],
+            [('', 'IN_ASTEPTARE'), ('IN_ASTEPTARE', 'APROBAT'), ('APROBAT', 'IMPRUMUTAT')],
+        )
+        with self.assertRaises(ValueError):
+            BorrowingTransition.objects.first().save()
+
+        statuses = self.client.get(reverse('borrowing_status_times')).json()['statuses']
+        self.assertEqual({entry['from_status'] for entry in statuses}, {'IN_ASTEPTARE', 'APROBAT'})
+
+
+class ManualDistributionTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.client.force_authenticate(self.librarian)
+        self.math = Book.objects.create(name='Matematică', author='Autor', type='manual', book_class='V',
+                                        inventory=3, stock=3)
+        self.romanian = Book.objects.create(name='Limba română', author='Autor', type='manual', book_class='V',
+                                            inventory=1, stock=1)
+        Book.objects.create(name='Fizică', author='Autor', type='manual', book_class='VI', inventory=5, stock=5)
+        for number, student_class in enumerate(['V-A', 'V-A', 'V-B']):
+            user = User.objects.create_user(username=f'elev{number}', password='testpass123')
+            Student.objects.create(user=user, student_id=f'ST00000{number}', student_class=student_class)
+
+    def distribute(self, **data):
+        return self.client.post(reverse('distribute_manuals'), {'school_year': '2026-2027', **data}, format='json')
+
+    def test_distribution_reports_shortages_and_is_idempotent(self):
+        response = self.distribute(student_class='V-A', waitlist=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary = response.json()
+        self.assertEqual((summary['students'], summary['manuals'], summary['created']), (2, 2, 3))
+        self.assertEqual(summary['shortages'], [{
+            'book_id': self.romanian.id, 'name': 'Limba română', 'needed': 2, 'available': 1, 'missing': 1,
+        }])
+        self.assertEqual(summary['waitlisted'], 1)
+
+        self.math.refresh_from_db()
+        self.assertEqual(self.math.stock, 1)
+        loan = BookBorrowing.objects.filter(book=self.math).first()
+        self.assertEqual(loan.status, 'IMPRUMUTAT')
+        self.assertEqual(timezone.localtime(loan.due_date).date().isoformat(), '2027-06-30')
+        self.assertEqual(loan.transitions.get().action, 'class_distribution')
+        self.assertEqual(Notification.objects.filter(notification_type='manuals_assigned', user__isnull=False).count(), 2)
+
+        summary = self.distribute(student_class='V').json()
+        self.assertEqual(summary['students'], 3)
+        self.assertEqual(summary['already_assigned'], 3)
+        self.assertEqual(summary['created'], 1)
+
+    def test_copies_reserved_for_holds_are_skipped(self):
+        waiting = Student.objects.create(user=User.objects.create_user(username='elev9', password='x'),
+                                         student_id='ST000009')
+        hold = BookHold.objects.create(book=self.romanian, student=waiting)
+        hold.borrowing = BookBorrowing.objects.create(book=self.romanian, student=waiting, status='GATA_RIDICARE')
+        hold.save()
+
+        summary = self.distribute(student_class='V-A').json()
+        self.assertEqual(summary['shortages'][0]['available'], 0)
+        self.romanian.refresh_from_db()
+        self.assertEqual(self.romanian.stock, 1)
+
+    def test_dry_run_and_validation(self):
+        summary = self.distribute(student_class='V', dry_run=True).json()
+        self.assertEqual(summary['created'], 4)
+        self.assertFalse(BookBorrowing.objects.exists())
+        self.assertEqual(self.distribute(student_class='V', school_year='2026').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.distribute(student_class='XIII').status_code, status.HTTP_400_BAD_REQUEST)
+
+class LibrarianDashboardTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2)
+
+    def test_counters_follow_transitions_and_reconcile(self):
+        self.client.force_authenticate(self.student.user)
+        borrowing_id = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json').json()['id']
+
+        self.client.force_authenticate(self.librarian)
+        dashboard = self.client.get(reverse('librarian_dashboard')).json()
+        self.assertEqual(dashboard['pending_requests'], 1)
+        self.assertEqual(dashboard['unread_notifications'], 1)
+
+        self.client.post(reverse('approve_request', args=[borrowing_id]))
+        self.client.post(reverse('mark_pickup', args=[borrowing_id]))
+        self.client.post(reverse('mark_all_notifications_read'))
+        with self.assertNumQueries(2):
+            dashboard = self.client.get(reverse('librarian_dashboard')).json()
+        self.assertEqual(dashboard['pending_requests'], 0)
+        self.assertEqual(dashboard['active_loans'], 1)
+        self.assertEqual(dashboard['today'], {'pickups': 1, 'returns': 0})
+        self.assertEqual(dashboard['unread_notifications'], 0)
+
+        out = StringIO()
+        call_command('reconcile_dashboard_counters', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+        # Drift from a change that bypassed the state machine is detected and fixed
+        BookBorrowing.objects.filter(id=borrowing_id).delete()
+        call_command('reconcile_dashboard_counters', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('librarian_dashboard')).json()['active_loans'], 0)
+
+    def test_deleting_a_book_removes_its_borrowings_from_counters(self):
+        self.client.force_authenticate(self.student.user)
+        for _ in range(2):
+            borrowing_id = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json').json()['id']
+            self.client.force_authenticate(self.librarian)
+            self.client.post(reverse('reject_request', args=[borrowing_id]))
+            self.client.force_authenticate(self.student.user)
+        borrowing_id = self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json').json()['id']
+        self.client.force_authenticate(self.librarian)
+        for name in ('approve_request', 'mark_pickup', 'librarian_return_book'):
+            self.client.post(reverse(name, args=[borrowing_id]))
+
+        response = self.client.delete(reverse('delete_book', args=[self.book.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(counters.get_values([counters.status_key('RESPINS')]), {counters.status_key('RESPINS'): 0})
+        out = StringIO()
+        call_command('reconcile_dashboard_counters', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+class IdempotencyKeyTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=1, stock=1)
+        self.client.force_authenticate(user)
+
+    def test_retry_replays_original_response(self):
+        url = reverse('request_book')
+        first = self.client.post(url, {'book_id': self.book.id}, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        retry = self.client.post(url, {'book_id': self.book.id}, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(BookBorrowing.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(notification_type='book_requested').count(), 1)
+
+        # Same key with another body is refused, a new key runs the view again
+        response = self.client.post(url, {'book_id': 999}, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.client.post(url, {'book_id': self.book.id}, format='json', HTTP_IDEMPOTENCY_KEY='abc-2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_send_message_and_expired_keys(self):
+        data = {'recipient_id': self.librarian.id, 'content': 'Bună ziua'}
+        for _ in range(3):
+            self.client.post(reverse('send_message'), data, format='json', HTTP_IDEMPOTENCY_KEY='msg-1')
+        self.assertEqual(Message.objects.count(), 1)
+
+        with override_settings(IDEMPOTENCY_KEY_TTL=0):
+            call_command('cleanup_idempotency_keys', stdout=StringIO())
+            self.client.post(reverse('send_message'), data, format='json', HTTP_IDEMPOTENCY_KEY='msg-1')
+        self.assertEqual(Message.objects.count(), 2)
+
+
+class DeltaSyncTestCase(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2)
+        self.other = Book.objects.create(name='Roman', author='Autor', inventory=1, stock=1)
+        self.notification = Notification.objects.create(user=user, notification_type='system', message='Salut')
+        self.client.force_authenticate(user)
+
+    def test_snapshot_then_delta(self):
+        response = self.client.get(reverse('changes'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        snapshot = response.json()
+        self.assertTrue(snapshot['reset'])
+        self.assertEqual(len(snapshot['changes']['books']['updated']), 2)
+        self.assertEqual(len(snapshot['changes']['notifications']['updated']), 1)
+
+        # Rows untouched since the token are not sent again
+        old = timezone.now() - timedelta(minutes=5)
+        Book.objects.update(updated_at=old)
+        Notification.objects.update(updated_at=old)
+        token = sync.encode_token(timezone.now() - timedelta(minutes=1))
+
+        self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json')
+        self.client.post(reverse('mark_notification_read', args=[self.notification.id]))
+        other_id = self.other.id
+        self.other.delete()
+
+        delta = self.client.get(reverse('changes'), {'since': token}).json()
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['changes']['books'], {'updated': [], 'deleted': [other_id]})
+        self.assertEqual(len(delta['changes']['my_books']['updated']), 1)
+        self.assertEqual([n['is_read'] for n in delta['changes']['notifications']['updated']], [True])
+        self.assertGreater(int(delta['next_token']), int(token))
+
+    def test_old_or_invalid_token(self):
+        token = sync.encode_token(timezone.now() - timedelta(days=60))
+        response = self.client.get(reverse('changes'), {'since': token, 'resources': 'books'})
+        self.assertTrue(response.json()['reset'])
+        self.assertEqual(list(response.json()['changes']), ['books'])
+
+        response = self.client.get(reverse('changes'), {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUT=0)  # ETags only, without the response cache
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2, type='manual')
+        self.client.force_authenticate(self.librarian)
+
+    def test_books_not_modified_until_changed(self):
+        url = reverse('books')
+        first = self.client.get(url)
+        etag = first['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Other filters have their own tag
+        self.assertNotEqual(self.client.get(url, {'category': 'carti'})['ETag'], etag)
+
+        self.client.post(reverse('update_book_stock', args=[self.book.id]), {'stock': 1}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['stock'], 1)
+
+        Book.objects.create(name='Roman', author='Autor', inventory=1, stock=1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_book_exam_models_and_user_info(self):
+        for url in [f"{reverse('book')}?id={self.book.id}", reverse('list_exam_models'), reverse('user_info')]:
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        etag = self.client.get(reverse('list_exam_models'))['ETag']
+        ExamModel.objects.create(name='Model 2026', type='BAC', category='Romana', pdf_file='exam_models/m.pdf')
+        response = self.client.get(reverse('list_exam_models'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 1)
+
+        etag = self.client.get(reverse('user_info'))['ETag']
+        self.librarian.first_name = 'Ana'
+        self.librarian.save()
+        self.assertEqual(self.client.get(reverse('user_info'), HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=2, stock=2, type='manual')
+        self.client.force_authenticate(self.librarian)
+
+    def test_hits_and_signal_invalidation(self):
+        url = reverse('books')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual([book['name'] for book in response.json()], ['Manual'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Query parameters are part of the key
+        self.assertEqual(self.client.get(url, {'category': 'carti'}).json(), [])
+
+        self.book.name = 'Manual nou'
+        self.book.save()
+        self.assertEqual(self.client.get(url).json()[0]['name'], 'Manual nou')
+
+        ExamModel.objects.create(name='Model', type='EN', category='Matematica', pdf_file='exam_models/m.pdf')
+        self.assertEqual(len(self.client.get(reverse('list_exam_models')).json()), 1)
+        ExamModel.objects.all().delete()
+        self.assertEqual(self.client.get(reverse('list_exam_models')).json(), [])
+
+        stats = self.client.get(reverse('response_cache_stats')).json()
+        self.assertEqual(stats['books'], {'hits': 2, 'misses': 3, 'hit_rate': 0.4})
+        self.assertEqual(stats['exam_models']['misses'], 2)
+
+    def test_bulk_stock_changes_invalidate(self):
+        url = reverse('books')
+        self.client.get(url)
+        self.client.post(reverse('batch_update_book_stock'),
+                         {'updates': [{'book_id': self.book.id, 'stock': 1}]}, format='json')
+        self.assertEqual(self.client.get(url).json()[0]['stock'], 1)
+
+
+class ConversationPaginationTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.student = User.objects.create_user(username='elev', password='testpass123')
+        start = timezone.now() - timedelta(hours=1)
+        for index in range(7):
+            sender, recipient = (self.librarian, self.student) if index % 2 else (self.student, self.librarian)
+            message = Message.objects.create(sender=sender, recipient=recipient, content=f'mesaj {index}')
+            # Two messages share a timestamp, so ties are broken by id
+            Message.objects.filter(pk=message.pk).update(timestamp=start + timedelta(minutes=index // 2))
+        self.conversation_id = message.conversation_id
+        self.client.force_authenticate(self.student)
+
+    def get(self, **params):
+        return self.client.get(reverse('get_messages'), {'conversation_id': self.conversation_id, **params})
+
+    def test_load_older_and_newer(self):
+        with self.assertNumQueries(2):  # Page and read watermarks
+            latest = self.get(limit=3)
+        self.assertEqual([m['content'] for m in latest.json()], ['mesaj 4', 'mesaj 5', 'mesaj 6'])
+        # Same message shape as before pagination
+        self.assertEqual(latest.json()[0]['sender'], {'id': self.student.id, 'username': 'elev', 'name': 'elev'})
+        self.assertEqual([m['is_sent_by_me'] for m in latest.json()], [True, False, True])
+
+        seen = [m['content'] for m in latest.json()]
+        response = latest
+        while 'X-Older-Cursor' in response:
+            response = self.get(limit=3, before=response['X-Older-Cursor'])
+            seen = [m['content'] for m in response.json()] + seen
+        self.assertEqual(seen, [f'mesaj {index}' for index in range(7)])
+
+        # Polling for newer messages
+        newer_cursor = latest['X-Newer-Cursor']
+        self.assertEqual(self.get(after=newer_cursor).json(), [])
+        self.assertEqual(self.get(after=newer_cursor)['X-Newer-Cursor'], newer_cursor)
+        Message.objects.create(sender=self.librarian, recipient=self.student, content='nou')
+        self.assertEqual([m['content'] for m in self.get(after=newer_cursor).json()], ['nou'])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.get(before='abc').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MarkConversationReadTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.student = User.objects.create_user(username='elev', password='testpass123')
+        self.messages = [
+            Message.objects.create(sender=self.librarian, recipient=self.student, content=f'mesaj {index}')
+            for index in range(5)
+        ]
+        self.conversation_id = self.messages[0].conversation_id
+        self.client.force_authenticate(self.student)
+
+    def unread(self):
+        key = counters.unread_messages_key(self.student.id)
+        return counters.get_values([key])[key]
+
+    def test_marks_up_to_message_in_one_update(self):
+        self.assertEqual(self.unread(), 5)
+        url = reverse('mark_conversation_read')
+        response = self.client.post(url, {'conversation_id': self.conversation_id,
+                                          'up_to_message_id': self.messages[2].id}, format='json')
+        self.assertEqual(response.json()['marked'], 3)
+        self.assertEqual(response.json()['unread_messages'], 2)
+        self.assertEqual(Message.objects.filter(is_read=False).count(), 2)
+
+        # Marking again, or an older watermark, changes nothing
+        response = self.client.post(url, {'conversation_id': self.conversation_id,
+                                          'up_to_message_id': self.messages[0].id}, format='json')
+        self.assertEqual(response.json()['marked'], 0)
+        self.assertEqual(response.json()['last_read_message_id'], self.messages[2].id)
+
+        response = self.client.post(url, {'conversation_id': self.conversation_id}, format='json')
+        self.assertEqual(response.json()['marked'], 2)
+        self.assertEqual(self.unread(), 0)
+        page = self.client.get(reverse('get_messages'), {'conversation_id': self.conversation_id})
+        self.assertEqual(page['X-Read-Up-To'], f'{self.student.id}={self.messages[4].id}')
+
+        # Single-message endpoint does not decrement twice
+        self.client.post(reverse('mark_message_read', args=[self.messages[4].id]))
+        self.assertEqual(self.unread(), 0)
+
+        call_command('reconcile_dashboard_counters', stdout=StringIO())
+        self.assertEqual(self.unread(), 0)
+
+    def test_other_conversation(self):
+        self.client.force_authenticate(User.objects.create_user(username='altul', password='testpass123'))
+        response = self.client.post(reverse('mark_conversation_read'), {'conversation_id': self.conversation_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(Message.objects.filter(is_read=False).count(), 5)
+
+
+class BroadcastTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.students = []
+        for index in range(7):
+            user = User.objects.create_user(username=f'elev{index}', password='testpass123')
+            self.students.append(Student.objects.create(
+                user=user, student_id=f'ST{index:06d}', student_class='V-A' if index < 5 else 'VI-B'
+            ))
+        teacher = User.objects.create_user(username='profesor', password='testpass123')
+        teacher.groups.add(Group.objects.create(name='Teachers'))
+        self.client.force_authenticate(self.librarian)
+
+    def test_class_broadcast_is_delivered_in_batches(self):
+        response = self.client.post(reverse('broadcast_message'),
+                                    {'audience': 'class', 'student_class': 'V-A', 'content': 'Aduceți manualele'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['recipient_count'], 5)
+        self.assertEqual(Message.objects.count(), 0)  # Nothing is delivered inside the request
+
+        broadcast_id = response.json()['id']
+        with self.assertNumQueries(25):  # A fixed number of queries per batch of 2, not per recipient
+            self.assertEqual(broadcasts.deliver(broadcast_id, batch_size=2), 5)
+        self.assertEqual(
+            set(Message.objects.values_list('recipient_id', flat=True)),
+            {student.user_id for student in self.students[:5]},
+        )
+        message = Message.objects.get(recipient=self.students[0].user)
+        self.assertEqual(message.conversation_id, f'conv_{self.librarian.id}_{self.students[0].user_id}')
+        self.assertEqual(counters.get_values([counters.unread_messages_key(self.students[0].user_id)]),
+                         {counters.unread_messages_key(self.students[0].user_id): 1})
+
+        response = self.client.get(reverse('broadcast_status', args=[broadcast_id]))
+        self.assertEqual(response.json()['status'], 'TRIMIS')
+        self.assertEqual(response.json()['delivered_count'], 5)
+        # Already delivered broadcasts are not delivered again
+        self.assertEqual(broadcasts.deliver(broadcast_id), 0)
+
+    def test_command_resumes_abandoned_delivery(self):
+        broadcast = broadcasts.create_broadcast(self.librarian, 'students', 'Program nou')
+        self.assertEqual(broadcast.recipient_count, 7)
+        # A worker delivered to the first two students and died
+        Broadcast.objects.filter(pk=broadcast.pk).update(
+            status='IN_CURS', claimed_at=timezone.now() - timedelta(hours=1),
+            last_recipient_id=self.students[1].user_id, delivered_count=2,
+        )
+        call_command('deliver_broadcasts', stdout=StringIO())
+        self.assertEqual(Message.objects.count(), 5)
+        self.assertEqual(Broadcast.objects.get(pk=broadcast.pk).delivered_count, 7)
+
+    def test_invalid_audience(self):
+        for data in [{'audience': 'everyone', 'content': 'x'}, {'audience': 'class', 'student_class': 'Z', 'content': 'x'}]:
+            response = self.client.post(reverse('broadcast_message'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MessageSearchTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.student = User.objects.create_user(username='elev', password='testpass123')
+        other = User.objects.create_user(username='altul', password='testpass123')
+        Message.objects.create(sender=self.student, recipient=self.librarian, content='Am pierdut manualul de istorie')
+        Message.objects.create(sender=self.librarian, recipient=self.student, content='Manualul de matematică e gata')
+        for index in range(3):
+            Message.objects.create(sender=self.librarian, recipient=self.student, content=f'Prelungire {index} aprobată')
+        # Someone else's conversation is never searched
+        Message.objects.create(sender=other, recipient=self.librarian, content='Manualul meu de istorie')
+        self.client.force_authenticate(self.student)
+
+    def test_search_with_snippets_and_pages(self):
+        response = self.client.get(reverse('search_messages'), {'q': 'istorie'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertIn('<mark>istorie</mark>', results[0]['snippet'])
+        self.assertTrue(results[0]['is_sent_by_me'])
+        self.assertEqual(results[0]['other_user']['id'], self.librarian.id)
+
+        # Diacritics are ignored and the last word is a prefix
+        self.assertEqual(len(self.client.get(reverse('search_messages'), {'q': 'matematica'}).json()['results']), 1)
+        self.assertEqual(len(self.client.get(reverse('search_messages'), {'q': 'manual'}).json()['results']), 2)
+
+        first = self.client.get(reverse('search_messages'), {'q': 'aprobata', 'limit': 2}).json()
+        second = self.client.get(reverse('search_messages'), {'q': 'aprobata', 'limit': 2, 'page': 2}).json()
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len({r['id'] for r in first['results'] + second['results']}), 3)
+
+    def test_snippets_escape_message_html(self):
+        Message.objects.create(sender=self.librarian, recipient=self.student,
+                               content='<script>alert(1)</script> salut & bun venit')
+        snippet = self.client.get(reverse('search_messages'), {'q': 'salut'}).json()['results'][0]['snippet']
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('<mark>salut</mark> &amp; bun', snippet)
+
+        snippet = fulltext.make_snippet('<b>salut</b> <img src=x onerror=alert(1)>', 'salut')
+        self.assertEqual(snippet, '&lt;b&gt;<mark>salut</mark>&lt;/b&gt; &lt;img src=x onerror=alert(1)&gt;')
+        self.assertEqual(fulltext.make_snippet('<i>x</i>', 'absent'), '&lt;i&gt;x&lt;/i&gt;')
+
+    def test_edited_messages_are_reindexed(self):
+        message = Message.objects.get(content__startswith='Am pierdut')
+        message.content = 'Am găsit caietul'
+        message.save()
+        self.assertEqual(self.client.get(reverse('search_messages'), {'q': 'pierdut'}).json()['results'], [])
+        self.assertEqual(len(self.client.get(reverse('search_messages'), {'q': 'caietul'}).json()['results']), 1)
+
+
+class RetentionTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.student = User.objects.create_user(username='elev', password='testpass123')
+        old = timezone.now() - timedelta(days=1000)
+        for index in range(5):
+            message = Message.objects.create(sender=self.librarian, recipient=self.student, content=f'vechi {index}',
+                                             is_read=index < 4)
+            Message.objects.filter(pk=message.pk).update(timestamp=old)
+        Message.objects.create(sender=self.librarian, recipient=self.student, content='nou', is_read=True)
+        notification = Notification.objects.create(user=self.student, notification_type='system', message='vechi',
+                                                   is_read=True)
+        Notification.objects.filter(pk=notification.pk).update(timestamp=old)
+        Notification.objects.create(user=self.student, notification_type='system', message='necitit')
+
+    def test_dry_run_then_archive_in_batches(self):
+        out = StringIO()
+        call_command('apply_retention', '--dry-run', stdout=out)
+        self.assertIn('Would archive 4 read messages', out.getvalue())
+        self.assertIn('Would archive 1 read notifications', out.getvalue())
+        self.assertEqual(Message.objects.count(), 6)
+
+        call_command('apply_retention', '--batch-size', '3', stdout=StringIO())
+        # Unread and recent rows stay in the hot tables
+        self.assertEqual(sorted(Message.objects.values_list('content', flat=True)), ['nou', 'vechi 4'])
+        self.assertEqual(list(Notification.objects.values_list('message', flat=True)), ['necitit'])
+        self.assertEqual(ArchivedMessage.objects.count(), 4)
+        self.assertEqual(ArchivedNotification.objects.get().message, 'vechi')
+        # Archived messages drop out of search too
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(reverse('search_messages'), {'q': 'vechi'}).json()['results'][0]['snippet'],
+                         '<mark>vechi</mark> 4')
+
+    def test_delete_mode(self):
+        call_command('apply_retention', '--delete', '--only', 'messages', stdout=StringIO())
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(ArchivedMessage.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+class NotificationCoalescingTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123', email='bib@nlenau.ro')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.books = [Book.objects.create(name=f'Carte {index}', author='Autor', inventory=3, stock=3)
+                      for index in range(3)]
+
+    def unread(self):
+        key = counters.UNREAD_LIBRARIAN_NOTIFICATIONS
+        return counters.get_values([key])[key]
+
+    def test_similar_events_are_merged(self):
+        for book in self.books:
+            user = User.objects.create_user(username=f'elev{book.id}', password='testpass123')
+            Student.objects.create(user=user, student_id=f'ST{book.id:06d}')
+            self.client.force_authenticate(user)
+            self.client.post(reverse('request_book'), {'book_id': book.id}, format='json')
+
+        notification = Notification.objects.get(notification_type='book_requested')
+        self.assertEqual(notification.count, 3)
+        self.assertEqual(notification.message, '3 cereri noi de împrumut')
+        self.assertIsNone(notification.book)
+        self.assertEqual(self.unread(), 1)
+
+        # Once read, or outside the window, a new row is started
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('mark_notification_read', args=[notification.id]))
+        create_librarian_notification('book_requested', 'Cerere nouă', book=self.books[0])
+        Notification.objects.filter(is_read=False).update(timestamp=timezone.now() - timedelta(hours=1))
+        create_librarian_notification('book_requested', 'Cerere nouă', book=self.books[0])
+        self.assertEqual(Notification.objects.filter(notification_type='book_requested').count(), 3)
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.client.get(reverse('get_notifications')).json()[0]['count'], 1)
+
+    @override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+    def test_coalescing_can_be_disabled(self):
+        for book in self.books:
+            create_librarian_notification('book_added', f"Cartea '{book.name}' a fost adăugată", book=book)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_digest(self):
+        for book in self.books:
+            create_librarian_notification('book_added', f"Cartea '{book.name}' a fost adăugată", book=book)
+        create_librarian_notification('book_deleted', 'Carte ștearsă')
+        # Still gathering events: left for the next digest
+        self.assertEqual(librarian_digest(*digest_period(24)), [])
+        Notification.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+
+        out = StringIO()
+        call_command('send_notification_digest', '--dry-run', stdout=out)
+        self.assertIn('- Carte adăugată: 3', out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('send_notification_digest', stdout=StringIO())
+        self.assertEqual(mail.outbox[0].to, ['bib@nlenau.ro'])
+        self.assertIn('- Carte ștearsă: 1', mail.outbox[0].body)
+
+    def test_digest_counts_events_of_the_period_once(self):
+        # Started before the previous digest, then updated (read) inside this period: already reported
+        earlier = create_librarian_notification('book_added', 'Carte adăugată', book=self.books[0])
+        Notification.objects.filter(id=earlier.id).update(timestamp=timezone.now() - timedelta(hours=30))
+        earlier.refresh_from_db()
+        earlier.is_read = True
+        earlier.save()
+        # Merged notification started inside the period: all of its events count
+        for book in self.books:
+            create_librarian_notification('book_requested', 'Cerere nouă', book=book)
+        Notification.objects.filter(notification_type='book_requested').update(
+            timestamp=timezone.now() - timedelta(hours=2)
+        )
+
+        since, until = digest_period(24)
+        self.assertEqual(librarian_digest(since, until), [('Carte solicitată', 3)])
+        self.assertEqual(librarian_digest(since - timedelta(hours=24), since), [('Carte adăugată', 1)])
+
+
+class UnreadCountsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        user = User.objects.create_user(username='elev', password='testpass123')
+        self.student = Student.objects.create(user=user, student_id='ST000001')
+        self.book = Book.objects.create(name='Manual', author='Autor', inventory=1, stock=1)
+
+    def counts(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('unread_counts')).json()
+
+    def test_counts_follow_inserts_and_reads(self):
+        self.client.force_authenticate(self.student.user)
+        self.client.post(reverse('request_book'), {'book_id': self.book.id}, format='json')
+        borrowing = BookBorrowing.objects.get()
+        self.client.force_authenticate(self.librarian)
+        self.client.post(reverse('approve_request', args=[borrowing.id]), {'librarian_message': 'Vino mâine'},
+                         format='json')
+
+        self.assertEqual(self.counts(self.student.user), {'messages': 1, 'notifications': 1})
+        self.assertEqual(self.counts(self.librarian), {'messages': 0, 'notifications': 1})
+
+        # Served from the cache until a counter changes
+        self.client.force_authenticate(self.student.user)
+        with self.assertNumQueries(1):  # Librarian group check only
+            self.client.get(reverse('unread_counts'))
+
+        self.client.post(reverse('mark_all_notifications_read'))
+        self.client.post(reverse('mark_conversation_read'), {'conversation_id': Message.objects.get().conversation_id},
+                         format='json')
+        self.assertEqual(self.counts(self.student.user), {'messages': 0, 'notifications': 0})
+
+    def test_teacher_registration_counts_for_librarians(self):
+        InvitationCode.objects.create(code='PROF2026', created_by=self.librarian,
+                                      expires_at=timezone.now() + timedelta(days=1))
+        serializer = RegistrationSerializer(data={
+            'email': 'ana.pop@nlenau.ro', 'password': 'Parola-lunga-123', 'first_name': 'Ana', 'last_name': 'Pop',
+            'is_teacher': True, 'invitation_code': 'prof2026',
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(self.counts(self.librarian)['notifications'], 1)
+
+    def test_reconcile_fixes_per_user_notification_counters(self):
+        Notification.objects.create(user=self.student.user, notification_type='system', message='Salut')
+        self.assertEqual(self.counts(self.student.user)['notifications'], 0)
+        call_command('reconcile_dashboard_counters', stdout=StringIO())
+        self.assertEqual(self.counts(self.student.user)['notifications'], 1)
+
+
+class NotificationListTestCase(APITestCase):
+    def setUp(self):
+        self.librarian = User.objects.create_user(username='librarian', password='testpass123',
+                                                  first_name='ana', last_name='pop')
+        self.librarian.groups.add(Group.objects.create(name='Librarians'))
+        self.student = User.objects.create_user(username='elev', password='testpass123')
+        student = Student.objects.create(user=self.student, student_id='ST000001')
+        book = Book.objects.create(name='Manual', author='Autor', inventory=1, stock=1)
+        borrowing = BookBorrowing.objects.create(student=student, book=book, status='IMPRUMUTAT')
+        start = timezone.now() - timedelta(hours=1)
+        for index in range(7):
+            notification = Notification.objects.create(
+                user=self.student, notification_type='request_approved', message=f'notificare {index}',
+                book=book if index % 2 else None, borrowing=borrowing if index % 3 else None,
+                created_by=self.librarian if index % 2 else None,
+            )
+            # Two notifications share a timestamp, so ties are broken by id
+            Notification.objects.filter(pk=notification.pk).update(timestamp=start + timedelta(minutes=index // 2))
+        self.client.force_authenticate(self.student)
+
+    def test_one_query_per_page(self):
+        with self.assertNumQueries(2):  # Librarian group check and the page itself
+            response = self.client.get(reverse('get_notifications'))
+        expected = [serialize_notification(notification) for notification in
+                    Notification.objects.filter(user=self.student).order_by('-timestamp', '-id')]
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()[1]['created_by']['name'], 'Ana Pop')
+        self.assertNotIn('X-Next-Cursor', response)
+
+    def test_pages_by_cursor(self):
+        seen = []
+        params = {'limit': 3}
+        while True:
+            response = self.client.get(reverse('get_notifications'), params)
+            seen += [notification['message'] for notification in response.json()]
+            if 'X-Next-Cursor' not in response:
+                break
+            params['before'] = response['X-Next-Cursor']
+        self.assertEqual(seen, [f'notificare {index}' for index in reversed(range(7))])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('get_notifications'), {'before': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoginTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Ion.Popescu', email='ion.popescu@nlenau.ro',
+                                             password='testpass123')
+        EmailVerification.objects.create(user=self.user, is_verified=True)
+        other = User.objects.create_user(username='maria', email='maria.ionescu@gmail.com', password='testpass123')
+        EmailVerification.objects.create(user=other, is_verified=True)
+
+    def login(self, email, password='testpass123'):
+        return self.client.post(reverse('token_obtain_pair'), {'email': email, 'password': password}, format='json')
+
+    def test_lookup_variants(self):
+        for identifier in ['ion.popescu', 'ION.POPESCU@nlenau.ro', 'Ion.Popescu', 'maria', 'MARIA@nlenau.ro',
+                           'Maria.Ionescu@gmail.com']:
+            self.assertEqual(self.login(identifier).status_code, status.HTTP_200_OK, identifier)
+        self.assertEqual(self.login('nimeni').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('maria', 'gresit').json()['detail'], 'Parola este incorecta')
+
+    def test_one_query_for_user_and_verification(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login('ion.popescu', 'gresit').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(LOGIN_THROTTLE_ACCOUNT_BURST=2)
+    def test_account_throttle(self):
+        self.login('ion.popescu', 'gresit')
+        self.login('ION.POPESCU@nlenau.ro', 'gresit')
+        response = self.login('ion.popescu')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Other accounts behind the same address are not affected
+        self.assertEqual(self.login('maria').status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_THROTTLE_IP_BURST=3)
+    def test_ip_throttle(self):
+        for identifier in ['nimeni', 'altcineva', 'maria']:
+            self.login(identifier, 'gresit')
+        with self.assertNumQueries(0):
+            response = self.login('ion.popescu')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class PasswordHashingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        with self.settings(PBKDF2_ITERATIONS=1000):
+            self.user = User.objects.create_user(username='elev', email='elev@nlenau.ro', password='testpass123')
+        EmailVerification.objects.create(user=self.user, is_verified=True)
+
+    def login(self, password='testpass123'):
+        return self.client.post(reverse('token_obtain_pair'), {'email': 'elev', 'password': password}, format='json')
+
+    @override_settings(PBKDF2_ITERATIONS=2000)
+    def test_rehash_on_login(self):
+        self.assertEqual(self.login('gresit').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PBKDF2_ITERATIONS=1000)
+    def test_other_algorithm_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('testpass123', hasher='pbkdf2_sha1')
+        )
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(PBKDF2_ITERATIONS=1000)
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_password_hashing', seconds=0.05, peak=600, stdout=out)
+        self.assertIn('Hasher: pbkdf2_sha256 (iterations: 1000)', out.getvalue())
+        self.assertIn('hashes/sec per core', out.getvalue())
+        self.assertIn('Peak of 600 logins in 60s', out.getvalue())
@@ -6,10 +6,13 @@ urlpatterns = [
     path('books', views.books, name='books'),
     path('book', views.book, name='book'),
     path('book/<int:book_id>', views.update_book_details, name='update_book_details'),
+    path('import-catalog', views.import_catalog, name='import_catalog'),
     path('thumbnails', views.upload_thumbnail, name='upload_thumbnail'),
     path('upload-pdf', views.upload_pdf, name='upload_pdf'),
+    path('upload-url', views.request_upload_url, name='request_upload_url'),
     path('request-book', views.request_book, name='request_book'),
     path('my-books', views.my_books, name='my_books'),
+    path('changes', views.changes, name='changes'),
     path('return-book/<int:borrowing_id>', views.return_book, name='return_book'),
     path('register', views.register_user, name='register_user'),
     path('user-info', views.user_info, name='user_info'),
@@ -17,11 +20,32 @@ urlpatterns = [
     path('active-loans', views.active_loans, name='active_loans'),
     path('loan-history', views.loan_history, name='loan_history'),
     path('all-book-requests', views.all_book_requests, name='all_book_requests'),
+    path('librarian-dashboard', views.librarian_dashboard, name='librarian_dashboard'),
+    path('cache-stats', views.response_cache_stats, name='response_cache_stats'),
+    path('borrowing/<int:borrowing_id>/history', views.borrowing_history, name='borrowing_history'),
+    path('borrowing-status-times', views.borrowing_status_times, name='borrowing_status_times'),
     path('approve-request/<int:borrowing_id>', views.approve_request, name='approve_request'),
     path('reject-request/<int:borrowing_id>', views.reject_request, name='reject_request'),
     path('mark-pickup/<int:borrowing_id>', views.mark_pickup, name='mark_pickup'),
     path('librarian-return/<int:borrowing_id>', views.librarian_return_book, name='librarian_return_book'),
+    path('approve-request/batch', views.bulk_approve_requests, name='bulk_approve_requests'),
+    path('reject-request/batch', views.bulk_reject_requests, name='bulk_reject_requests'),
+    path('mark-pickup/batch', views.bulk_mark_pickup, name='bulk_mark_pickup'),
+    path('librarian-return/batch', views.bulk_librarian_return, name='bulk_librarian_return'),
+    path('distribute-manuals', views.distribute_manuals, name='distribute_manuals'),
+    
+    # Waitlist for books without available copies
+    path('book/<int:book_id>/hold', views.book_hold, name='book_hold'),
+    path('book/<int:book_id>/holds', views.book_holds, name='book_holds'),
+    path('my-holds', views.my_holds, name='my_holds'),
+    
+    # Physical copies and barcode scanning at the desk
+    path('book/<int:book_id>/copies', views.book_copies, name='book_copies'),
+    path('copies/<str:barcode>', views.lookup_copy, name='lookup_copy'),
+    path('scan-checkout', views.scan_checkout, name='scan_checkout'),
+    path('scan-return', views.scan_return, name='scan_return'),
     path('update-book-stock/<int:book_id>', views.update_book_stock, name='update_book_stock'),
+    path('update-book-stock/batch', views.batch_update_book_stock, name='batch_update_book_stock'),
     path('delete-book/<int:book_id>', views.delete_book, name='delete_book'),
     
     # New messaging endpoints
@@ -29,8 +53,13 @@ urlpatterns = [
     path('approve-extension/<int:borrowing_id>', views.approve_extension, name='approve_extension'),
     path('decline-extension/<int:borrowing_id>', views.decline_extension, name='decline_extension'),
     path('send-message', views.send_message, name='send_message'),
+    path('broadcast-message', views.broadcast_message, name='broadcast_message'),
+    path('broadcasts/<int:broadcast_id>', views.broadcast_status, name='broadcast_status'),
     path('messages', views.get_messages, name='get_messages'),
+    path('unread-counts', views.unread_counts, name='unread_counts'),
+    path('messages/search', views.search_messages, name='search_messages'),
     path('mark-message-read/<int:message_id>', views.mark_message_read, name='mark_message_read'),
+    path('mark-conversation-read', views.mark_conversation_read, name='mark_conversation_read'),
     path('users', views.get_all_users, name='get_all_users'),
     path('search-users', views.search_users, name='search_users'),
     
@@ -44,6 +73,9 @@ urlpatterns = [
     path('exam-models/create/', create_exam_model, name='create_exam_model'),
     path('exam-models/<int:pk>/delete/', delete_exam_model, name='delete_exam_model'),
 
+    # Full-text search inside manual/exam model PDFs
+    path('search-documents', views.search_documents, name='search_documents'),
+
     # Email verification endpoints
     path('send-verification-email', views.send_verification_email, name='send_verification_email'),
     path('verify-email', views.verify_email, name='verify_email'),
@@ -37,4 +37,27 @@ def get_display_name(user):
     elif user.last_name:
         return capitalize_name(user.last_name)
     else:
-        return user.username 
\ No newline at end of file
+        return user.username 
+
+def media_path_from_url(value):
+    """
+    Turn whatever is stored in a media field (full URL, /media/... path or
+    bare storage name) into the storage-relative file name.
+    Returns None if no media path can be extracted.
+    """
+    if not value:
+        return None
+    value = str(value)
+    if value.startswith('http'):
+        # Extract just the media path from URL
+        parts = value.split('/media/')
+        if len(parts) < 2:
+            return None
+        value = parts[1]
+    # Remove leading slash if present
+    if value.startswith('/'):
+        value = value[1:]
+    # Remove media/ prefix if present
+    if value.startswith('media/'):
+        value = value[6:]
+    return value or None
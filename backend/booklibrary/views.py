@@ -8,10 +8,11 @@ from django.core.files.base import ContentFile
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User, Group
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
 from django.core.mail import send_mail
 from django.urls import reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseRedirect
 import logging
 import urllib.parse
 
@@ -21,19 +22,31 @@ from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 
-from .models import Book, Student, BookBorrowing, Message, Notification, ExamModel, EmailVerification, InvitationCode
+from .models import Book, BookCopy, Student, BookBorrowing, BookHold, BorrowingTransition, Broadcast, ConversationReadState, Message, Notification, ExamModel, EmailVerification, InvitationCode, IndexedDocument
 from .serializers import (
-    BookSerializer, StudentSerializer, BookBorrowingSerializer,
+    BookSerializer, BookCopySerializer, StudentSerializer, BookBorrowingSerializer, BookHoldSerializer, BorrowingTransitionSerializer, BroadcastSerializer,
     RegistrationSerializer, UserSerializer, ExamModelSerializer, EmailVerificationSerializer, InvitationCodeSerializer
 )
-from .utils import get_display_name
+from .utils import get_display_name, media_path_from_url
+from . import borrowing_states, broadcasts, catalog_import, counters, document_index, etags, login, manual_distribution, message_search, pagination, response_cache, storage, sync
+from .idempotency import idempotent
+from .notifications import (
+    NOTIFICATION_FIELDS, create_librarian_notification, create_user_notification, serialize_notification_rows,
+)
 
 # Email validation pattern for @nlenau.ro domain
 EMAIL_PATTERN = r'^[a-zA-Z0-9_.+-]+@nlenau\.ro$'
 
+# Upload limits, shared by the multipart upload views and presigned direct uploads
+THUMBNAIL_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+THUMBNAIL_MAX_SIZE = 5 * 1024 * 1024  # 5MB in bytes
+PDF_MAX_SIZE = 100 * 1024 * 1024  # 100MB in bytes
+
+# Upper bound for entries accepted by the batch endpoints in one request
+MAX_BATCH_ITEMS = 5000
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -157,10 +170,8 @@ def register_user(request):
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def books(request):
-    """Get all books or search books"""
+def filtered_books(request):
+    """Books matching the ?search= and ?category= filters of the catalog"""
     query = request.GET.get('search', '')
     category = request.GET.get('category', '')
     
@@ -179,12 +190,31 @@ def books(request):
         # Show only books with type 'manual'
         books = books.filter(type='manual')
     
-    serializer = BookSerializer(books, many=True)
+    return books
+
+def books_etag(request):
+    return etags.queryset_etag(filtered_books(request))
+
+def book_etag(request):
+    book_id = request.GET.get('id')
+    if not book_id or not book_id.isdigit():
+        return None
+    last = Book.objects.filter(id=book_id).values_list('updated_at', flat=True).first()
+    return etags.make_etag('book', book_id, last.isoformat()) if last else None
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@response_cache.cached('books')
+@etags.conditional(books_etag)
+def books(request):
+    """Get all books or search books"""
+    serializer = BookSerializer(filtered_books(request), many=True)
     return Response(serializer.data)
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser, JSONParser])
+@etags.conditional(book_etag)
 def book(request):
     if request.method == 'GET':
         book_id = request.GET.get('id')
@@ -226,6 +256,8 @@ def book(request):
         serializer = BookSerializer(data=data)
         if serializer.is_valid():
             new_book = serializer.save()
+            if new_book.pdf_file:
+                document_index.schedule_indexing('book', new_book.id)
             
             # Create notification for librarians
             create_librarian_notification(
@@ -238,6 +270,35 @@ def book(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def import_catalog(request):
+    """Bulk import books from a CSV/XLSX file - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Only librarians can import books'}, status=status.HTTP_403_FORBIDDEN)
+
+    file = request.FILES.get('file')
+    if not file:
+        return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+
+    try:
+        summary = catalog_import.import_catalog(file, file.name, dry_run=dry_run)
+    except catalog_import.CatalogImportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # One summary notification instead of one per imported book
+    if not dry_run and (summary['created'] or summary['updated']):
+        create_librarian_notification(
+            notification_type='books_imported',
+            message=f"Import catalog: {summary['created']} cărți adăugate, {summary['updated']} actualizate",
+            created_by=request.user
+        )
+
+    return Response({'dry_run': dry_run, **summary})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser])
@@ -247,16 +308,15 @@ def upload_thumbnail(request):
         return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Validate file type
-    allowed_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
     file_extension = os.path.splitext(file.name.lower())[1]
     
-    if file_extension not in allowed_extensions:
+    if file_extension not in THUMBNAIL_EXTENSIONS:
         return Response({
-            'error': f'Invalid file type. Allowed types: {", ".join(allowed_extensions)}'
+            'error': f'Invalid file type. Allowed types: {", ".join(THUMBNAIL_EXTENSIONS)}'
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Validate file size (limit to 5MB)
-    if file.size > 5 * 1024 * 1024:  # 5MB in bytes
+    if file.size > THUMBNAIL_MAX_SIZE:
         return Response({
             'error': 'File size must be less than 5MB'
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -283,7 +343,7 @@ def upload_pdf(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     # Validate file size (limit to 100MB for PDFs)
-    if file.size > 100 * 1024 * 1024:  # 100MB in bytes
+    if file.size > PDF_MAX_SIZE:
         return Response({
             'error': 'File size must be less than 100MB'
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -297,6 +357,78 @@ def upload_pdf(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([JSONParser])
+def request_upload_url(request):
+    """
+    Get a presigned URL to upload a thumbnail or PDF directly to object storage.
+    When media is stored on local disk the client must use the multipart upload endpoints.
+    """
+    kind = request.data.get('kind')
+    filename = os.path.basename(request.data.get('filename') or '')
+    content_type = request.data.get('content_type')
+
+    if kind not in ('thumbnail', 'pdf') or not filename:
+        return Response({'error': "kind ('thumbnail' or 'pdf') and filename are required"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    file_extension = os.path.splitext(filename.lower())[1]
+    if kind == 'thumbnail':
+        if file_extension not in THUMBNAIL_EXTENSIONS:
+            return Response({
+                'error': f'Invalid file type. Allowed types: {", ".join(THUMBNAIL_EXTENSIONS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        folder, max_size, fallback = 'thumbnails', THUMBNAIL_MAX_SIZE, 'upload_thumbnail'
+    else:
+        if file_extension != '.pdf':
+            return Response({'error': 'Only PDF files are allowed'}, status=status.HTTP_400_BAD_REQUEST)
+        folder, max_size, fallback = 'books', PDF_MAX_SIZE, 'upload_pdf'
+
+    if not storage.uses_object_storage():
+        return Response({
+            'direct_upload': False,
+            'upload_endpoint': request.build_absolute_uri(reverse(fallback)),
+        })
+
+    key = os.path.join(folder, f"{uuid.uuid4().hex}_{filename}")
+    presigned = storage.presigned_upload(key, max_size, content_type=content_type)
+    return Response({
+        'direct_upload': True,
+        'upload_url': presigned['url'],
+        'fields': presigned['fields'],
+        'key': key,
+        # Same shape as the multipart upload responses, to be stored on the book afterwards
+        'file_url': request.build_absolute_uri(settings.MEDIA_URL + key),
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def media_redirect(request, path):
+    """Serve /media/ URLs from object storage by redirecting to a presigned download URL"""
+    return HttpResponseRedirect(storage.presigned_download_url(path))
+
+def get_borrower(user):
+    """
+    Student record used for borrowing, or None if the user cannot borrow.
+    Teachers get a student record created on their first request.
+    """
+    if hasattr(user, 'student'):
+        return user.student
+    if not user.groups.filter(name='Teachers').exists():
+        return None
+    student, created = Student.objects.get_or_create(
+        user=user,
+        defaults={
+            'student_id': f"T{user.id}",  # Teacher ID format
+            'school_type': None,
+            'department': None,
+            'student_class': None
+        }
+    )
+    return student
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+@idempotent
 def request_book(request):
     """Request to borrow a book"""
     book_id = request.data.get('book_id')
@@ -307,28 +439,10 @@ def request_book(request):
 
     book = get_object_or_404(Book, id=book_id)
 
-    # Check if user is a student
-    is_student = hasattr(request.user, 'student')
-    is_teacher = request.user.groups.filter(name='Teachers').exists()
-    
-    if not (is_student or is_teacher):
+    student = get_borrower(request.user)
+    if student is None:
         return Response({'error': 'Doar studenții și profesorii pot solicita cărți'}, status=status.HTTP_403_FORBIDDEN)
     
-    # For teachers, we'll create a temporary student object just for the borrowing
-    if is_teacher and not is_student:
-        # Check if this teacher already has a student record
-        student, created = Student.objects.get_or_create(
-            user=request.user,
-            defaults={
-                'student_id': f"T{request.user.id}",  # Teacher ID format
-                'school_type': None,
-                'department': None,
-                'student_class': None
-            }
-        )
-    else:
-        student = request.user.student
-    
     # Check if user already has a pending or active request for this book
     existing_request = BookBorrowing.objects.filter(
         student=student,
@@ -342,8 +456,12 @@ def request_book(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    if book.available_copies <= 0:
-        return Response({'error': 'Nu există exemplare disponibile'}, status=status.HTTP_400_BAD_REQUEST)
+    # Copies assigned to the waitlist are kept for the students they were promised to
+    if book.available_copies - borrowing_states.reserved_for_holds(book) <= 0:
+        return Response(
+            {'error': 'Nu există exemplare disponibile', 'can_join_waitlist': True},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     borrowing = BookBorrowing.objects.create(
         book=book,
@@ -355,6 +473,7 @@ def request_book(request):
     # Set estimated due date (will be updated to actual due date when picked up)
     borrowing.due_date = timezone.now() + timedelta(days=loan_duration)
     borrowing.save()
+    borrowing_states.log_created([borrowing], actor=request.user)
     
     # Create notification for librarians
     create_librarian_notification(
@@ -395,6 +514,27 @@ def my_books(request):
     serializer = BookBorrowingSerializer(borrowings, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def changes(request):
+    """
+    Delta sync of books, my_books and notifications.
+    Without ?since= the full data set is returned; afterwards clients pass the
+    previous next_token to get only updated rows and deleted ids.
+    Optional ?resources=books,notifications limits the response.
+    """
+    resources = request.query_params.get('resources')
+    try:
+        data = sync.changes_since(
+            request.user,
+            request.query_params.get('since') or None,
+            resources.split(',') if resources else None,
+        )
+    except sync.InvalidToken as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(data)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([JSONParser])
@@ -407,16 +547,10 @@ def return_book(request, borrowing_id):
 
     borrowing = get_object_or_404(BookBorrowing, id=borrowing_id, student=student)
     
-    if borrowing.status != 'IMPRUMUTAT':
-        return Response(
-            {'error': f'Cannot return book with status: {borrowing.status}'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
-    borrowing.return_date = timezone.now()
-    borrowing.status = 'RETURNAT'
-    borrowing.fine_amount = borrowing.calculate_fine()
-    borrowing.save()
+    try:
+        borrowing = borrowing_states.transition(borrowing.id, 'student_return', actor=request.user)
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     serializer = BookBorrowingSerializer(borrowing)
     return Response(serializer.data)
@@ -454,7 +588,9 @@ def user_info(request):
     except Exception as e:
         logging.getLogger('user_info').exception(f"Unexpected error in user_info: {e}")
     
-    return Response(data)
+    # The payload is tiny and has no timestamps, so it is its own version tag
+    etag = etags.payload_etag(data)
+    return etags.not_modified(request, etag) or etags.with_etag(Response(data), etag)
 
 # Librarian views
 @api_view(['GET'])
@@ -517,44 +653,15 @@ def approve_request(request, borrowing_id):
     if not request.user.groups.filter(name='Librarians').exists():
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    borrowing = get_object_or_404(BookBorrowing, id=borrowing_id)
-    
-    if borrowing.status != 'IN_ASTEPTARE':
-        return Response({'error': f'Cannot approve request with status: {borrowing.status}'}, 
-                        status=status.HTTP_400_BAD_REQUEST)
-    
-    # Update book stock
-    book = borrowing.book
-    if book.stock <= 0:
-        return Response({'error': 'No copies available'}, status=status.HTTP_400_BAD_REQUEST)
-    
     # Book is now reserved but not yet picked up
     # We'll deduct from stock when user picks up the book
-    
-    # Update borrowing record
-    now = timezone.now()
-    borrowing.status = 'APROBAT'
-    borrowing.approved_date = now
-    borrowing.save()
-    
-    # Add librarian message if provided
-    librarian_message = request.data.get('librarian_message')
-    if librarian_message:
-        Message.objects.create(
-            sender=request.user,
-            recipient=borrowing.student.user,
-            borrowing=borrowing,
-            content=librarian_message
+    # The librarian message (if any) and the student notification are created by the transition
+    try:
+        borrowing = borrowing_states.transition(
+            borrowing_id, 'approve', actor=request.user, librarian_message=request.data.get('librarian_message')
         )
-    
-    # Create notification for the student/teacher
-    create_user_notification(
-        user=borrowing.student.user,
-        notification_type='request_approved',
-        message=f"Cererea ta pentru '{book.name}' a fost aprobată",
-        book=book,
-        borrowing=borrowing
-    )
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = BookBorrowingSerializer(borrowing)
     return Response(serializer.data)
@@ -567,39 +674,25 @@ def reject_request(request, borrowing_id):
     if not request.user.groups.filter(name='Librarians').exists():
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    borrowing = get_object_or_404(BookBorrowing, id=borrowing_id)
-    
-    if borrowing.status != 'IN_ASTEPTARE':
-        return Response({'error': f'Cannot reject request with status: {borrowing.status}'}, 
-                        status=status.HTTP_400_BAD_REQUEST)
-    
-    # Update borrowing record
-    borrowing.status = 'RESPINS'
-    borrowing.approved_date = timezone.now()
-    borrowing.save()
-    
-    # Add librarian message if provided
-    librarian_message = request.data.get('librarian_message')
-    if librarian_message:
-        Message.objects.create(
-            sender=request.user,
-            recipient=borrowing.student.user,
-            borrowing=borrowing,
-            content=librarian_message
+    # The librarian message (if any) and the student notification are created by the transition
+    try:
+        borrowing = borrowing_states.transition(
+            borrowing_id, 'reject', actor=request.user, librarian_message=request.data.get('librarian_message')
         )
-    
-    # Create notification for the student/teacher
-    create_user_notification(
-        user=borrowing.student.user,
-        notification_type='request_rejected',
-        message=f"Cererea ta pentru '{borrowing.book.name}' a fost respinsă",
-        book=borrowing.book,
-        borrowing=borrowing
-    )
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = BookBorrowingSerializer(borrowing)
     return Response(serializer.data)
 
+def throttled_login(wait):
+    response = Response(
+        {'detail': f'Prea multe încercări de autentificare. Încearcă din nou în {wait} secunde.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(wait)
+    return response
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @parser_classes([JSONParser])
@@ -614,62 +707,29 @@ def email_token_obtain(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Determine if input is email or username
-    is_email = '@' in email_or_username
+    wait = login.throttle_ip(request)
+    if wait:
+        return throttled_login(wait)
     
-    # If username is provided (without domain), convert to email format
-    if not is_email:
-        email = f"{email_or_username}@nlenau.ro"
-    else:
-        email = email_or_username
-    
-    # Try to find user by email first (case-insensitive)
-    try:
-        user = User.objects.get(email__iexact=email)
-    except User.DoesNotExist:
-        # If not found by email but email was provided, try to extract username from email
-        if is_email and email.lower().endswith('@nlenau.ro'):
-            # Extract username part (everything before @)
-            username_part = email.split('@')[0]
-            
-            # Try to find user with that exact username (case-insensitive)
-            try:
-                user = User.objects.get(username__iexact=username_part)
-            except User.DoesNotExist:
-                # Try to find by original input as username (case-insensitive)
-                try:
-                    user = User.objects.get(username__iexact=email_or_username)
-                except User.DoesNotExist:
-                    return Response(
-                        {'detail': 'Nu a fost găsit niciun cont activ cu datele furnizate.'},
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-        else:
-            # Try direct username lookup (case-insensitive)
-            try:
-                user = User.objects.get(username__iexact=email_or_username)
-            except User.DoesNotExist:
-                return Response(
-                    {'detail': 'Nu a fost găsit niciun cont activ cu datele furnizate.'},
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
+    # Email, part before @nlenau.ro or username, in any case: one indexed lookup
+    user = login.find_user(email_or_username)
+    if user is None:
+        return Response(
+            {'detail': 'Nu a fost găsit niciun cont activ cu datele furnizate.'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
     
-    # Authenticate with username and password
-    user_auth = authenticate(username=user.username, password=password)
+    wait = login.throttle_account(user)
+    if wait:
+        return throttled_login(wait)
     
-    if user_auth is None:
-        # If the user exists but the password is wrong, show specific message
-        if user is not None:
-            return Response(
-                {'detail': 'Parola este incorecta'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        else:
-            return Response(
-                {'detail': 'Nu a fost găsit niciun cont activ cu datele furnizate.'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-    user = user_auth
+    # Check the password on the user already loaded instead of looking it up again via authenticate();
+    # a correct password stored with an outdated hasher or cost is re-hashed on the way (see hashers.py)
+    if not (user.check_password(password) and user.is_active):
+        return Response(
+            {'detail': 'Parola este incorecta'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
 
     # Check if email is verified
     try:
@@ -709,27 +769,11 @@ def mark_pickup(request, borrowing_id):
     if not request.user.groups.filter(name='Librarians').exists():
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    borrowing = get_object_or_404(BookBorrowing, id=borrowing_id)
-    
-    if borrowing.status != 'APROBAT' and borrowing.status != 'GATA_RIDICARE':
-        return Response({'error': f'Cannot mark pickup for request with status: {borrowing.status}'}, 
-                        status=status.HTTP_400_BAD_REQUEST)
-    
-    # Update book stock
-    book = borrowing.book
-    if book.stock <= 0:
-        return Response({'error': 'No copies available'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    book.stock -= 1
-    book.save()
-    
-    # Update borrowing record
-    now = timezone.now()
-    borrowing.status = 'IMPRUMUTAT'
-    borrowing.pickup_date = now
-    borrowing.borrow_date = now
-    borrowing.due_date = now + timedelta(days=borrowing.loan_duration_days)
-    borrowing.save()
+    # Update book stock and borrowing record
+    try:
+        borrowing = borrowing_states.transition(borrowing_id, 'pickup', actor=request.user)
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = BookBorrowingSerializer(borrowing)
     return Response(serializer.data)
@@ -742,26 +786,323 @@ def librarian_return_book(request, borrowing_id):
     if not request.user.groups.filter(name='Librarians').exists():
         return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
     
-    borrowing = get_object_or_404(BookBorrowing, id=borrowing_id)
+    # Update book stock and borrowing record; the freed copy may go to the waitlist
+    try:
+        borrowing = borrowing_states.transition(borrowing_id, 'return', actor=request.user)
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = BookBorrowingSerializer(borrowing)
+    return Response(serializer.data)
+
+def annotate_hold_positions(holds):
+    """Annotate each waiting hold with its 1-based place in the queue of its book"""
+    ahead = BookHold.objects.filter(
+        book=models.OuterRef('book'),
+        status='IN_ASTEPTARE',
+    ).filter(
+        models.Q(created_at__lt=models.OuterRef('created_at')) |
+        models.Q(created_at=models.OuterRef('created_at'), id__lt=models.OuterRef('id'))
+    ).order_by().values('book').annotate(count=models.Count('id')).values('count')
+    return holds.annotate(position=models.Case(
+        models.When(status='IN_ASTEPTARE', then=Coalesce(models.Subquery(ahead), 0) + 1),
+        default=None,
+        output_field=models.IntegerField(),
+    ))
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def book_hold(request, book_id):
+    """
+    Join (POST) or leave (DELETE) the waitlist of a book without available copies.
+    When a copy is returned, the first student in line gets a request ready for pickup.
+    """
+    student = get_borrower(request.user)
+    if student is None:
+        return Response({'error': 'Doar studenții și profesorii pot solicita cărți'}, status=status.HTTP_403_FORBIDDEN)
+    
+    book = get_object_or_404(Book, id=book_id)
+    
+    if request.method == 'DELETE':
+        cancelled = BookHold.objects.filter(book=book, student=student, status='IN_ASTEPTARE').update(status='ANULAT')
+        if not cancelled:
+            return Response({'error': 'Nu sunteți pe lista de așteptare'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'success': True})
     
-    if borrowing.status != 'IMPRUMUTAT' and borrowing.status != 'INTARZIAT':
-        return Response({'error': f'Cannot return book with status: {borrowing.status}'}, 
+    if BookBorrowing.objects.filter(
+        student=student,
+        book=book,
+        status__in=['IN_ASTEPTARE', 'APROBAT', 'GATA_RIDICARE', 'IMPRUMUTAT']
+    ).exists():
+        return Response({'error': 'Aveți deja o cerere activă pentru această carte'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if book.available_copies - borrowing_states.reserved_for_holds(book) > 0:
+        return Response({'error': 'Există exemplare disponibile, solicitați cartea direct'},
                         status=status.HTTP_400_BAD_REQUEST)
     
-    # Update book stock
-    book = borrowing.book
-    book.stock += 1
-    book.save()
+    loan_duration = request.data.get('loan_duration_days', 14)
+    if loan_duration not in dict(BookBorrowing.LOAN_DURATION_CHOICES):
+        return Response({'error': 'Invalid loan_duration_days'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Update borrowing record
-    borrowing.return_date = timezone.now()
-    borrowing.status = 'RETURNAT'
-    borrowing.fine_amount = borrowing.calculate_fine()
-    borrowing.save()
+    try:
+        with transaction.atomic():
+            hold = BookHold.objects.create(book=book, student=student, loan_duration_days=loan_duration)
+    except IntegrityError:
+        return Response({'error': 'Sunteți deja pe lista de așteptare'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    hold = annotate_hold_positions(BookHold.objects.select_related('book')).get(pk=hold.pk)
+    return Response(BookHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_holds(request):
+    """Waitlist entries of the current user, with their place in line"""
+    student = get_borrower(request.user)
+    if student is None:
+        return Response([])
+    holds = annotate_hold_positions(
+        BookHold.objects.filter(student=student, status='IN_ASTEPTARE').select_related('book')
+    )
+    return Response(BookHoldSerializer(holds, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def book_holds(request, book_id):
+    """Waitlist of a book in queue order - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    holds = annotate_hold_positions(
+        BookHold.objects.filter(book_id=book_id, status='IN_ASTEPTARE').select_related('book')
+    ).order_by('created_at', 'id')
+    return Response(BookHoldSerializer(holds, many=True).data)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def book_copies(request, book_id):
+    """
+    List the physical copies of a book, or register new ones - For librarians only.
+    POST body: {"barcodes": [...]} for pre-printed labels, or {"count": n} to generate barcodes.
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    book = get_object_or_404(Book, id=book_id)
+    
+    if request.method == 'GET':
+        copies = BookCopy.objects.filter(book=book).order_by('barcode')
+        return Response(BookCopySerializer(copies, many=True).data)
+    
+    barcodes = request.data.get('barcodes')
+    count = request.data.get('count')
+    if barcodes is None:
+        try:
+            count = int(count)
+        except (ValueError, TypeError):
+            return Response({'error': 'barcodes or count is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if count <= 0 or count > MAX_BATCH_ITEMS:
+            return Response({'error': f'count must be between 1 and {MAX_BATCH_ITEMS}'}, status=status.HTTP_400_BAD_REQUEST)
+        # Generated barcodes: LB + book id + running number for this book
+        start = BookCopy.objects.filter(book=book).count() + 1
+        barcodes = [f"LB{book.id:06d}{number:04d}" for number in range(start, start + count)]
+    
+    if not isinstance(barcodes, list) or not barcodes or len(barcodes) > MAX_BATCH_ITEMS:
+        return Response({'error': 'barcodes must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    barcodes = [str(barcode).strip() for barcode in barcodes]
+    if any(not barcode for barcode in barcodes) or len(set(barcodes)) != len(barcodes):
+        return Response({'error': 'Barcodes must be non-empty and unique'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    taken = list(BookCopy.objects.filter(barcode__in=barcodes).values_list('barcode', flat=True))
+    if taken:
+        return Response({'error': 'Barcodes already in use', 'barcodes': taken}, status=status.HTTP_400_BAD_REQUEST)
+    
+    copies = BookCopy.objects.bulk_create([BookCopy(book=book, barcode=barcode) for barcode in barcodes])
+    return Response(BookCopySerializer(copies, many=True).data, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def lookup_copy(request, barcode):
+    """Resolve a scanned barcode to its copy, book and open loan - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    copy = get_object_or_404(BookCopy.objects.select_related('book'), barcode=barcode)
+    open_borrowing = BookBorrowing.objects.filter(
+        copy=copy, status__in=['IMPRUMUTAT', 'INTARZIAT']
+    ).select_related('book', 'student__user').first()
+    
+    return Response({
+        'copy': BookCopySerializer(copy).data,
+        'book': BookSerializer(copy.book).data,
+        'borrowing': BookBorrowingSerializer(open_borrowing).data if open_borrowing else None,
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def scan_checkout(request):
+    """
+    Desk checkout by scanning a copy - For librarians only.
+    Body: {"barcode": "...", "student_id": "ST000123"} (or "borrowing_id" instead of "student_id").
+    The copy is resolved to the student's approved request for that book in one query.
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    barcode = request.data.get('barcode')
+    student_id = request.data.get('student_id')
+    borrowing_id = request.data.get('borrowing_id')
+    if not barcode or not (student_id or borrowing_id):
+        return Response({'error': 'barcode and student_id (or borrowing_id) are required'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    borrowings = BookBorrowing.objects.filter(
+        book__copies__barcode=barcode,
+        status__in=['APROBAT', 'GATA_RIDICARE'],
+    )
+    if borrowing_id:
+        borrowings = borrowings.filter(id=borrowing_id)
+    else:
+        borrowings = borrowings.filter(student__student_id=student_id)
+    borrowing = borrowings.select_related('book', 'student__user').annotate(
+        scanned_copy_id=models.F('book__copies__id'),
+        scanned_copy_status=models.F('book__copies__status'),
+    ).order_by('request_date').first()
+    
+    if borrowing is None:
+        if not BookCopy.objects.filter(barcode=barcode).exists():
+            return Response({'error': 'Unknown barcode'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'error': 'No approved request for this book'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if borrowing.scanned_copy_status != 'DISPONIBIL':
+        return Response({'error': f'Copy is not available (status: {borrowing.scanned_copy_status})'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        borrowing = borrowing_states.transition(
+            borrowing.id, 'pickup', actor=request.user, copy_id=borrowing.scanned_copy_id
+        )
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = BookBorrowingSerializer(borrowing)
+    return Response(serializer.data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def scan_return(request):
+    """Desk return by scanning a copy - For librarians only. Body: {"barcode": "..."}"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    barcode = request.data.get('barcode')
+    if not barcode:
+        return Response({'error': 'barcode is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    borrowing_id = BookBorrowing.objects.filter(
+        copy__barcode=barcode,
+        status__in=['IMPRUMUTAT', 'INTARZIAT'],
+    ).values_list('id', flat=True).first()
+    if borrowing_id is None:
+        return Response({'error': 'No open loan for this copy'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        borrowing = borrowing_states.transition(borrowing_id, 'return', actor=request.user)
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = BookBorrowingSerializer(borrowing)
     return Response(serializer.data)
 
+def bulk_action_response(request, action):
+    """Shared body of the bulk queue endpoints"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    borrowing_ids = request.data.get('borrowing_ids')
+    if not isinstance(borrowing_ids, list) or not borrowing_ids:
+        return Response({'error': 'borrowing_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(borrowing_ids) > MAX_BATCH_ITEMS:
+        return Response({'error': f'At most {MAX_BATCH_ITEMS} borrowings per request'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        borrowing_ids = list(dict.fromkeys(int(borrowing_id) for borrowing_id in borrowing_ids))
+    except (ValueError, TypeError):
+        return Response({'error': 'Invalid borrowing_ids'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results, _ = borrowing_states.apply_transition(
+        action, borrowing_ids, actor=request.user, librarian_message=request.data.get('librarian_message')
+    )
+    processed = sum(1 for result in results if result['success'])
+    return Response({
+        'processed': processed,
+        'failed': len(results) - processed,
+        'results': results,
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def bulk_approve_requests(request):
+    """Approve many requests at once - For librarians only. Body: {"borrowing_ids": [...], "librarian_message": "..."}"""
+    return bulk_action_response(request, 'approve')
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def bulk_reject_requests(request):
+    """Reject many requests at once - For librarians only. Body: {"borrowing_ids": [...], "librarian_message": "..."}"""
+    return bulk_action_response(request, 'reject')
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def bulk_mark_pickup(request):
+    """Mark many approved requests as picked up - For librarians only. Body: {"borrowing_ids": [...]}"""
+    return bulk_action_response(request, 'pickup')
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def bulk_librarian_return(request):
+    """Return many borrowed books at once - For librarians only. Body: {"borrowing_ids": [...]}"""
+    return bulk_action_response(request, 'return')
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def distribute_manuals(request):
+    """
+    Lend all manuals of a class grade to every student of the class - For librarians only.
+    Body: {"student_class": "V-A", "school_year": "2026-2027", "dry_run": false, "waitlist": false}
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    dry_run = bool(request.data.get('dry_run'))
+    try:
+        summary = manual_distribution.distribute_manuals(
+            request.data.get('student_class'),
+            request.data.get('school_year'),
+            actor=request.user,
+            dry_run=dry_run,
+            waitlist=bool(request.data.get('waitlist')),
+        )
+    except manual_distribution.DistributionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if not dry_run and summary['created']:
+        create_librarian_notification(
+            notification_type='manuals_assigned',
+            message=f"Manuale distribuite clasei {summary['student_class']}: {summary['created']} împrumuturi, "
+                    f"{len(summary['shortages'])} manuale cu stoc insuficient",
+            created_by=request.user
+        )
+    
+    return Response({'dry_run': dry_run, **summary})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_book_stock(request, book_id):
@@ -799,7 +1140,10 @@ def update_book_stock(request, book_id):
         except (ValueError, TypeError):
             return Response({'error': 'Invalid inventory value'}, status=status.HTTP_400_BAD_REQUEST)
     
-    book.save()
+    with transaction.atomic():
+        book.save()
+        # New copies on the shelf are offered to the waitlist first
+        borrowing_states.promote_holds(book.id)
     
     # Create notification for librarians
     changes = []
@@ -818,6 +1162,97 @@ def update_book_stock(request, book_id):
     serializer = BookSerializer(book)
     return Response(serializer.data)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def batch_update_book_stock(request):
+    """
+    Update stock/inventory of many books at once (e.g. a yearly stock-take) - For librarians only.
+    Body: {"updates": [{"book_id": 1, "stock": 3, "inventory": 5}, ...]}
+    All entries are validated first; nothing is changed unless every entry is valid.
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+
+    updates = request.data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return Response({'error': 'updates must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(updates) > MAX_BATCH_ITEMS:
+        return Response({'error': f'At most {MAX_BATCH_ITEMS} updates per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    errors = []
+    parsed = {}
+    for index, entry in enumerate(updates):
+        if not isinstance(entry, dict):
+            errors.append({'index': index, 'error': 'Invalid entry'})
+            continue
+        try:
+            book_id = int(entry.get('book_id'))
+        except (ValueError, TypeError):
+            errors.append({'index': index, 'error': 'Invalid book_id'})
+            continue
+        if book_id in parsed:
+            errors.append({'index': index, 'book_id': book_id, 'error': 'Duplicate book_id'})
+            continue
+        if entry.get('stock') is None and entry.get('inventory') is None:
+            errors.append({'index': index, 'book_id': book_id, 'error': 'Either stock or inventory is required'})
+            continue
+        values = {}
+        for field, label in (('stock', 'Stock'), ('inventory', 'Inventory')):
+            if entry.get(field) is None:
+                continue
+            try:
+                values[field] = int(entry[field])
+            except (ValueError, TypeError):
+                errors.append({'index': index, 'book_id': book_id, 'error': f'Invalid {field} value'})
+                break
+            if values[field] < 0:
+                errors.append({'index': index, 'book_id': book_id, 'error': f'{label} cannot be negative'})
+                break
+        else:
+            parsed[book_id] = values
+
+    with transaction.atomic():
+        books = Book.objects.select_for_update().in_bulk(list(parsed))
+        for book_id in parsed:
+            if book_id not in books:
+                errors.append({'book_id': book_id, 'error': 'Book not found'})
+
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        changed = []
+        stock_before = {book.id: book.stock for book in books.values()}
+        for book_id, values in parsed.items():
+            book = books[book_id]
+            if any(getattr(book, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(book, field, value)
+                book.updated_at = timezone.now()  # bulk_update does not apply auto_now
+                changed.append(book)
+
+        Book.objects.bulk_update(changed, ['stock', 'inventory', 'updated_at'], batch_size=500)
+        if changed:
+            response_cache.invalidate('books')
+        # New copies on the shelf are offered to the waitlist first
+        for book in changed:
+            if book.stock > stock_before[book.id]:
+                borrowing_states.promote_holds(book.id)
+
+    # One summary notification for the whole batch
+    if changed:
+        create_librarian_notification(
+            notification_type='stock_updated',
+            message=f"Stoc/inventar actualizat pentru {len(changed)} cărți",
+            created_by=request.user
+        )
+
+    return Response({
+        'updated': len(changed),
+        'unchanged': len(parsed) - len(changed),
+        'books': BookSerializer(changed, many=True, context={'request': request}).data,
+    })
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_book(request, book_id):
@@ -843,8 +1278,10 @@ def delete_book(request, book_id):
     book_name = book.name
     book_author = book.author
     
-    # Delete the book
-    book.delete()
+    # Delete the book; its finished borrowings go with it, so they leave the dashboard counters
+    with transaction.atomic():
+        counters.remove_borrowings(BookBorrowing.objects.filter(book=book))
+        book.delete()
     
     # Create notification for librarians
     create_librarian_notification(
@@ -868,9 +1305,59 @@ def all_book_requests(request):
     serializer = BookBorrowingSerializer(all_requests, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def librarian_dashboard(request):
+    """Counts for the librarian home screen, read from the dashboard counters - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return Response(counters.dashboard())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def response_cache_stats(request):
+    """Hit/miss counters of the catalog and exam model response cache - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return Response(response_cache.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def borrowing_history(request, borrowing_id):
+    """Status transitions of one borrowing, oldest first - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    get_object_or_404(BookBorrowing, id=borrowing_id)
+    transitions = BorrowingTransition.objects.filter(borrowing_id=borrowing_id).select_related('actor')
+    return Response(BorrowingTransitionSerializer(transitions, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def borrowing_status_times(request):
+    """
+    Average and maximum time requests spend in each status - For librarians only.
+    Optional ?days=N limits the statistics to transitions of the last N days.
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    since = None
+    days = request.query_params.get('days')
+    if days:
+        try:
+            since = timezone.now() - timedelta(days=int(days))
+        except ValueError:
+            return Response({'error': 'Invalid days value'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({'statuses': borrowing_states.status_durations(since)})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([JSONParser])
+@idempotent
 def request_loan_extension(request, borrowing_id):
     """Request extension for a borrowed book"""
     is_student = hasattr(request.user, 'student')
@@ -938,6 +1425,7 @@ def request_loan_extension(request, borrowing_id):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([JSONParser])
+@idempotent
 def send_message(request):
     """Send a message to another user"""
     recipient_id = request.data.get('recipient_id')
@@ -966,10 +1454,52 @@ def send_message(request):
         'content': message.content
     }, status=status.HTTP_201_CREATED)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+@idempotent
+def broadcast_message(request):
+    """
+    Send a message to a whole class or role - For librarians only.
+    Body: {"audience": "class"|"students"|"teachers", "student_class": "V-A", "content": "..."}
+    Delivery runs in the background; poll broadcasts/<id> for progress.
+    """
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    content = request.data.get('content')
+    if not content:
+        return Response({'error': 'content is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        broadcast = broadcasts.create_broadcast(
+            request.user, request.data.get('audience'), content, request.data.get('student_class') or ''
+        )
+    except broadcasts.BroadcastError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(BroadcastSerializer(broadcast).data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def broadcast_status(request, broadcast_id):
+    """Delivery progress of a broadcast - For librarians only"""
+    if not request.user.groups.filter(name='Librarians').exists():
+        return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    broadcast = get_object_or_404(Broadcast, id=broadcast_id)
+    return Response(BroadcastSerializer(broadcast).data)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_messages(request):
-    """Get all messages for the current user, grouped by conversation"""
+    """
+    Get all messages for the current user, grouped by conversation.
+    With ?conversation_id= returns one page of that conversation as a list, oldest
+    first (the newest page by default, ?limit= up to 100). The X-Older-Cursor header,
+    passed back as ?before=, loads older messages; X-Newer-Cursor as ?after= fetches
+    newer ones. X-Read-Up-To lists each participant's read watermark ("<user id>=<message id>").
+    """
     user = request.user
     conversation_id = request.query_params.get('conversation_id')
     
@@ -978,7 +1508,17 @@ def get_messages(request):
         messages = Message.objects.filter(
             models.Q(sender=user) | models.Q(recipient=user),
             conversation_id=conversation_id
-        ).order_by('timestamp')
+        ).select_related('sender')
+        after = request.query_params.get('after')
+        try:
+            page, has_older, _ = pagination.keyset_page(
+                messages,
+                before=request.query_params.get('before'),
+                after=after,
+                limit=pagination.page_size(request.query_params.get('limit')),
+            )
+        except pagination.InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     else:
         # Get all conversations for the user
         # First get all unique conversation IDs
@@ -1019,34 +1559,126 @@ def get_messages(request):
         
         return Response(conversations_data)
     
-    # For a specific conversation, return all messages
+    # For a specific conversation; display names are built once per sender
+    senders = {}
     data = []
-    for msg in messages:
-        data.append({
-            'id': msg.id,
-            'sender': {
-                'id': msg.sender.id,
+    for msg in page:
+        if msg.sender_id not in senders:
+            senders[msg.sender_id] = {
+                'id': msg.sender_id,
                 'username': msg.sender.username,
                 'name': get_display_name(msg.sender),
-            },
+            }
+        data.append({
+            'id': msg.id,
+            'sender': senders[msg.sender_id],
             'content': msg.content,
             'timestamp': msg.timestamp.isoformat(),
             'is_read': msg.is_read,
-            'is_sent_by_me': msg.sender == user,
+            'is_sent_by_me': msg.sender_id == user.id,
         })
     
-    return Response(data)
+    # The body keeps its list shape for existing clients; paging and read state travel in headers
+    response = Response(data)
+    if has_older and page:
+        response['X-Older-Cursor'] = pagination.encode_cursor(page[0].timestamp, page[0].id)
+    # Poll with ?after=<X-Newer-Cursor> to fetch messages that arrive later
+    newer_cursor = pagination.encode_cursor(page[-1].timestamp, page[-1].id) if page else after
+    if newer_cursor:
+        response['X-Newer-Cursor'] = newer_cursor
+    # Read watermarks, e.g. to show which of my messages the other participant has seen
+    read_up_to = ConversationReadState.objects.filter(conversation_id=conversation_id).values_list(
+        'user_id', 'last_read_message_id'
+    )
+    response['X-Read-Up-To'] = ', '.join(f'{user_id}={message_id}' for user_id, message_id in read_up_to)
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_messages(request):
+    """
+    Full-text search in the current user's conversations, with highlighted snippets.
+    Optional ?conversation_id= limits the search to one conversation; ?page= and
+    ?limit= (max 100) paginate the results.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Missing ?q='}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return Response({'error': 'Invalid page'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = pagination.page_size(request.GET.get('limit'), default=20)
+    
+    results, has_more = message_search.search_messages(
+        request.user, query, conversation_id=request.GET.get('conversation_id') or None,
+        limit=limit, offset=(page - 1) * limit,
+    )
+    return Response({'results': results, 'page': page, 'has_more': has_more})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_message_read(request, message_id):
     """Mark a message as read"""
     message = get_object_or_404(Message, id=message_id, recipient=request.user)
-    message.is_read = True
-    message.save()
+    # Conditional update, so the unread counter is only decremented once
+    if Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True):
+        counters.add({counters.unread_messages_key(request.user.id): -1})
     
     return Response({'success': True})
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def mark_conversation_read(request):
+    """
+    Mark every message of a conversation received by the current user as read,
+    up to up_to_message_id (default: the latest message), in a single UPDATE.
+    Also advances the user's read watermark for the conversation.
+    """
+    user = request.user
+    conversation_id = request.data.get('conversation_id')
+    up_to = request.data.get('up_to_message_id')
+    
+    if not conversation_id:
+        return Response({'error': 'conversation_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    if up_to is not None and (not isinstance(up_to, int) or isinstance(up_to, bool)):
+        return Response({'error': 'up_to_message_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    messages = Message.objects.filter(
+        models.Q(sender=user) | models.Q(recipient=user),
+        conversation_id=conversation_id
+    )
+    latest_id = messages.aggregate(latest=models.Max('id'))['latest']
+    if latest_id is None:
+        return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+    up_to = latest_id if up_to is None else min(up_to, latest_id)
+    unread_key = counters.unread_messages_key(user.id)
+    
+    with transaction.atomic():
+        marked = Message.objects.filter(
+            conversation_id=conversation_id, recipient=user, is_read=False, id__lte=up_to
+        ).update(is_read=True)
+        if marked:
+            counters.add({unread_key: -marked})
+        
+        # The watermark only moves forward
+        state, created = ConversationReadState.objects.get_or_create(
+            user=user, conversation_id=conversation_id, defaults={'last_read_message_id': up_to}
+        )
+        if not created and state.last_read_message_id < up_to:
+            ConversationReadState.objects.filter(pk=state.pk, last_read_message_id__lt=up_to).update(
+                last_read_message_id=up_to, updated_at=timezone.now()
+            )
+    
+    return Response({
+        'conversation_id': conversation_id,
+        'marked': marked,
+        'last_read_message_id': max(up_to, state.last_read_message_id),
+        'unread_messages': counters.get_values([unread_key])[unread_key],
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_all_users(request):
@@ -1082,7 +1714,11 @@ def get_all_users(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
-    """Get notifications for the current user"""
+    """
+    Get notifications for the current user, newest first (50 by default, ?limit= up to 100).
+    When there are older ones, the X-Next-Cursor header holds the cursor to pass as
+    ?before= for the next page.
+    """
     user = request.user
     is_librarian = user.groups.filter(name='Librarians').exists()
     
@@ -1093,44 +1729,38 @@ def get_notifications(request):
         # Regular users see their own notifications
         notifications = Notification.objects.filter(user=user, for_librarians=False)
     
-    # Limit to latest 50 notifications
-    notifications = notifications.order_by('-timestamp')[:50]
+    # Polled by every client: one query for the page, columns only, related names joined in
+    try:
+        page, has_older, _ = pagination.keyset_page(
+            notifications.values(*NOTIFICATION_FIELDS),
+            before=request.query_params.get('before'),
+            limit=pagination.page_size(request.query_params.get('limit')),
+        )
+    except pagination.InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Basic serialization
-    data = []
-    for notification in notifications:
-        notification_data = {
-            'id': notification.id,
-            'type': notification.notification_type,
-            'message': notification.message,
-            'timestamp': notification.timestamp.isoformat(),
-            'is_read': notification.is_read,
-        }
-        
-        # Add book info if available
-        if notification.book:
-            notification_data['book'] = {
-                'id': notification.book.id,
-                'name': notification.book.name,
-            }
-            
-        # Add borrowing info if available
-        if notification.borrowing:
-            notification_data['borrowing'] = {
-                'id': notification.borrowing.id,
-            }
-            
-        # Add creator info if available (for librarian notifications)
-        if notification.created_by:
-            notification_data['created_by'] = {
-                'id': notification.created_by.id,
-                'name': get_display_name(notification.created_by),
-            }
-            
-        data.append(notification_data)
+    response = Response(serialize_notification_rows(reversed(page)))
+    if has_older and page:
+        response['X-Next-Cursor'] = pagination.encode_cursor(page[0]['timestamp'], page[0]['id'])
+    return response
     
-    return Response(data)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_counts(request):
+    """Unread messages and notifications of the current user, for app badges"""
+    user = request.user
+    is_librarian = user.groups.filter(name='Librarians').exists()
     
+    messages_key = counters.unread_messages_key(user.id)
+    notifications_key = (counters.UNREAD_LIBRARIAN_NOTIFICATIONS if is_librarian
+                         else counters.unread_notifications_key(user.id))
+    values = counters.cached_values([messages_key, notifications_key])
+    # Counters can briefly run below zero if a reconciliation races with a read
+    return Response({
+        'messages': max(0, values[messages_key]),
+        'notifications': max(0, values[notifications_key]),
+    })
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_notification_read(request, notification_id):
@@ -1145,8 +1775,12 @@ def mark_notification_read(request, notification_id):
         # Regular users can only mark their own notifications as read
         notification = get_object_or_404(Notification, id=notification_id, user=user, for_librarians=False)
     
-    notification.is_read = True
-    notification.save()
+    # Conditional update, so the unread counter is only decremented once
+    marked = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True, updated_at=timezone.now())
+    if marked and notification.for_librarians:
+        counters.add({counters.UNREAD_LIBRARIAN_NOTIFICATIONS: -1})
+    elif marked:
+        counters.add({counters.unread_notifications_key(user.id): -1})
     
     return Response({'success': True})
 
@@ -1288,31 +1922,13 @@ def search_users(request):
     
     return Response(data)
 
-# Add notification helpers
-def create_librarian_notification(notification_type, message, book=None, borrowing=None, created_by=None):
-    """Create notification for librarians"""
-    Notification.objects.create(
-        notification_type=notification_type,
-        message=message,
-        book=book,
-        borrowing=borrowing,
-        created_by=created_by,
-        for_librarians=True
-    )
-
-def create_user_notification(user, notification_type, message, book=None, borrowing=None):
-    """Create notification for a specific user"""
-    Notification.objects.create(
-        user=user,
-        notification_type=notification_type,
-        message=message,
-        book=book,
-        borrowing=borrowing,
-        for_librarians=False
-    )
+def exam_models_etag(request):
+    return etags.queryset_etag(ExamModel.objects.all())
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@response_cache.cached('exam_models')
+@etags.conditional(exam_models_etag)
 def list_exam_models(request):
     """List all exam models"""
     exam_models = ExamModel.objects.all().order_by('-created_at')
@@ -1341,7 +1957,8 @@ def create_exam_model(request):
     
     serializer = ExamModelSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        serializer.save()
+        exam_model = serializer.save()
+        document_index.schedule_indexing('exam_model', exam_model.id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     else:
         print(f"Serializer errors: {serializer.errors}")
@@ -1355,9 +1972,36 @@ def delete_exam_model(request, pk):
         exam_model = ExamModel.objects.get(pk=pk)
     except ExamModel.DoesNotExist:
         return Response({'error': 'Exam model not found'}, status=status.HTTP_404_NOT_FOUND)
+    pdf_file = str(exam_model.pdf_file) if exam_model.pdf_file else None
     exam_model.delete()
+    # Exam model files are never shared, remove the PDF together with the row
+    delete_file_from_storage(pdf_file)
     return Response({'success': True})
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_documents(request):
+    """Search inside manual and exam model PDFs, returning matching pages with snippets"""
+    query = request.GET.get('q', '').strip()
+    document_type = request.GET.get('type') or None
+
+    if not query:
+        return Response({'error': 'Missing ?q='}, status=status.HTTP_400_BAD_REQUEST)
+
+    if document_type and document_type not in dict(IndexedDocument.DOCUMENT_TYPES):
+        return Response({'error': 'Invalid type'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = document_index.search_documents(query, document_type=document_type, limit=limit)
+    for result in results:
+        if result['pdf_file']:
+            result['pdf_file'] = request.build_absolute_uri(result['pdf_file'])
+    return Response(results)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_verification_email(request):
@@ -1628,10 +2272,12 @@ def mark_all_notifications_read(request):
     
     if is_librarian:
         # Librarians can mark all librarian notifications as read
-        Notification.objects.filter(for_librarians=True, is_read=False).update(is_read=True)
+        marked = Notification.objects.filter(for_librarians=True, is_read=False).update(is_read=True, updated_at=timezone.now())
+        counters.add({counters.UNREAD_LIBRARIAN_NOTIFICATIONS: -marked})
     else:
         # Regular users can only mark their own notifications as read
-        Notification.objects.filter(user=user, for_librarians=False, is_read=False).update(is_read=True)
+        marked = Notification.objects.filter(user=user, for_librarians=False, is_read=False).update(is_read=True, updated_at=timezone.now())
+        counters.add({counters.unread_notifications_key(user.id): -marked})
     
     return Response({'success': True})
 
@@ -1639,25 +2285,13 @@ def delete_file_from_storage(file_path):
     """Helper function to delete a file from storage"""
     if file_path:
         try:
-            # Handle different types of file paths
+            # Handle different types of file paths (full URLs, /media/ paths, storage names)
             if isinstance(file_path, str):
-                # For thumbnail URLs that might be full URLs
-                if file_path.startswith('http'):
-                    # Extract just the media path from URL
-                    parts = file_path.split('/media/')
-                    if len(parts) > 1:
-                        file_path = parts[1]
-                    else:
-                        logging.warning(f"Could not extract media path from URL: {file_path}")
-                        return False
-                
-                # Remove leading slash if present
-                if file_path.startswith('/'):
-                    file_path = file_path[1:]
-                
-                # Remove media/ prefix if present
-                if file_path.startswith('media/'):
-                    file_path = file_path[6:]
+                media_path = media_path_from_url(file_path)
+                if media_path is None:
+                    logging.warning(f"Could not extract media path from URL: {file_path}")
+                    return False
+                file_path = media_path
             
             # Check if file exists and delete it
             if default_storage.exists(file_path):
@@ -1732,6 +2366,9 @@ def update_book_details(request, book_id):
         book.pdf_file = data['pdf_file']
     
     book.save()
+    if book.pdf_file and ('pdf_file' in request.FILES or data.get('pdf_file')):
+        # Searchable right away instead of at the next index_documents run
+        document_index.schedule_indexing('book', book.id)
     
     # Create notification for librarians
     create_librarian_notification(
@@ -1748,7 +2385,7 @@ def update_book_details(request, book_id):
 @permission_classes([IsAuthenticated])
 @parser_classes([JSONParser])
 def cancel_request(request, borrowing_id):
-    """Allow a student to cancel their own book request (IN_ASTEPTARE or APROBAT)"""
+    """Allow a student to cancel their own book request (IN_ASTEPTARE, APROBAT or GATA_RIDICARE)"""
     try:
         student = request.user.student
     except Exception:
@@ -1756,7 +2393,7 @@ def cancel_request(request, borrowing_id):
 
     borrowing = get_object_or_404(BookBorrowing, id=borrowing_id, student=student)
 
-    if borrowing.status not in ['IN_ASTEPTARE', 'APROBAT']:
+    if not borrowing_states.can_transition(borrowing, 'cancel'):
         return Response({'error': f'Cannot cancel request with status: {borrowing.status}'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Optional message
@@ -1771,17 +2408,11 @@ def cancel_request(request, borrowing_id):
                 content=f'Mesaj la anulare: {message}'
             )
 
-    borrowing.status = 'ANULATA'
-    borrowing.save()
-
-    # Notificare pentru student
-    create_user_notification(
-        user=request.user,
-        notification_type='request_cancelled',
-        message=f'Cererea ta pentru "{borrowing.book.name}" a fost anulată.',
-        book=borrowing.book,
-        borrowing=borrowing
-    )
+    # Notificarea pentru student este creată de tranziție
+    try:
+        borrowing = borrowing_states.transition(borrowing.id, 'cancel', actor=request.user)
+    except borrowing_states.TransitionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     serializer = BookBorrowingSerializer(borrowing)
     return Response({'success': True, 'borrowing': serializer.data})
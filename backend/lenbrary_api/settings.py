@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -97,6 +98,8 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'True').lower() == 'true'  # Only for development
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'ETag', 'X-Next-Cursor', 'X-Older-Cursor', 'X-Newer-Cursor', 'X-Read-Up-To']
 
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
@@ -139,6 +142,27 @@ DATABASES = {
 
 
 
+# Hasher for new passwords: 'pbkdf2' or 'argon2' (needs argon2-cffi), with its cost below. Stored
+# hashes of the other hashers, or with other parameters, are re-hashed on the next successful
+# login (see booklibrary/hashers.py). Size the cost with `manage.py benchmark_password_hashing`
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', '720000'))
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', '102400'))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', '8'))
+
+_TUNED_HASHERS = {
+    'pbkdf2': 'booklibrary.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'booklibrary.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHERS = [
+    _TUNED_HASHERS[PASSWORD_HASHER],
+    *(path for name, path in _TUNED_HASHERS.items() if name != PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -173,8 +197,77 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media storage backend: 'local' (MEDIA_ROOT on disk) or 's3' (any S3-compatible object storage,
+# e.g. AWS S3 or a local MinIO). With 's3' file bytes go directly between clients and the bucket
+# through presigned URLs, so several app servers can run behind a load balancer.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local').lower()
+
+if STORAGE_BACKEND == 's3':
+    STORAGES = {
+        'default': {
+            'BACKEND': 'storages.backends.s3.S3Storage',
+        },
+        'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        },
+    }
+    AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', 'lenbrary-media')
+    AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL') or None  # e.g. http://localhost:9000 for MinIO
+    AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME', 'us-east-1')
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', '')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', '')
+    AWS_S3_ADDRESSING_STYLE = os.environ.get('AWS_S3_ADDRESSING_STYLE', 'path')  # MinIO needs path-style
+    AWS_S3_SIGNATURE_VERSION = 's3v4'
+    AWS_DEFAULT_ACL = None
+    AWS_S3_FILE_OVERWRITE = False
+    AWS_QUERYSTRING_AUTH = True
+    AWS_QUERYSTRING_EXPIRE = int(os.environ.get('AWS_QUERYSTRING_EXPIRE', '3600'))  # Presigned URL lifetime (s)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache for catalog/exam model responses. The local-memory default is per process: with several
+# workers, point CACHE_BACKEND at a shared backend (e.g. django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'lenbrary'),
+    }
+}
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '300'))  # Upper bound on staleness (s)
+
+# Login attempts per client IP and per account (token buckets kept in the cache above): up to BURST
+# at once, refilled at PER_MINUTE a minute. The whole school shares a few NAT addresses at 8am,
+# hence the generous per-IP burst. 0 disables a limit
+LOGIN_THROTTLE_IP_BURST = int(os.environ.get('LOGIN_THROTTLE_IP_BURST', '300'))
+LOGIN_THROTTLE_IP_PER_MINUTE = int(os.environ.get('LOGIN_THROTTLE_IP_PER_MINUTE', '120'))
+LOGIN_THROTTLE_ACCOUNT_BURST = int(os.environ.get('LOGIN_THROTTLE_ACCOUNT_BURST', '10'))
+LOGIN_THROTTLE_ACCOUNT_PER_MINUTE = int(os.environ.get('LOGIN_THROTTLE_ACCOUNT_PER_MINUTE', '5'))
+
+# Days a waitlisted student has to collect an assigned copy before expire_holds passes it on
+HOLD_PICKUP_DAYS = int(os.environ.get('HOLD_PICKUP_DAYS', '3'))
+
+# How long (seconds) a response stored for an Idempotency-Key header can be replayed
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+
+# Deliver broadcast messages in a background thread right after the request; when disabled
+# only the deliver_broadcasts cron command delivers them
+BROADCAST_DELIVERY_THREAD = os.environ.get('BROADCAST_DELIVERY_THREAD', 'True').lower() == 'true'
+
+# Index uploaded PDFs right away in a background thread; when disabled only the index_documents
+# cron command indexes them
+DOCUMENT_INDEX_THREAD = os.environ.get('DOCUMENT_INDEX_THREAD', 'True').lower() == 'true'
+
+# Similar librarian notifications (new books, stock updates, requests) within this many seconds
+# are merged into one row with a count; 0 disables merging
+NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', '600'))
+
+# Read messages/notifications older than this many days are archived by apply_retention
+MESSAGE_RETENTION_DAYS = int(os.environ.get('MESSAGE_RETENTION_DAYS', '730'))
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+
+# How long (days) deletions are kept for delta-sync clients; older sync tokens get a full reset
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', '30'))
+
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', '')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', ''))
@@ -16,14 +16,14 @@ Including another URLconf
 """
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
     TokenVerifyView,
 )
-from booklibrary.views import email_token_obtain
+from booklibrary.views import email_token_obtain, media_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -33,5 +33,8 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 ]   
-if settings.DEBUG:
+if settings.STORAGE_BACKEND == 's3':
+    # Media lives in object storage, /media/ URLs redirect to presigned download URLs
+    urlpatterns += [re_path(r'^media/(?P<path>.+)$', media_redirect, name='media_redirect')]
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file